@@ -0,0 +1,169 @@
+"""提醒规则匹配器的微基准测试：大量规则、大量推文，无需浏览器和网络
+
+用法:
+    python benchAlerts.py                        # 默认 2000 条规则、20000 条推文
+    python benchAlerts.py --rules 10000 --tweets 50000
+    python benchAlerts.py --min-rate 20000       # 低于该吞吐（条/秒）或结果与逐条规则检查不一致时返回非零退出码
+"""
+import argparse
+import random
+import re
+import string
+import sys
+import time
+
+from listenMaskTwitter import AlertMatcher, keyword_pattern, parse_count
+
+# 不能合并进预筛选正则的写法：内联标志、同名分组、编号反向引用
+EDGE_RULES = [
+    {'name': 'inline_flag', 'regex': r'(?i)FOO\d'},
+    {'name': 'scoped_flag', 'regex': r'x(?s:.)y'},
+    {'name': 'named_a', 'regex': r'(?P<n>alpha)-(?P=n)'},
+    {'name': 'named_b', 'regex': r'(?P<n>beta)\s'},
+    {'name': 'backref_a', 'regex': r'(a)\1'},
+    {'name': 'backref_b', 'regex': r'(b)\1'},
+]
+EDGE_TEXTS = ['foo7 here', 'x\ny', 'alpha-alpha beta ', 'bb', 'aa and bb', 'beta-beta']
+
+CJK_WORDS = ['币安', '比特币', '以太坊', '监管', '上线', '空投', '合约', '现货', '减半', '交易所']
+
+
+def random_word(rng):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 9)))
+
+
+def make_rules(count, rng, vocabulary, accounts):
+    """生成规则：多数是关键词规则，另有股票代码、正则、互动数和账号规则"""
+    rules = []
+    account_rules = {username: {'alert_rules': []} for username in accounts}
+    for index in range(count):
+        kind = rng.random()
+        if kind < 0.6:
+            rule = {'keywords': rng.sample(vocabulary, rng.randint(1, 4))}
+            if rng.random() < 0.2:
+                rule['keywords'].append(' '.join(rng.sample(vocabulary, 2)))
+        elif kind < 0.8:
+            rule = {'cashtags': [random_word(rng).upper()[:4] for _ in range(rng.randint(1, 3))]}
+        elif kind < 0.9:
+            rule = {'keywords': rng.sample(CJK_WORDS, 2)}
+        elif kind < 0.97:
+            rule = {'regex': rf"\b{rng.choice(vocabulary)}\s+\d+[kKmM]?\b"}
+        else:
+            rule = {'min_likes': rng.choice(['1K', '5000', '1.2万'])}
+        if rng.random() < 0.1:
+            rule['min_retweets'] = rng.randint(1, 100)
+        rule['name'] = f"rule{index + 1}"
+        if rng.random() < 0.2:
+            account_rules[rng.choice(accounts)]['alert_rules'].append(rule)
+        else:
+            rules.append(rule)
+    rules.extend(dict(rule) for rule in EDGE_RULES)
+    return rules, account_rules
+
+
+def make_tweets(count, rng, vocabulary, accounts):
+    """生成推文：随机单词，混入中文、股票代码和数字"""
+    filler = [random_word(rng) for _ in range(5000)]
+    tweets = []
+    for _ in range(count):
+        words = rng.choices(filler, k=rng.randint(5, 40))
+        for _ in range(rng.randint(0, 2)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(vocabulary))
+        if rng.random() < 0.2:
+            words.append('$' + random_word(rng).upper()[:4])
+        if rng.random() < 0.2:
+            words.append(rng.choice(CJK_WORDS) + '的消息')
+        if rng.random() < 0.1:
+            words.append(f"{rng.randint(1, 999)}K")
+        tweets.append({
+            'username': rng.choice(accounts),
+            'text': ' '.join(words),
+            'likes': str(rng.choice([0, 12, 800, 4500, 20000])),
+            'retweets': str(rng.randint(0, 150)),
+        })
+    # 特殊正则的样例放在最前面，一定参与结果对比
+    edge = [{'username': accounts[0], 'text': text, 'likes': '0', 'retweets': '0'} for text in EDGE_TEXTS]
+    return edge + tweets
+
+
+def compile_reference(matcher):
+    """每条规则单独编译的正则，作为正确性和速度的参照"""
+    return [
+        [re.compile(keyword_pattern(term), re.I) for term in rule.terms]
+        + [re.compile(regex, re.I) for regex in rule.regexes]
+        for rule in matcher.rules
+    ]
+
+
+def naive_match(matcher, reference, tweet_data):
+    """逐条规则检查"""
+    text = tweet_data['text']
+    likes = parse_count(tweet_data['likes'])
+    retweets = parse_count(tweet_data['retweets'])
+    matched = []
+    for rule, patterns in zip(matcher.rules, reference):
+        if rule.account not in (None, tweet_data['username']) or not rule.engagement_ok(likes, retweets):
+            continue
+        if not patterns or any(pattern.search(text) for pattern in patterns):
+            matched.append(rule.name)
+    return matched
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='提醒规则匹配器微基准测试')
+    arg_parser.add_argument('--rules', type=int, default=2000, help='规则数')
+    arg_parser.add_argument('--tweets', type=int, default=20000, help='推文数')
+    arg_parser.add_argument('--check', type=int, default=200, help='与逐条规则检查对比结果的推文数')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--min-rate', type=float, default=0, help='最低吞吐（条/秒），低于时返回 1')
+    args = arg_parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = [random_word(rng) for _ in range(max(args.rules, 100))]
+    accounts = [f"user{i}" for i in range(50)]
+    rules, account_rules = make_rules(args.rules, rng, vocabulary, accounts)
+    tweets = make_tweets(args.tweets, rng, vocabulary, accounts)
+
+    start = time.perf_counter()
+    matcher = AlertMatcher.from_config(rules, account_rules)
+    compile_seconds = time.perf_counter() - start
+    print(f"编译: {len(matcher.rules)} 条规则, {len(matcher.term_rules)} 个关键词, "
+          f"{len(matcher.regex_rules) + len(matcher.single_regex_rules)} 个正则, 耗时 {compile_seconds * 1000:.1f} 毫秒")
+
+    # 无效的正则在加载时报错
+    try:
+        AlertMatcher.from_config([{'name': 'broken', 'regex': '(unclosed'}], {})
+        print("无效的正则没有报错")
+        return 1
+    except ValueError as e:
+        print(f"无效的正则: {e}")
+
+    reference = compile_reference(matcher)
+    mismatches = [t for t in tweets[:args.check] if matcher.match(t) != naive_match(matcher, reference, t)]
+    for tweet_data in mismatches[:5]:
+        print(f"结果与逐条规则检查不一致: {tweet_data['text'][:80]}")
+
+    start = time.perf_counter()
+    hits = sum(1 for tweet_data in tweets if matcher.match(tweet_data))
+    elapsed = time.perf_counter() - start
+    rate = len(tweets) / elapsed if elapsed else 0
+    print(f"匹配: {len(tweets)} 条推文, 命中 {hits} 条, 每条 {elapsed / len(tweets) * 1e6:.1f} 微秒, {rate:.0f} 条/秒")
+
+    sample = tweets[:args.check]
+    start = time.perf_counter()
+    for tweet_data in sample:
+        naive_match(matcher, reference, tweet_data)
+    naive_elapsed = (time.perf_counter() - start) / len(sample) if sample else 0
+    if naive_elapsed:
+        print(f"逐条规则检查: 每条 {naive_elapsed * 1e6:.1f} 微秒 (慢 {naive_elapsed / (elapsed / len(tweets)):.0f} 倍)")
+
+    if mismatches:
+        return 1
+    if args.min_rate and rate < args.min_rate:
+        print(f"吞吐 {rate:.0f} 条/秒 低于门槛 {args.min_rate:.0f} 条/秒")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
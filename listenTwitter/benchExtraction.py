@@ -0,0 +1,136 @@
+"""推文提取路径的离线基准测试：无需浏览器和网络
+
+用法:
+    python benchExtraction.py                       # 使用内置的主页样本
+    python benchExtraction.py --pages captured/     # 使用保存的主页 HTML（<名称>.html）和推文接口响应（<名称>.json），可带 <名称>.expected.json
+    python benchExtraction.py --mode network        # 只测试推文接口响应的解析
+    python benchExtraction.py --save-fixtures fixtures/
+    python benchExtraction.py --min-rate 2000       # 低于该吞吐（条/秒）时返回非零退出码，可作为回归门槛
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from fakeTimeline import sample_corpus, sample_json_corpus, save_corpus
+from listenMaskTwitter import TimelineHtmlParser, TimelineJsonParser
+
+# 提取方式: (解析器, 内置样本, 页面文件扩展名)
+MODES = {
+    'html': (TimelineHtmlParser, sample_corpus, '.html'),
+    'network': (TimelineJsonParser, sample_json_corpus, '.json'),
+}
+
+
+def load_pages(directory, extension='.html'):
+    """读取目录中的 <名称><扩展名> 和可选的 <名称>.expected.json"""
+    pages = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(extension) or filename.endswith('.expected.json'):
+            continue
+        name = filename[:-len(extension)]
+        with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+            page = f.read()
+        expected = None
+        expected_file = os.path.join(directory, f"{name}.expected.json")
+        if os.path.exists(expected_file):
+            with open(expected_file, 'r', encoding='utf-8') as f:
+                expected = json.load(f)
+        pages[name] = (page, expected)
+    return pages
+
+
+def check_pages(parser, pages):
+    """校验解析结果与预期一致，返回出错的样本名称"""
+    failures = []
+    for name, (page, expected) in pages.items():
+        if expected is None:
+            continue
+        username = expected[0]['username'] if expected else 'unknown'
+        if parser.parse(page, username) != expected:
+            failures.append(name)
+    return failures
+
+
+def bench_page(parser, page, username, iterations):
+    """返回 (每页耗时秒, 每页推文数, 每页内存分配峰值字节)"""
+    tweets = parser.parse(page, username)
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parser.parse(page, username)
+    elapsed = (time.perf_counter() - start) / iterations
+
+    tracemalloc.start()
+    parser.parse(page, username)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, len(tweets), peak
+
+
+def run_mode(mode, pages, iterations):
+    """测试一种提取方式，返回 (出错的样本, 推文总数, 总耗时秒)"""
+    parser = MODES[mode][0](limit=5)
+
+    failures = check_pages(parser, pages)
+    for name in failures:
+        print(f"解析结果与预期不一致: {mode}/{name}")
+
+    total_time = 0.0
+    total_tweets = 0
+    print(f"[{mode}]")
+    print(f"{'页面':<16}{'推文数':>8}{'每页毫秒':>12}{'条/秒':>12}{'内存峰值KB':>14}")
+    for name, (page, expected) in pages.items():
+        username = expected[0]['username'] if expected else 'unknown'
+        elapsed, count, peak = bench_page(parser, page, username, iterations)
+        total_time += elapsed
+        total_tweets += count
+        rate = count / elapsed if elapsed else 0
+        print(f"{name:<16}{count:>8}{elapsed * 1000:>12.3f}{rate:>12.0f}{peak / 1024:>14.1f}")
+
+    overall = total_tweets / total_time if total_time else 0
+    print(f"合计: {len(pages)} 个页面, {total_tweets} 条推文, {overall:.0f} 条/秒")
+    return failures, total_tweets, total_time
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='推文提取路径离线基准测试')
+    arg_parser.add_argument('--pages', metavar='DIR', help='保存的主页 HTML 和推文接口响应目录，默认使用内置样本')
+    arg_parser.add_argument('--save-fixtures', metavar='DIR', help='把内置样本保存到目录后退出')
+    arg_parser.add_argument('--mode', choices=['all'] + list(MODES), default='all', help='测试的提取方式')
+    arg_parser.add_argument('--iterations', type=int, default=200, help='每个页面解析的次数')
+    arg_parser.add_argument('--min-rate', type=float, default=0, help='最低吞吐（条/秒），低于时返回 1')
+    args = arg_parser.parse_args()
+
+    if args.save_fixtures:
+        save_corpus(args.save_fixtures)
+        # 接口响应样本保存为 <名称>.response.json，与 HTML 样本的预期结果区分开
+        save_corpus(args.save_fixtures, {
+            f"{name}.response": sample for name, sample in sample_json_corpus().items()
+        }, extension='json')
+        print(f"已保存样本到 {args.save_fixtures}")
+        return 0
+
+    modes = list(MODES) if args.mode == 'all' else [args.mode]
+    failed = False
+    for mode in modes:
+        _, corpus, extension = MODES[mode]
+        pages = load_pages(args.pages, extension) if args.pages else corpus()
+        if not pages:
+            continue
+        failures, total_tweets, total_time = run_mode(mode, pages, args.iterations)
+        overall = total_tweets / total_time if total_time else 0
+        if failures:
+            failed = True
+        elif args.min_rate and overall < args.min_rate:
+            print(f"[{mode}] 吞吐 {overall:.0f} 条/秒 低于门槛 {args.min_rate:.0f} 条/秒")
+            failed = True
+        print()
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
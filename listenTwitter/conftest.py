@@ -0,0 +1,44 @@
+"""pytest 共用的夹具：在临时目录中创建不启动浏览器的 TweetMonitor"""
+import json
+import os
+
+import pytest
+
+from listenMaskTwitter import TweetMonitor
+
+
+@pytest.fixture
+def make_monitor(tmp_path, monkeypatch):
+    """返回创建 TweetMonitor 的函数，每个实例使用 tmp_path 下自己的目录（相当于一台机器），测试结束时关闭
+
+    create(name, accounts, node_id, **settings)：accounts 为 twitter_accounts.json 的内容，
+    settings 覆盖 config.json 中的顶层设置；默认只启用推文存储输出端，日志不输出到控制台
+    """
+    monitors = []
+
+    def create(name='monitor', accounts=None, node_id=None, **settings):
+        directory = tmp_path / name
+        directory.mkdir(exist_ok=True)
+        monkeypatch.chdir(directory)
+        config = {
+            'twitter_credentials': {'email': 'monitor@example.com', 'username': 'monitor', 'password': 'secret'},
+            'sinks': {'store': {}},
+            'logging': {'console': False},
+        }
+        config.update(settings)
+        with open('config.json', 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+        if accounts is None:
+            accounts = {'elonmusk': {'name': 'Elon Musk', 'username': 'elonmusk', 'last_tweet_id': None, 'enabled': True}}
+        with open('twitter_accounts.json', 'w', encoding='utf-8') as f:
+            json.dump(accounts, f, ensure_ascii=False)
+
+        monitor = TweetMonitor(node_id=node_id)
+        monitor.directory = os.fspath(directory)
+        monitors.append(monitor)
+        return monitor
+
+    yield create
+    for monitor in monitors:
+        if not monitor.stop_event.is_set():
+            monitor.shutdown()
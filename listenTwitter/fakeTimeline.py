@@ -0,0 +1,316 @@
+"""生成与 Twitter 主页结构一致的推文 HTML，用于离线解析测试、基准测试和本地模拟服务"""
+import html
+import json
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+
+def format_count(count):
+    """按 Twitter 界面的方式显示互动数，如 1.2K、3.4M"""
+    if count >= 1000000:
+        return f"{count / 1000000:.1f}M".replace('.0M', 'M')
+    if count >= 10000:
+        return f"{count // 1000}K"
+    if count >= 1000:
+        return f"{count / 1000:.1f}K".replace('.0K', 'K')
+    return str(count) if count else ''
+
+
+def render_tweet(username, tweet, pinned=False, retweeted_by=None, quote=None, author=None, retweet_id=None):
+    """渲染一条推文 article
+
+    tweet 字段: id, created_at, text（None 表示纯图片推文）, likes, retweets, replies
+    转推与真实页面一致：socialContext 为 "<retweeted_by> reposted"，作者和时间链接是原推文的作者 author；
+    页面上没有转推自己的 ID（retweet_id 只用于推文接口）
+    """
+    author = author or username
+    context = ''
+    if pinned:
+        context = '<div data-testid="socialContext"><span>Pinned</span></div>'
+    elif retweeted_by:
+        context = f'<div data-testid="socialContext"><span>{html.escape(retweeted_by)} reposted</span></div>'
+
+    text = ''
+    if tweet.get('text') is not None:
+        text = (
+            f'<div dir="auto" lang="en" data-testid="tweetText" class="css-1rynq56">'
+            f'<span class="css-1qaijid">{html.escape(tweet["text"])}</span></div>'
+        )
+
+    media = ''
+    if tweet.get('text') is None or tweet.get('media'):
+        media = (
+            '<div data-testid="tweetPhoto"><img alt="Image" '
+            f'src="https://pbs.twimg.com/media/{tweet["id"]}.jpg"></div>'
+        )
+
+    quoted = ''
+    if quote:
+        quoted = (
+            '<div role="link" tabindex="0" class="css-175oi2r">'
+            f'<div data-testid="User-Name"><span>@{html.escape(quote["username"])}</span></div>'
+            f'<time datetime="{quote["created_at"]}">{quote["created_at"][:10]}</time>'
+            f'<div data-testid="tweetText"><span>{html.escape(quote.get("text") or "")}</span></div>'
+            '</div>'
+        )
+
+    def action(testid, count):
+        return (
+            f'<button data-testid="{testid}" role="button" class="css-175oi2r">'
+            '<div dir="ltr"><svg viewBox="0 0 24 24"><g><path d=""></path></g></svg>'
+            f'<div><span data-testid="app-text-transition-container"><span>{format_count(count)}</span></span></div>'
+            '</div></button>'
+        )
+
+    return (
+        '<article aria-labelledby="id__tweet" role="article" tabindex="0" data-testid="tweet" class="css-175oi2r">'
+        '<div class="css-175oi2r"><div class="css-175oi2r">'
+        f'{context}'
+        '<div data-testid="Tweet-User-Avatar"><img alt="" src="https://pbs.twimg.com/profile_images/x.jpg"></div>'
+        f'<div data-testid="User-Name"><a href="/{html.escape(author)}" role="link"><span>{html.escape(author)}</span></a>'
+        f'<a href="/{html.escape(author)}/status/{tweet["id"]}" role="link">'
+        f'<time datetime="{tweet["created_at"]}">{tweet["created_at"][:10]}</time></a></div>'
+        f'{text}{media}{quoted}'
+        '<div role="group" aria-label="" class="css-175oi2r">'
+        f'{action("reply", tweet.get("replies", 0))}'
+        f'{action("retweet", tweet.get("retweets", 0))}'
+        f'{action("like", tweet.get("likes", 0))}'
+        f'<a href="/{html.escape(author)}/status/{tweet["id"]}/analytics" role="link"></a>'
+        '</div></div></div></article>'
+    )
+
+
+def render_timeline(username, entries, display_name=None):
+    """渲染完整的用户主页，entries 为 (tweet, options) 列表，options 同 render_tweet 的关键字参数"""
+    cells = ''.join(
+        f'<div data-testid="cellInnerDiv" style="position: absolute;">{render_tweet(username, tweet, **options)}</div>'
+        for tweet, options in entries
+    )
+    return (
+        '<!DOCTYPE html><html dir="ltr" lang="en"><head><meta charset="utf-8">'
+        f'<title>{html.escape(display_name or username)} (@{html.escape(username)}) / X</title></head>'
+        '<body><div id="react-root"><main role="main"><div data-testid="primaryColumn">'
+        f'<div data-testid="UserName"><span>{html.escape(display_name or username)}</span>'
+        f'<span>@{html.escape(username)}</span></div>'
+        f'<div data-testid="{html.escape(username)}-unfollow" role="button"><span>Following</span></div>'
+        f'<section role="region"><div aria-label="Timeline: {html.escape(username)}’s posts">{cells}</div></section>'
+        '</div></main>'
+        '<nav><a data-testid="AppTabBar_Home_Link" href="/home">Home</a></nav>'
+        '</div></body></html>'
+    )
+
+
+def make_tweet(tweet_id, created_at, text='', likes=0, retweets=0, replies=0, media=False):
+    return {
+        'id': str(tweet_id),
+        'created_at': created_at.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        'text': text,
+        'likes': likes,
+        'retweets': retweets,
+        'replies': replies,
+        'media': media,
+    }
+
+
+def render_tweet_result(username, tweet, quote=None):
+    """生成推文接口中一条推文的 tweet_results.result"""
+    created = datetime.strptime(tweet['created_at'], '%Y-%m-%dT%H:%M:%S.000Z')
+    text = tweet.get('text')
+    entities = {'hashtags': [], 'symbols': [], 'urls': [], 'user_mentions': []}
+    if text is None or tweet.get('media'):
+        # 图片推文的正文末尾带一个图片短链接
+        media_url = f"https://t.co/{tweet['id'][-10:]}"
+        entities['media'] = [{'url': media_url, 'type': 'photo',
+                              'media_url_https': f"https://pbs.twimg.com/media/{tweet['id']}.jpg"}]
+        text = f"{text} {media_url}" if text else media_url
+    full_text = html.escape(text, quote=False)
+
+    result = {
+        '__typename': 'Tweet',
+        'rest_id': tweet['id'],
+        'core': {'user_results': {'result': {
+            '__typename': 'User', 'legacy': {'screen_name': username, 'name': username}}}},
+        'legacy': {
+            'id_str': tweet['id'],
+            'created_at': created.strftime('%a %b %d %H:%M:%S +0000 %Y'),
+            'full_text': full_text,
+            'display_text_range': [0, len(full_text)],
+            'entities': entities,
+            'favorite_count': tweet.get('likes', 0),
+            'retweet_count': tweet.get('retweets', 0),
+            'reply_count': tweet.get('replies', 0),
+            'lang': 'en',
+        },
+    }
+    if len(text) > 280:
+        # 长推文的 full_text 被截断，完整文本在 note_tweet 中
+        result['note_tweet'] = {'note_tweet_results': {'result': {'text': text, 'entity_set': entities}}}
+        result['legacy']['full_text'] = full_text[:275] + '…'
+    if quote:
+        quoted = make_tweet(str(int(tweet['id']) - 7),
+                            datetime.strptime(quote['created_at'], '%Y-%m-%dT%H:%M:%S.000Z'), text=quote.get('text'))
+        result['quoted_status_result'] = {'result': render_tweet_result(quote['username'], quoted)}
+        result['legacy']['is_quote_status'] = True
+    return result
+
+
+def render_timeline_json(username, entries, user_id='44196397'):
+    """生成主页推文接口（GraphQL UserTweets）的响应，entries 同 render_timeline
+
+    置顶推文放在 TimelinePinEntry 中，转推有自己的 ID（retweet_id），原推文（作者为 author）放在 retweeted_status_result 中
+    """
+    instructions = [{'type': 'TimelineClearCache'}]
+    timeline_entries = []
+    for index, (tweet, options) in enumerate(entries):
+        author = options.get('author') or username
+        result = render_tweet_result(author, tweet, quote=options.get('quote'))
+        if options.get('retweeted_by'):
+            retweet_id = options.get('retweet_id') or str(int(tweet['id']) + 1)
+            result = {
+                '__typename': 'Tweet',
+                'rest_id': retweet_id,
+                'legacy': {
+                    'id_str': retweet_id,
+                    'created_at': result['legacy']['created_at'],
+                    'full_text': f"RT @{author}: {result['legacy']['full_text']}"[:140],
+                    'entities': {'hashtags': [], 'symbols': [], 'urls': [], 'user_mentions': []},
+                    'favorite_count': 0,
+                    'retweet_count': result['legacy']['retweet_count'],
+                    'retweeted_status_result': {'result': result},
+                },
+            }
+        entry = {
+            'entryId': f"tweet-{result['rest_id']}",
+            'sortIndex': str(int(tweet['id'])),
+            'content': {
+                'entryType': 'TimelineTimelineItem',
+                '__typename': 'TimelineTimelineItem',
+                'itemContent': {
+                    'itemType': 'TimelineTweet',
+                    '__typename': 'TimelineTweet',
+                    'tweet_results': {'result': result},
+                    'tweetDisplayType': 'Tweet',
+                },
+            },
+        }
+        if options.get('pinned'):
+            instructions.append({'type': 'TimelinePinEntry', 'entry': entry})
+        else:
+            timeline_entries.append(entry)
+    timeline_entries.append({
+        'entryId': f"cursor-bottom-{len(entries)}",
+        'sortIndex': '0',
+        'content': {'entryType': 'TimelineTimelineCursor', 'value': 'DAABCgABGSomething', 'cursorType': 'Bottom'},
+    })
+    instructions.append({'type': 'TimelineAddEntries', 'entries': timeline_entries})
+    return json.dumps({'data': {'user': {'result': {
+        '__typename': 'User',
+        'rest_id': user_id,
+        'timeline_v2': {'timeline': {'instructions': instructions, 'metadata': {}}},
+    }}}}, ensure_ascii=False)
+
+
+def sample_timelines(seed=0):
+    """生成覆盖常见情况的主页内容，返回 {名称: (用户名, entries)}"""
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 5, 12, 0, tzinfo=timezone.utc)
+    base_id = 1875583572092104795
+    timelines = {}
+
+    def timeline(name, username, specs):
+        entries = []
+        for index, (text, options) in enumerate(specs):
+            tweet_id = base_id - index * 1000
+            created_at = now - timedelta(minutes=37 * index)
+            if options.get('retweeted_by'):
+                # 转推一天前别人发的推文：页面上显示的是原推文的 ID 和时间，比后面的推文还旧
+                options = dict(options, retweet_id=str(tweet_id))
+                tweet_id -= 86400000 << 22
+                created_at -= timedelta(days=1)
+            tweet = make_tweet(
+                tweet_id,
+                created_at,
+                text=text,
+                likes=rng.choice([0, 7, 999, 1234, 15300, 2400000]),
+                retweets=rng.choice([0, 3, 1200, 45000]),
+                replies=rng.randint(0, 500),
+            )
+            entries.append((tweet, options))
+        timelines[name] = (username, entries)
+
+    quote = {'username': 'VitalikButerin', 'created_at': '2025-01-04T08:00:00.000Z', 'text': 'quoted text'}
+    timeline('plain', 'elonmusk', [(f'Tweet number {i} 🚀', {}) for i in range(5)])
+    timeline('pinned', 'cz_binance', [('Pinned announcement', {'pinned': True})] + [(f'Update {i}', {}) for i in range(4)])
+    timeline('retweets', 'VitalikButerin', [
+        ('Own tweet', {}),
+        ('Reposted tweet', {'retweeted_by': 'Vitalik Buterin', 'author': 'balajis'}),
+        ('Another own tweet', {}),
+        ('Reposted again', {'retweeted_by': 'Vitalik Buterin', 'author': 'sassal0x'}),
+        ('Last one', {}),
+    ])
+    timeline('quotes', 'JLiang93823', [('My take on this', {'quote': quote}), ('Plain', {}),
+                                        ('Quoting again', {'quote': quote}), ('Plain 2', {}), ('Plain 3', {})])
+    timeline('media_only', 'elonmusk', [(None, {}), ('With text', {}), (None, {}), ('Text again', {}), (None, {})])
+    timeline('unicode', 'cz_binance', [('中文推文 $BTC #币安 <b>不是标签</b> & 符号', {}), ('第二条 😀', {}),
+                                       ('多行\n文本', {}), ('Normal', {}), ('最后一条', {})])
+    return timelines
+
+
+def expected_tweets(username, entries, network=False):
+    """entries 对应的预期解析结果
+
+    页面上显示的是 1.2K 这样的缩写，只有原推文的 ID；推文接口（network 为 True）返回精确的整数，转推有自己的 ID
+    """
+    def count(value):
+        return str(value) if network else format_count(value) or '0'
+
+    expected = []
+    for tweet, options in entries:
+        tweet_data = {
+            'id': tweet['id'],
+            'username': username,
+            'text': tweet['text'] or '',
+            'created_at': tweet['created_at'],
+            'likes': count(tweet['likes']),
+            'retweets': count(tweet['retweets']),
+            'pinned': bool(options.get('pinned')),
+            'retweet': bool(options.get('retweeted_by')),
+        }
+        if network and options.get('retweeted_by'):
+            tweet_data['id'] = options.get('retweet_id') or str(int(tweet['id']) + 1)
+            tweet_data['retweeted_id'] = tweet['id']
+        expected.append(tweet_data)
+    return expected
+
+
+def sample_corpus(seed=0):
+    """主页 HTML 样本，返回 {名称: (html, 预期解析结果)}"""
+    return {
+        name: (render_timeline(username, entries), expected_tweets(username, entries))
+        for name, (username, entries) in sample_timelines(seed).items()
+    }
+
+
+def sample_json_corpus(seed=0):
+    """推文接口响应样本，返回 {名称: (json 文本, 预期解析结果)}"""
+    corpus = {}
+    for name, (username, entries) in sample_timelines(seed).items():
+        # 接口中置顶推文排在最前面
+        entries = sorted(entries, key=lambda entry: not entry[1].get('pinned'))
+        corpus[name] = (render_timeline_json(username, entries), expected_tweets(username, entries, network=True))
+    # 超过 280 字的长推文
+    username, entries = sample_timelines(seed)['plain']
+    entries = [(dict(tweet, text=tweet['text'] + ' ' + '长推文' * 120), options) for tweet, options in entries]
+    corpus['long_text'] = (render_timeline_json(username, entries), expected_tweets(username, entries, network=True))
+    return corpus
+
+
+def save_corpus(directory, corpus=None, extension='html'):
+    """把样本保存为 <名称>.html（接口响应样本为 <名称>.json）和 <名称>.expected.json"""
+    os.makedirs(directory, exist_ok=True)
+    for name, (content, expected) in (corpus or sample_corpus()).items():
+        with open(os.path.join(directory, f"{name}.{extension}"), 'w', encoding='utf-8') as f:
+            f.write(content)
+        with open(os.path.join(directory, f"{name}.expected.json"), 'w', encoding='utf-8') as f:
+            json.dump(expected, f, ensure_ascii=False, indent=4)
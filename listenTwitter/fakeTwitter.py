@@ -0,0 +1,322 @@
+"""本地模拟的 Twitter 服务：账号主页、主页推文接口和登录流程，用于在不访问真实网站的情况下测量 TweetMonitor
+
+每个账号按设定的频率（泊松过程）发布新推文，页面结构与 fakeTimeline 生成的样本一致；
+可以设置响应延迟和出错比例。/_sim/ 下的接口供 loadTest.py 查询已发布的推文和暂停发帖。
+
+用法:
+    python fakeTwitter.py                                  # 监听 127.0.0.1:8800，每个账号每小时约 30 条推文
+    python fakeTwitter.py --rate 120 --latency 0.5 --error-rate 0.02 --username-step
+然后在 config.json 中设置 "base_url": "http://127.0.0.1:8800"，登录信息可以随意填写
+"""
+import argparse
+import html
+import json
+import random
+import secrets
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from fakeTimeline import make_tweet, render_timeline, render_timeline_json
+
+# Snowflake ID 的起始时间（毫秒）
+TWITTER_EPOCH_MS = 1288834974657
+
+
+def snowflake_id(timestamp, sequence):
+    """按发布时间生成递增的推文 ID，与真实推文一样可以按数值比较先后"""
+    return ((int(timestamp * 1000) - TWITTER_EPOCH_MS) << 22) | (sequence & 0x3FFFFF)
+
+
+class FakeAccount:
+    """一个模拟账号：一条置顶的旧推文、若干条历史推文，以及按泊松过程不断发布的新推文"""
+
+    def __init__(self, username, index, rate_per_hour, start, seed=0, history=5):
+        self.username = username
+        self.index = index
+        self.rate_per_hour = rate_per_hour
+        self.rng = random.Random(f"{seed}-{username}")
+        self.lock = threading.Lock()
+        self.counter = 0
+        self.tweets = []  # (发布时间, tweet)，按时间正序
+        for age in range(history, 0, -1):
+            self._post(start - age * 3600)
+        self.pinned = make_tweet(snowflake_id(start - 30 * 86400, index << 10),
+                                 datetime.fromtimestamp(start - 30 * 86400, timezone.utc),
+                                 text=f"Pinned post from {username}", likes=1200)
+        self.next_post = start + self._gap()
+
+    def _gap(self):
+        if self.rate_per_hour <= 0:
+            return float('inf')
+        return self.rng.expovariate(self.rate_per_hour / 3600)
+
+    def _post(self, posted_at):
+        self.counter += 1
+        tweet = make_tweet(
+            snowflake_id(posted_at, (self.index << 10) | (self.counter & 0x3FF)),
+            datetime.fromtimestamp(posted_at, timezone.utc),
+            text=f"{self.username} post {self.counter} $BTC {self.rng.choice(['gm', 'shipping', '中文推文', 'update'])}",
+            likes=self.rng.choice([0, 5, 87, 1200, 15300]),
+            retweets=self.rng.choice([0, 2, 40, 3100]),
+            replies=self.rng.randint(0, 50),
+        )
+        self.tweets.append((posted_at, tweet))
+
+    def advance(self, now, until=None):
+        """发布到 now 为止（暂停发帖时到 until 为止）应发布的推文"""
+        limit = now if until is None else min(now, until)
+        while self.next_post <= limit:
+            self._post(self.next_post)
+            self.next_post += self._gap()
+
+    def timeline(self, now, until=None, size=20):
+        """主页内容：置顶推文加最新的 size 条推文"""
+        with self.lock:
+            self.advance(now, until)
+            latest = [tweet for _, tweet in reversed(self.tweets[-size:])]
+        return [(self.pinned, {'pinned': True})] + [(tweet, {}) for tweet in latest]
+
+    def posted_since(self, now, until=None, since=0):
+        with self.lock:
+            self.advance(now, until)
+            return [(posted_at, tweet) for posted_at, tweet in self.tweets if posted_at >= since]
+
+
+class FakeTwitter:
+    """模拟服务的状态：账号在第一次被访问时创建，发帖时间从服务启动时算起"""
+
+    def __init__(self, rate_per_hour=30, latency=0.2, error_rate=0.0, timeline_size=20, username_step=False, seed=0):
+        self.rate_per_hour = rate_per_hour
+        self.latency = latency
+        self.error_rate = error_rate
+        self.timeline_size = timeline_size
+        self.username_step = username_step
+        self.seed = seed
+        self.start = time.time()
+        self.paused_at = None
+        self.accounts = {}
+        self.sessions = set()
+        self.lock = threading.Lock()
+        self.stats = {'profile': 0, 'timeline': 0, 'login': 0, 'errors': 0}
+
+    def account(self, username):
+        with self.lock:
+            if username not in self.accounts:
+                self.accounts[username] = FakeAccount(username, len(self.accounts), self.rate_per_hour,
+                                                      self.start, seed=self.seed)
+            return self.accounts[username]
+
+    def count(self, key):
+        with self.lock:
+            self.stats[key] += 1
+
+    def entries(self, username):
+        return self.account(username).timeline(time.time(), until=self.paused_at, size=self.timeline_size)
+
+    def pause(self):
+        """停止发布新推文，之后的检查用于确认暂停前的推文都已被发现"""
+        self.paused_at = self.paused_at or time.time()
+        return self.paused_at
+
+    def posted(self, since=0):
+        """since 之后发布的所有推文，按发布时间排序"""
+        with self.lock:
+            accounts = list(self.accounts.values())
+        records = []
+        for account in accounts:
+            records.extend(
+                {'id': tweet['id'], 'username': account.username, 'posted_at': posted_at}
+                for posted_at, tweet in account.posted_since(time.time(), self.paused_at, since)
+            )
+        return sorted(records, key=lambda record: record['posted_at'])
+
+    def delay(self):
+        if self.latency > 0:
+            time.sleep(random.uniform(0.5, 1.5) * self.latency)
+
+    def fail(self):
+        """按 error_rate 的比例让请求出错"""
+        if self.error_rate > 0 and random.random() < self.error_rate:
+            self.count('errors')
+            return True
+        return False
+
+
+def login_page(title, action, field):
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8">'
+        f'<title>{html.escape(title)} / X</title></head><body><main role="main">'
+        f'<form method="post" action="{action}">{field}</form>'
+        '</main></body></html>'
+    )
+
+
+HOME_PAGE = (
+    '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Home / X</title></head><body>'
+    '<div id="react-root"><nav><a data-testid="AppTabBar_Home_Link" href="/home">Home</a></nav>'
+    '<main role="main"><div data-testid="primaryColumn"></div></main></div></body></html>'
+)
+
+# 主页加载后像真实页面一样请求推文接口，network 提取方式从性能日志中读取它的响应
+TIMELINE_FETCH_SCRIPT = (
+    '<script>fetch("/i/api/graphql/FakeQueryId/UserTweets?variables=" + '
+    'encodeURIComponent(JSON.stringify({screen_name: %s, count: 20})))</script>'
+)
+
+
+class FakeTwitterHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    site = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        path = url.path.rstrip('/') or '/'
+        if path == '/robots.txt':
+            self.respond(200, 'User-agent: *\nDisallow:\n', 'text/plain; charset=utf-8')
+        elif path in ('/login', '/i/flow/login'):
+            self.respond(200, login_page('Log in', '/i/flow/login', '<input autocomplete="username" name="text">'))
+        elif path == '/home':
+            if self.logged_in():
+                self.respond(200, HOME_PAGE)
+            else:
+                self.redirect('/login')
+        elif path.startswith('/i/api/graphql/') and path.endswith('/UserTweets'):
+            self.timeline_json(parse_qs(url.query))
+        elif path == '/_sim/posted':
+            since = float(parse_qs(url.query).get('since', ['0'])[0])
+            self.respond(200, json.dumps(self.site.posted(since)), 'application/json')
+        elif path == '/_sim/stats':
+            self.respond(200, json.dumps(dict(self.site.stats, accounts=len(self.site.accounts))), 'application/json')
+        elif path.count('/') == 1 and len(path) > 1:
+            self.profile(path[1:])
+        else:
+            self.respond(404, '<html><body>Not found</body></html>')
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        path = urlsplit(self.path).path
+        if path == '/i/flow/login':
+            # 可选的"输入用户名"步骤，对应登录流程中的异常登录验证
+            if self.site.username_step:
+                self.respond(200, login_page('Enter your username', '/i/flow/username',
+                                             '<input data-testid="ocfEnterTextTextInput" name="text">'))
+            else:
+                self.password_page()
+        elif path == '/i/flow/username':
+            self.password_page()
+        elif path == '/i/flow/password':
+            token = secrets.token_hex(16)
+            self.site.sessions.add(token)
+            self.site.count('login')
+            self.redirect('/home', cookie=f"auth_token={token}; Path=/; HttpOnly")
+        elif path == '/_sim/pause':
+            self.respond(200, json.dumps({'paused_at': self.site.pause()}), 'application/json')
+        else:
+            self.respond(404, '<html><body>Not found</body></html>')
+
+    def password_page(self):
+        self.respond(200, login_page('Enter your password', '/i/flow/password',
+                                     '<input name="password" type="password">'))
+
+    def logged_in(self):
+        cookies = dict(
+            part.strip().split('=', 1) for part in (self.headers.get('Cookie') or '').split(';') if '=' in part
+        )
+        return cookies.get('auth_token') in self.site.sessions
+
+    def profile(self, username):
+        if not self.logged_in():
+            self.redirect('/login')
+            return
+        self.site.count('profile')
+        self.site.delay()
+        if self.site.fail():
+            self.respond(503, '<html><body><div data-testid="error-detail">Something went wrong.</div></body></html>')
+            return
+        page = render_timeline(username, self.site.entries(username))
+        script = TIMELINE_FETCH_SCRIPT % json.dumps(username)
+        self.respond(200, page.replace('</body>', script + '</body>'))
+
+    def timeline_json(self, query):
+        try:
+            username = json.loads(query['variables'][0])['screen_name']
+        except (KeyError, IndexError, ValueError):
+            self.respond(400, '{"errors": [{"message": "bad request"}]}', 'application/json')
+            return
+        self.site.count('timeline')
+        self.site.delay()
+        if self.site.fail():
+            self.respond(503, '{"errors": [{"message": "Over capacity"}]}', 'application/json')
+            return
+        self.respond(200, render_timeline_json(username, self.site.entries(username)), 'application/json')
+
+    def redirect(self, location, cookie=None):
+        self.send_response(302)
+        self.send_header('Location', location)
+        if cookie:
+            self.send_header('Set-Cookie', cookie)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def respond(self, status, body, content_type='text/html; charset=utf-8'):
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeTwitterServer:
+    """在后台线程中运行模拟服务"""
+
+    def __init__(self, site, host='127.0.0.1', port=8800):
+        handler = type('Handler', (FakeTwitterHandler,), {'site': site})
+        self.site = site
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='FakeTwitter', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='本地模拟的 Twitter 服务')
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8800, help='监听端口，0 表示随机端口')
+    arg_parser.add_argument('--rate', type=float, default=30, help='每个账号每小时平均发布的推文数')
+    arg_parser.add_argument('--latency', type=float, default=0.2, help='主页和推文接口的平均响应延迟（秒）')
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help='主页和推文接口出错的比例')
+    arg_parser.add_argument('--timeline-size', type=int, default=20, help='主页显示的推文条数（不含置顶）')
+    arg_parser.add_argument('--username-step', action='store_true', help='登录时要求额外输入用户名')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    args = arg_parser.parse_args()
+
+    site = FakeTwitter(rate_per_hour=args.rate, latency=args.latency, error_rate=args.error_rate,
+                       timeline_size=args.timeline_size, username_step=args.username_step, seed=args.seed)
+    server = FakeTwitterServer(site, args.host, args.port)
+    print(f"模拟服务地址: {server.url}", flush=True)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,20 +5,2042 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
+from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 import json
+import html
 import time
-from datetime import datetime
+from datetime import datetime, timezone
 import os
 import logging
 import random
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 import smtplib
+import queue
+import threading
+import bisect
+import sqlite3
+import argparse
+import socket
+import re
+import hashlib
+import copy
+import heapq
+import math
+import sys
+import traceback
+import cProfile
+import contextlib
+import http.client
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 
-class TweetMonitor:
+try:
+    from lxml import html as lxml_html
+except ImportError:  # 仅 extraction_mode 为 html 时需要
+    lxml_html = None
+
+try:
+    import psutil
+except ImportError:  # 未安装时不检查浏览器内存
+    psutil = None
+
+# 默认的站点地址，可在 config.json 的 base_url 中改为镜像站或本地模拟服务
+DEFAULT_BASE_URL = 'https://twitter.com'
+
+# 页面就绪等待的默认超时（秒），可在 config.json 的 monitor_settings.step_timeouts 中按步骤覆盖
+DEFAULT_STEP_TIMEOUT = 20
+DEFAULT_STEP_TIMEOUTS = {
+    'login_page': 20,
+    'login_next': 10,
+    'login_password': 20,
+    'login_done': 20,
+    'profile_tweets': 20,
+    'profile_complete': 3,
+    'follow_profile': 8,
+    'session_probe': 10,
+    'timeline_response': 15,
+}
+
+
+class LatencyHistogram:
+    """按固定分桶统计耗时（秒），线程安全"""
+
+    BUCKETS = (0.1, 0.25, 0.5, 1, 2, 3, 5, 8, 10, 15, 20, 30)
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets or self.BUCKETS)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个桶为 +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.timeouts = 0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        """记录一次耗时"""
+        with self.lock:
+            index = bisect.bisect_left(self.buckets, seconds)
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+
+    def observe_timeout(self):
+        """记录一次超时"""
+        with self.lock:
+            self.timeouts += 1
+
+    def percentile(self, p):
+        """按分桶估算分位数，返回所在桶的上界"""
+        with self.lock:
+            if not self.count:
+                return 0.0
+            target = self.count * p / 100
+            seen = 0
+            for index, bucket_count in enumerate(self.counts):
+                seen += bucket_count
+                if seen >= target:
+                    return self.buckets[index] if index < len(self.buckets) else self.max
+            return self.max
+
+    def summary(self):
+        """生成便于日志输出的摘要"""
+        if not self.count:
+            return "暂无数据"
+        return (
+            f"次数 {self.count}, 平均 {self.total / self.count:.2f}s, "
+            f"p50≤{self.percentile(50)}s, p90≤{self.percentile(90)}s, "
+            f"最大 {self.max:.2f}s, 超时 {self.timeouts}"
+        )
+
+
+class MetricsRegistry:
+    """进程内指标（计数器、数值、直方图），可以输出为 Prometheus 文本格式"""
+
     def __init__(self):
+        self.definitions = {}  # {name: (type, help)}
+        self.values = {}       # {name: {labels: 数值或 LatencyHistogram}}
+        self.collectors = []   # 抓取时调用，返回 [(name, labels, value)]
+        self.lock = threading.Lock()
+
+    def define(self, name, metric_type, help_text, buckets=None):
+        with self.lock:
+            self.definitions[name] = (metric_type, help_text, buckets)
+            self.values.setdefault(name, {})
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.values.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values.setdefault(name, {})[key] = value
+
+    def histogram(self, name, **labels):
+        """获取（不存在时创建）某组标签对应的直方图"""
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.values.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                buckets = self.definitions.get(name, (None, None, None))[2]
+                histogram = series[key] = LatencyHistogram(buckets)
+            return histogram
+
+    def observe(self, name, value, **labels):
+        self.histogram(name, **labels).observe(value)
+
+    def series(self, name):
+        """返回某个指标的 [(labels dict, 值)]"""
+        with self.lock:
+            return [(dict(key), value) for key, value in self.values.get(name, {}).items()]
+
+    def add_collector(self, collector):
+        """注册抓取时才计算的指标（队列长度、内存等）"""
+        self.collectors.append(collector)
+
+    def render(self):
+        """输出 Prometheus 文本格式"""
+        collected = {}
+        for collector in self.collectors:
+            try:
+                for name, labels, value in collector():
+                    collected.setdefault(name, []).append((labels, value))
+            except Exception:
+                continue
+
+        lines = []
+        with self.lock:
+            names = sorted(set(self.definitions) | set(self.values) | set(collected))
+            snapshot = {name: list(self.values.get(name, {}).items()) for name in names}
+            definitions = dict(self.definitions)
+
+        for name in names:
+            metric_type, help_text, _ = definitions.get(name, ('gauge', '', None))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            series = [(dict(key), value) for key, value in snapshot[name]] + collected.get(name, [])
+            for labels, value in series:
+                if isinstance(value, LatencyHistogram):
+                    lines.extend(self._render_histogram(name, labels, value))
+                else:
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def _render_histogram(self, name, labels, histogram):
+        with histogram.lock:
+            counts = list(histogram.counts)
+            total = histogram.total
+            count = histogram.count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(list(histogram.buckets) + ['+Inf'], counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{format_labels(dict(labels, le=bound))} {cumulative}")
+        lines.append(f"{name}_sum{format_labels(labels)} {total}")
+        lines.append(f"{name}_count{format_labels(labels)} {count}")
+        return lines
+
+
+def format_labels(labels):
+    """把标签格式化为 {key="value",...}"""
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+class MetricsServer:
+    """在本地端口提供 /metrics（Prometheus 文本格式）和 /debug/stacks（所有线程的当前调用栈）"""
+
+    def __init__(self, registry, host='127.0.0.1', port=9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] == '/metrics':
+                    body = registry.render().encode('utf-8')
+                    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+                elif self.path.split('?')[0] == '/debug/stacks':
+                    body = format_thread_stacks().encode('utf-8')
+                    content_type = 'text/plain; charset=utf-8'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name='MetricsServer', daemon=True).start()
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def format_thread_stacks():
+    """输出所有线程当前的调用栈，便于在线排查卡住或变慢的位置"""
+    names = {thread.ident: thread.name for thread in threading.enumerate()}
+    lines = []
+    for thread_id, frame in sys._current_frames().items():
+        lines.append(f"--- {names.get(thread_id, thread_id)} ---")
+        lines.extend(line.rstrip('\n') for line in traceback.format_stack(frame))
+    return '\n'.join(lines) + '\n'
+
+
+# 结构化日志（JSON Lines）中附加的字段，通过 logger 的 extra 参数传入
+LOG_FIELDS = ('account', 'phase', 'duration', 'tweet_id')
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+
+class JsonLineFormatter(logging.Formatter):
+    """每条日志输出一行 JSON，附带账号、阶段、耗时、推文 ID 等字段"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'thread': record.threadName,
+            'message': record.getMessage().strip(),
+        }
+        for field in LOG_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """把日志记录原样放入队列，由 QueueListener 的后台线程格式化和写出；统计入队的条数和耗时"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.listener = None
+        self.records = 0
+        self.enqueue_seconds = 0.0
+
+    def prepare(self, record):
+        # 默认实现会在调用线程中格式化消息；队列只在本进程内使用，格式化留给后台线程
+        return record
+
+    def emit(self, record):
+        # Handler.handle 持有 self.lock，计数不会并发修改
+        start = time.perf_counter()
+        super().emit(record)
+        self.enqueue_seconds += time.perf_counter() - start
+        self.records += 1
+
+
+class TimedQueueListener(QueueListener):
+    """在后台线程中写出日志，统计格式化和写出的耗时"""
+
+    def __init__(self, log_queue, *handlers):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.write_seconds = 0.0
+
+    def handle(self, record):
+        start = time.perf_counter()
+        super().handle(record)
+        self.write_seconds += time.perf_counter() - start
+
+
+class SeenIdCache:
+    """有容量上限的最近推文 ID 集合（LRU）"""
+
+    def __init__(self, capacity=200):
+        self.capacity = capacity
+        self.ids = OrderedDict()
+
+    def __contains__(self, tweet_id):
+        return tweet_id in self.ids
+
+    def __len__(self):
+        return len(self.ids)
+
+    def add(self, tweet_id):
+        """记录一个 ID，返回是否为新加入"""
+        if tweet_id in self.ids:
+            self.ids.move_to_end(tweet_id)
+            return False
+        self.ids[tweet_id] = None
+        if len(self.ids) > self.capacity:
+            self.ids.popitem(last=False)
+        return True
+
+    def add_all(self, tweet_ids):
+        """记录多个 ID，返回新加入的 ID 列表"""
+        return [tweet_id for tweet_id in tweet_ids if self.add(tweet_id)]
+
+    def to_list(self):
+        return list(self.ids)
+
+
+class AccountStateStore:
+    """账号运行状态（last_tweet_id、见过的推文 ID、检查耗时等）的追加写入日志
+
+    每行一条 JSON 记录，按批追加写入，启动时重放；日志过长时原子地重写为快照。
+    与用户编辑的 twitter_accounts.json 分开保存，运行中不再改写账号配置文件。
+    """
+
+    def __init__(self, path, seen_capacity=200, batch_size=50, compact_every=5000):
+        self.path = path
+        self.seen_capacity = seen_capacity
+        self.batch_size = batch_size
+        self.compact_every = compact_every
+        self.records_since_compact = 0
+
+        self.fields = {}  # {username: {field: value}}
+        self.seen = {}    # {username: SeenIdCache}
+        self.pending = []
+        self.lock = threading.RLock()
+
+    def load(self):
+        """重放日志，恢复每个账号的状态"""
+        if not os.path.exists(self.path):
+            return
+
+        with self.lock, open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 进程中断时最后一行可能不完整
+                    continue
+                self._apply(record)
+                self.records_since_compact += 1
+
+    def _apply(self, record):
+        username = record.pop('username')
+        seen_ids = record.pop('seen', None)
+        if seen_ids:
+            self.seen_ids(username).add_all(seen_ids)
+        if record:
+            self.fields.setdefault(username, {}).update(record)
+
+    def seen_ids(self, username):
+        """获取账号最近见过的推文 ID 集合"""
+        with self.lock:
+            cache = self.seen.get(username)
+            if cache is None:
+                cache = self.seen[username] = SeenIdCache(self.seen_capacity)
+            return cache
+
+    def get(self, username, field, default=None):
+        with self.lock:
+            return self.fields.get(username, {}).get(field, default)
+
+    def update(self, username, **fields):
+        """更新账号状态字段"""
+        with self.lock:
+            self.fields.setdefault(username, {}).update(fields)
+            self._append(dict(fields, username=username))
+
+    def add_seen(self, username, tweet_ids):
+        """记录见过的推文 ID，返回新加入的 ID 列表"""
+        with self.lock:
+            added = self.seen_ids(username).add_all(tweet_ids)
+            if added:
+                self._append({'username': username, 'seen': added})
+            return added
+
+    def _append(self, record):
+        self.pending.append(json.dumps(record, ensure_ascii=False))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """把缓冲的记录一次性追加到日志"""
+        with self.lock:
+            if not self.pending:
+                return
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(self.pending) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            self.records_since_compact += len(self.pending)
+            self.pending = []
+
+            if self.records_since_compact >= self.compact_every:
+                self.compact()
+
+    def compact(self):
+        """用当前内存中的状态原子地重写日志"""
+        tmp_path = self.path + '.tmp'
+        with self.lock:
+            usernames = set(self.fields) | set(self.seen)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for username in sorted(usernames):
+                    record = dict(self.fields.get(username, {}), username=username)
+                    if username in self.seen:
+                        record['seen'] = self.seen[username].to_list()
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self.records_since_compact = len(usernames)
+            self.pending = []
+
+
+class Sink:
+    """推文输出端：独立的有界队列和后台线程，按批写出，失败时重试
+
+    policy 为 drop 时队列满了直接丢弃；为 block 时最多等待 block_timeout 秒再丢弃，
+    任何输出端变慢都不会让检查推文的线程长时间阻塞。
+    """
+
+    name = 'sink'
+
+    def __init__(self, logger, queue_size=1000, policy='drop', block_timeout=5,
+                 batch_size=1, batch_window=0, retries=2, retry_backoff=1, idle_timeout=60, only_matched=False,
+                 metrics=None):
+        self.logger = logger
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.idle_timeout = idle_timeout
+        # 启用提醒规则时只接收命中规则的推文
+        self.only_matched = only_matched
+        self.metrics = metrics
+        # 一批推文处理完（写出或重试后放弃）时调用，由 TweetPipeline 设置
+        self.on_written = None
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+
+    def start(self):
+        """启动后台写出线程"""
+        self.thread = threading.Thread(target=self._run, name=f"Sink-{self.name}", daemon=True)
+        self.thread.start()
+
+    def submit(self, tweet_data):
+        """提交一条推文，队列已满（block 策略下等待超时）时丢弃并返回 False"""
+        try:
+            if self.policy == 'block':
+                self.queue.put((time.perf_counter(), tweet_data), timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait((time.perf_counter(), tweet_data))
+            return True
+        except queue.Full:
+            self.logger.warning(f"{self.name} 输出队列已满，丢弃 {tweet_data['username']} 的推文 {tweet_data['id']}")
+            if self.metrics:
+                self.metrics.inc('tweet_monitor_sink_dropped_total', sink=self.name)
+            return False
+
+    def stop(self, timeout=30):
+        """写完队列中的推文后停止；写出卡住（例如 webhook 无响应）超过 timeout 秒时丢弃队列中剩余的推文"""
+        if self.thread is None:
+            return
+        deadline = time.time() + timeout
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self.thread.join(max(deadline - time.time(), 0))
+        if self.thread.is_alive():
+            dropped = 0
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not None:
+                    dropped += 1
+            # 写出线程恢复后直接退出
+            self.queue.put_nowait(None)
+            self.logger.error(f"{self.name} 输出端 {timeout} 秒内未写完，丢弃队列中剩余的 {dropped} 条推文")
+            if self.metrics and dropped:
+                self.metrics.inc('tweet_monitor_sink_dropped_total', dropped, sink=self.name)
+        self.thread = None
+
+    def write(self, batch):
+        """写出一批推文，失败时抛出异常"""
+        raise NotImplementedError
+
+    def idle(self):
+        """长时间没有推文时调用，可用于断开空闲连接"""
+
+    def close(self):
+        """停止前调用"""
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                self.idle()
+                continue
+
+            if item is None:
+                self.close()
+                return
+
+            batch = [item]
+            stopping = False
+            # 在 batch_window 内（为 0 时只取已在队列中的）凑够 batch_size 条再写出
+            deadline = time.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.time()
+                try:
+                    item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            if stopping:
+                self.close()
+                return
+
+    def _write(self, batch):
+        tweets = [tweet_data for _, tweet_data in batch]
+        for attempt in range(self.retries + 1):
+            try:
+                self.write(tweets)
+                break
+            except Exception as e:
+                if attempt < self.retries:
+                    if self.metrics:
+                        self.metrics.inc('tweet_monitor_sink_retries_total', sink=self.name)
+                    self.logger.warning(f"{self.name} 写出失败，{self.retry_backoff * 2 ** attempt} 秒后重试: {e}")
+                    time.sleep(self.retry_backoff * 2 ** attempt)
+                    continue
+                self.logger.error(f"{self.name} 写出 {len(tweets)} 条推文失败: {e}")
+                if self.metrics:
+                    self.metrics.inc('tweet_monitor_sink_failures_total', sink=self.name)
+                self._written(tweets)
+                return
+
+        if self.metrics:
+            # 从检测到推文到写出完成的延迟
+            now = time.perf_counter()
+            for submitted, _ in batch:
+                self.metrics.observe('tweet_monitor_sink_delivery_seconds', now - submitted, sink=self.name)
+        self._written(tweets)
+
+    def _written(self, tweets):
+        if self.on_written is None:
+            return
+        try:
+            self.on_written(tweets)
+        except Exception as e:
+            self.logger.error(f"{self.name} 确认 {len(tweets)} 条推文已写出时出错: {e}")
+
+
+class NotificationDispatcher(Sink):
+    """邮件输出端：复用已登录的 SMTP 连接，可选把短时间内的多条推文合并成一封摘要邮件"""
+
+    name = 'email'
+
+    def __init__(self, smtp_server, smtp_port, sender_email, sender_password, recipients, logger,
+                 queue_size=100, digest_window=0, idle_timeout=60, use_tls=True, base_url=DEFAULT_BASE_URL,
+                 metrics=None, **options):
+        # 摘要模式下合并窗口内的所有推文；否则逐条发送
+        options.setdefault('batch_size', 1000 if digest_window > 0 else 1)
+        options.setdefault('retries', 0)
+        options.setdefault('only_matched', True)
+        super().__init__(logger, queue_size=queue_size, batch_window=digest_window,
+                         idle_timeout=idle_timeout, metrics=metrics, **options)
+        self.smtp_server = smtp_server
+        self.smtp_port = smtp_port
+        self.sender_email = sender_email
+        self.sender_password = sender_password
+        self.recipients = [r for r in recipients if r]
+        self.digest_window = digest_window
+        self.use_tls = use_tls
+        self.base_url = base_url
+        self.server = None
+
+    def write(self, batch):
+        if self.digest_window > 0 and len(batch) > 1:
+            messages = [format_digest_email(batch, self.base_url)]
+        else:
+            messages = [format_tweet_email(tweet_data, self.base_url) for tweet_data in batch]
+
+        for subject, body in messages:
+            self._send(subject, body)
+        self.logger.info(f"已发送邮件通知到 {', '.join(self.recipients)} ({len(batch)} 条推文)")
+
+    def idle(self):
+        # 长时间空闲时主动断开，避免被服务器超时断开
+        self._disconnect()
+
+    def close(self):
+        self._disconnect()
+
+    def _connect(self):
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+        if self.use_tls:
+            server.starttls()
+        server.login(self.sender_email, self.sender_password)
+        return server
+
+    def _disconnect(self):
+        if self.server is None:
+            return
+        try:
+            self.server.quit()
+        except Exception:
+            pass
+        self.server = None
+
+    def _send(self, subject, body):
+        msg = MIMEMultipart()
+        msg['From'] = self.sender_email
+        msg['To'] = ', '.join(self.recipients)
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain', 'utf-8'))
+
+        # 连接断开时重连一次再发送
+        for attempt in range(2):
+            if self.server is None:
+                self.server = self._connect()
+            try:
+                self.server.send_message(msg, to_addrs=self.recipients)
+                return
+            except OSError:  # SMTPException 也是 OSError 的子类
+                self.server = None
+                if attempt:
+                    raise
+
+
+def format_tweet_email(tweet_data, base_url=DEFAULT_BASE_URL):
+    """生成单条推文的邮件标题和正文"""
+    subject = f"新推文通知 - 来自 {tweet_data['username']}"
+    if tweet_data.get('matched_rules'):
+        subject += f" [{', '.join(tweet_data['matched_rules'])}]"
+    body = f"""
+检测到新推文！
+
+用户: {tweet_data['username']}
+时间: {tweet_data['created_at']}
+内容: {tweet_data['text']}
+点赞: {tweet_data['likes']}
+转发: {tweet_data['retweets']}
+
+推文链接: {base_url}/{tweet_data['username']}/status/{tweet_data['id']}
+    """
+    return subject, body
+
+
+def format_digest_email(batch, base_url=DEFAULT_BASE_URL):
+    """生成多条推文合并的摘要邮件标题和正文"""
+    usernames = sorted({tweet_data['username'] for tweet_data in batch})
+    subject = f"新推文摘要 - {len(batch)} 条，来自 {', '.join(usernames)}"
+    body = '\n'.join(format_tweet_email(tweet_data, base_url)[1] for tweet_data in batch)
+    return subject, body
+
+
+class StoreSink(Sink):
+    """推文存储输出端（SQLite 或 JSON 文件）"""
+
+    name = 'store'
+
+    def __init__(self, store, logger, **options):
+        options.setdefault('policy', 'block')
+        options.setdefault('batch_size', 50)
+        options.setdefault('batch_window', 1)
+        super().__init__(logger, **options)
+        self.store = store
+
+    def write(self, batch):
+        for tweet_data in batch:
+            location = self.store.save(tweet_data)
+        # 每批写完后立即写入数据库（不等存储自己的 batch_size / flush_interval），写出完成即已落盘
+        self.store.flush()
+        self.logger.debug("已保存 %d 条推文到存储 %s", len(batch), location)
+
+
+class JsonlSink(Sink):
+    """追加写入 JSON Lines 文件，每行一条推文"""
+
+    name = 'jsonl'
+
+    def __init__(self, path, logger, fsync=False, **options):
+        options.setdefault('batch_size', 100)
+        super().__init__(logger, **options)
+        self.path = path
+        self.fsync = fsync
+
+    def write(self, batch):
+        lines = ''.join(json.dumps(tweet_data, ensure_ascii=False) + '\n' for tweet_data in batch)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+
+class StdoutSink(Sink):
+    """输出到标准输出，每行一条推文 JSON，便于通过管道交给其他程序"""
+
+    name = 'stdout'
+
+    def write(self, batch):
+        sys.stdout.write(''.join(json.dumps(tweet_data, ensure_ascii=False) + '\n' for tweet_data in batch))
+        sys.stdout.flush()
+
+
+class WebhookSink(Sink):
+    """以 JSON 批量 POST 到 HTTP 接口: {"tweets": [...]}，复用同一个连接"""
+
+    name = 'webhook'
+
+    def __init__(self, url, logger, headers=None, timeout=5, **options):
+        options.setdefault('batch_size', 20)
+        options.setdefault('batch_window', 0.05)
+        options.setdefault('retries', 3)
+        options.setdefault('retry_backoff', 0.5)
+        super().__init__(logger, **options)
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f"不支持的 webhook 地址: {url}")
+        self.url = url
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.path = parts.path or '/'
+        if parts.query:
+            self.path += '?' + parts.query
+        self.headers = {'Content-Type': 'application/json', **(headers or {})}
+        self.timeout = timeout
+        self.conn = None
+
+    def write(self, batch):
+        body = json.dumps({'tweets': batch}, ensure_ascii=False).encode('utf-8')
+        if self.conn is None:
+            connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            self.conn = connection_class(self.netloc, timeout=self.timeout)
+        try:
+            self.conn.request('POST', self.path, body=body, headers=self.headers)
+            response = self.conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            # 连接可能已被服务器关闭，下次重试时重新连接
+            self._disconnect()
+            raise
+        if response.status >= 300:
+            raise RuntimeError(f"webhook 返回 HTTP {response.status}")
+
+    def idle(self):
+        self._disconnect()
+
+    def close(self):
+        self._disconnect()
+
+    def _disconnect(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class TweetPipeline:
+    """把检测到的新推文分发给所有输出端，各输出端互不影响
+
+    设置了 on_delivered 时，一条推文被所有接收它的输出端处理完（写出、重试后放弃或队列满丢弃）后，
+    在输出端的后台线程中以推文 ID 列表调用 on_delivered
+    """
+
+    def __init__(self, sinks, metrics=None, on_delivered=None):
+        self.sinks = sinks
+        self.metrics = metrics
+        self.on_delivered = on_delivered
+        self.outstanding = {}  # {推文 ID: 还没有处理完的输出端数}
+        self.lock = threading.Lock()
+        for sink in sinks:
+            sink.on_written = self._written
+
+    def start(self):
+        for sink in self.sinks:
+            sink.start()
+
+    def publish(self, tweet_data):
+        """发布一条新推文，只放入各输出端的队列，不等待写出
+
+        tweet_data 中 matched_rules 为空列表（启用了提醒规则但没有命中）时跳过只接收命中推文的输出端
+        """
+        matched = tweet_data.get('matched_rules') != []
+        sinks = [sink for sink in self.sinks if matched or not sink.only_matched]
+        if self.on_delivered is not None:
+            if not sinks:
+                self.on_delivered([tweet_data['id']])
+                return
+            with self.lock:
+                self.outstanding[tweet_data['id']] = self.outstanding.get(tweet_data['id'], 0) + len(sinks)
+        for sink in sinks:
+            if not sink.submit(tweet_data):
+                sink._written([tweet_data])
+
+    def _written(self, tweets):
+        """记录一批推文已由一个输出端处理完"""
+        if self.on_delivered is None:
+            return
+        delivered = []
+        with self.lock:
+            for tweet_data in tweets:
+                remaining = self.outstanding.get(tweet_data['id'])
+                if remaining is None:
+                    continue
+                if remaining <= 1:
+                    del self.outstanding[tweet_data['id']]
+                    delivered.append(tweet_data['id'])
+                else:
+                    self.outstanding[tweet_data['id']] = remaining - 1
+        if delivered:
+            self.on_delivered(delivered)
+
+    def stop(self, timeout=30):
+        for sink in self.sinks:
+            sink.stop(timeout)
+
+    def queue_depths(self):
+        return {sink.name: sink.queue.qsize() for sink in self.sinks}
+
+
+class PollScheduler:
+    """按下次到期时间排序的账号轮询调度器（最小堆）
+
+    根据每个账号的发帖频率分配轮询间隔：在浏览器总检查能力固定的前提下，
+    间隔与发帖频率的平方根成反比，可使所有推文的平均发现延迟最小。
+    adaptive 为 False 时不按发帖频率分配，账号配置中没有 poll_interval 的账号都使用 default_interval。
+    """
+
+    def __init__(self, default_interval=60, min_interval=30, max_interval=900, utilization=0.8, adaptive=True):
+        self.default_interval = default_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.utilization = utilization
+        self.adaptive = adaptive
+
+        self.heap = []       # [(due_time, username)]
+        self.due_at = {}     # {username: due_time}，用于识别堆中过期的条目
+        self.intervals = {}  # {username: 秒}
+        self.rates = {}      # {username: 条/小时}
+        self.lock = threading.Lock()
+
+    def sync(self, accounts):
+        """与账号配置同步：新启用的账号立即到期，移除停用或删除的账号"""
+        with self.lock:
+            enabled = {u for u, info in accounts.items() if info.get('enabled', True)}
+            for username in list(self.due_at):
+                if username not in enabled:
+                    del self.due_at[username]
+            now = time.time()
+            for username in enabled:
+                if username not in self.due_at:
+                    self._push(username, now)
+
+    def _push(self, username, due_time):
+        self.due_at[username] = due_time
+        heapq.heappush(self.heap, (due_time, username))
+
+    def pop_due(self, now=None):
+        """取出所有已到期的账号"""
+        now = time.time() if now is None else now
+        due = []
+        with self.lock:
+            while self.heap and self.heap[0][0] <= now:
+                due_time, username = heapq.heappop(self.heap)
+                if self.due_at.get(username) == due_time:
+                    due.append(username)
+        return due
+
+    def discard(self, username):
+        """移除账号（取出后没有检查，例如已由其他节点负责），下次 sync 时仍需要检查的账号会立即到期"""
+        with self.lock:
+            self.due_at.pop(username, None)
+
+    def next_due_time(self):
+        """最近一个账号的到期时间，没有账号时返回 None"""
+        with self.lock:
+            while self.heap and self.due_at.get(self.heap[0][1]) != self.heap[0][0]:
+                heapq.heappop(self.heap)
+            return self.heap[0][0] if self.heap else None
+
+    def reschedule(self, username, interval=None, now=None):
+        """检查完成后安排下一次检查（带 ±10% 随机抖动）"""
+        now = time.time() if now is None else now
+        with self.lock:
+            if username not in self.due_at:
+                return
+            if interval is None:
+                interval = self.intervals.get(username, self.default_interval)
+            self._push(username, now + interval * random.uniform(0.9, 1.1))
+
+    def update_intervals(self, accounts, rates, polls_per_hour):
+        """根据发帖频率（条/小时）和每小时可检查次数重新分配轮询间隔"""
+        budget = polls_per_hour * self.utilization
+        # 还没有估算出发帖频率的账号按已知频率的中位数参与分配
+        known = sorted(rate for username, rate in rates.items() if rate and username in accounts)
+        prior = known[len(known) // 2] if known else 1.0
+        intervals = {}
+        adaptive = {}
+        for username, info in accounts.items():
+            if not info.get('enabled', True):
+                continue
+            if info.get('poll_interval'):
+                # 账号配置中指定了固定间隔
+                intervals[username] = info['poll_interval']
+            elif self.adaptive:
+                adaptive[username] = rates.get(username) or prior
+            else:
+                intervals[username] = self.default_interval
+
+        # 扣除固定间隔账号占用的检查次数，剩余的按 sqrt(发帖频率) 分配
+        budget -= sum(3600 / interval for interval in intervals.values())
+        if adaptive:
+            total_sqrt = sum(math.sqrt(rate) for rate in adaptive.values())
+            for username, rate in adaptive.items():
+                if budget > 0:
+                    polls = budget * math.sqrt(rate) / total_sqrt
+                    interval = 3600 / polls
+                else:
+                    interval = self.max_interval
+                info = accounts[username]
+                low = info.get('min_interval', self.min_interval)
+                high = info.get('max_interval', self.max_interval)
+                intervals[username] = min(max(interval, low), high)
+
+        with self.lock:
+            self.intervals = intervals
+            self.rates = dict(rates)
+
+    def expected_latency(self, username, check_seconds=0):
+        """预计发现延迟（秒）：平均等待半个轮询间隔再加上一次检查耗时"""
+        with self.lock:
+            interval = self.intervals.get(username, self.default_interval)
+        return interval / 2 + check_seconds
+
+    def report(self, check_seconds=0):
+        """各账号的发帖频率、轮询间隔和预计发现延迟"""
+        with self.lock:
+            usernames = sorted(self.due_at)
+            rates = dict(self.rates)
+        return [
+            {
+                'username': username,
+                'rate_per_hour': rates.get(username, 0),
+                'interval': self.intervals.get(username, self.default_interval),
+                'expected_latency': self.expected_latency(username, check_seconds),
+            }
+            for username in usernames
+        ]
+
+
+def estimate_posting_rate(tweets):
+    """根据推文发布时间估算发帖频率（条/小时），数据不足时返回 None"""
+    times = []
+    for tweet_data in tweets:
+        try:
+            times.append(datetime.fromisoformat(tweet_data['created_at'].replace('Z', '+00:00')))
+        except (KeyError, TypeError, ValueError):
+            continue
+    if len(times) < 2:
+        return None
+
+    span_hours = (max(times) - min(times)).total_seconds() / 3600
+    # 最近一条推文之后的沉默时间也计入，避免很久不发帖的账号仍被当作活跃账号
+    silence_hours = max((datetime.now(max(times).tzinfo) - max(times)).total_seconds() / 3600, 0)
+    return (len(times) - 1) / max(span_hours + silence_hours, 1 / 60)
+
+
+class DriverSlot:
+    """一个工作线程使用的浏览器位置，可以在后台换上新的浏览器而不中断检查"""
+
+    def __init__(self, index, driver):
+        self.index = index
+        self.driver = driver
+        self.generation = 0
+        self.created_at = time.time()
+        self.latencies = deque(maxlen=20)  # 最近几次检查账号的耗时（秒）
+        self.recycling = False
+        self.recycle_thread = None
+        # 位置被移除（关闭所有浏览器）后，进行中的替换不再换上新浏览器
+        self.retired = False
+        # 检查账号时持有；换浏览器时等待当前账号检查完成
+        self.lock = threading.Lock()
+
+    def average_latency(self):
+        return sum(self.latencies) / len(self.latencies) if self.latencies else 0
+
+    def swap(self, driver):
+        """换上新的浏览器，返回需要关闭的浏览器：旧的浏览器，位置已被移除时为新的浏览器"""
+        with self.lock:
+            if self.retired:
+                return driver
+            old_driver = self.driver
+            self.driver = driver
+            self.generation += 1
+            self.created_at = time.time()
+            self.latencies.clear()
+        return old_driver
+
+    def retire(self):
+        """移除位置，返回当前的浏览器"""
+        with self.lock:
+            self.retired = True
+            return self.driver
+
+
+class TokenBucket:
+    """令牌桶限速：平均每小时 rate_per_hour 次，最多连续 burst 次"""
+
+    def __init__(self, rate_per_hour, burst=1):
+        self.rate = rate_per_hour / 3600
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self):
+        """取一个令牌，返回还需要等待的秒数（0 表示已取到）"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate if self.rate > 0 else float('inf')
+
+    def wait(self, stop_event):
+        """等到取得令牌，stop_event 被设置时返回 False"""
+        while True:
+            delay = self.take()
+            if delay == 0:
+                return True
+            if stop_event.wait(min(delay, 60)):
+                return False
+
+
+def driver_pid(driver):
+    """ChromeDriver 的进程 ID（Chrome 进程都是它的子进程）"""
+    process = getattr(getattr(driver, 'service', None), 'process', None)
+    return process.pid if process else None
+
+
+def process_tree_rss(pid):
+    """进程及其所有子进程的常驻内存（字节），无法获取时返回 None"""
+    if psutil is None or pid is None:
+        return None
+    try:
+        process = psutil.Process(pid)
+        total = process.memory_info().rss
+        for child in process.children(recursive=True):
+            try:
+                total += child.memory_info().rss
+            except psutil.Error:
+                continue
+        return total
+    except psutil.Error:
+        return None
+
+
+class TweetStore:
+    """推文存储后端基类"""
+
+    def prepare_accounts(self, usernames):
+        """为账号准备存储空间"""
+
+    def save(self, tweet_data):
+        """保存一条推文"""
+        raise NotImplementedError
+
+    def flush(self):
+        """把缓冲中的推文写入存储"""
+
+    def has_tweet(self, tweet_id):
+        """是否已保存过该推文"""
+        raise NotImplementedError
+
+    def latest_tweets(self, username, limit=10):
+        """获取某个账号最新的若干条推文（按发布时间倒序）"""
+        raise NotImplementedError
+
+    def tweets_between(self, start, end, username=None):
+        """获取发布时间在 [start, end) 范围内的推文（按发布时间正序）"""
+        raise NotImplementedError
+
+    def close(self):
+        """关闭存储"""
+        self.flush()
+
+
+class JsonFileTweetStore(TweetStore):
+    """每条推文一个 JSON 文件：tweets_data/<username>/tweet_<timestamp>_<id>.json"""
+
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+
+    def prepare_accounts(self, usernames):
+        for username in usernames:
+            user_dir = os.path.join(self.base_dir, username)
+            if not os.path.exists(user_dir):
+                os.makedirs(user_dir)
+
+    def save(self, tweet_data):
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        user_dir = os.path.join(self.base_dir, tweet_data['username'])
+        os.makedirs(user_dir, exist_ok=True)
+        filename = os.path.join(user_dir, f"tweet_{timestamp}_{tweet_data['id']}.json")
+
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(tweet_data, f, ensure_ascii=False, indent=4)
+        return filename
+
+    def iter_tweets(self, username=None):
+        """遍历目录中保存的所有推文"""
+        if not os.path.exists(self.base_dir):
+            return
+        usernames = [username] if username else os.listdir(self.base_dir)
+        for name in usernames:
+            user_dir = os.path.join(self.base_dir, name)
+            if not os.path.isdir(user_dir):
+                continue
+            for filename in os.listdir(user_dir):
+                if not filename.endswith('.json'):
+                    continue
+                with open(os.path.join(user_dir, filename), 'r', encoding='utf-8') as f:
+                    yield json.load(f)
+
+    def has_tweet(self, tweet_id):
+        return any(tweet.get('id') == tweet_id for tweet in self.iter_tweets())
+
+    def latest_tweets(self, username, limit=10):
+        tweets = sorted(self.iter_tweets(username), key=lambda t: t.get('created_at') or '', reverse=True)
+        return tweets[:limit]
+
+    def tweets_between(self, start, end, username=None):
+        tweets = [
+            tweet for tweet in self.iter_tweets(username)
+            if start <= (tweet.get('created_at') or '') < end
+        ]
+        return sorted(tweets, key=lambda t: t['created_at'])
+
+
+class SqliteTweetStore(TweetStore):
+    """SQLite 推文存储：WAL 模式、批量写入、按推文 ID 去重"""
+
+    COLUMNS = ('id', 'username', 'text', 'created_at', 'likes', 'retweets')
+
+    def __init__(self, path, batch_size=20, flush_interval=5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = []
+        self.last_flush = time.time()
+        self.lock = threading.Lock()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tweets (
+                id TEXT PRIMARY KEY,
+                username TEXT NOT NULL,
+                text TEXT,
+                created_at TEXT,
+                likes TEXT,
+                retweets TEXT,
+                saved_at TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_tweets_username_created ON tweets (username, created_at);
+            CREATE INDEX IF NOT EXISTS idx_tweets_created ON tweets (created_at);
+        """)
+        self.conn.commit()
+
+    def to_row(self, tweet_data):
+        """把 tweet_data 转换成数据库行"""
+        return tuple(tweet_data.get(column) for column in self.COLUMNS) + (
+            datetime.now().isoformat(timespec='seconds'),
+            json.dumps(tweet_data, ensure_ascii=False),
+        )
+
+    def save(self, tweet_data):
+        row = self.to_row(tweet_data)
+        with self.lock:
+            self.pending.append(row)
+            due = (
+                len(self.pending) >= self.batch_size
+                or time.time() - self.last_flush >= self.flush_interval
+            )
+        if due:
+            self.flush()
+        return self.path
+
+    def flush(self):
+        with self.lock:
+            rows, self.pending = self.pending, []
+            self.last_flush = time.time()
+            if not rows:
+                return 0
+            with self.conn:
+                cursor = self.conn.executemany(
+                    'INSERT OR IGNORE INTO tweets '
+                    '(id, username, text, created_at, likes, retweets, saved_at, data) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                    rows
+                )
+            return cursor.rowcount
+
+    def query(self, sql, params=()):
+        """先写入缓冲再查询，返回 tweet_data 列表"""
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [json.loads(row['data']) for row in rows]
+
+    def has_tweet(self, tweet_id):
+        with self.lock:
+            if any(row[0] == tweet_id for row in self.pending):
+                return True
+            row = self.conn.execute('SELECT 1 FROM tweets WHERE id = ?', (tweet_id,)).fetchone()
+        return row is not None
+
+    def latest_tweets(self, username, limit=10):
+        return self.query(
+            'SELECT data FROM tweets WHERE username = ? ORDER BY created_at DESC LIMIT ?',
+            (username, limit)
+        )
+
+    def tweets_between(self, start, end, username=None):
+        if username:
+            return self.query(
+                'SELECT data FROM tweets WHERE username = ? AND created_at >= ? AND created_at < ? '
+                'ORDER BY created_at',
+                (username, start, end)
+            )
+        return self.query(
+            'SELECT data FROM tweets WHERE created_at >= ? AND created_at < ? ORDER BY created_at',
+            (start, end)
+        )
+
+    def import_json_tree(self, base_dir):
+        """一次性导入旧的 tweets_data/ 目录，返回 (读取数, 新增数)"""
+        total = 0
+        inserted = 0
+        for tweet_data in JsonFileTweetStore(base_dir).iter_tweets():
+            if not tweet_data.get('id') or not tweet_data.get('username'):
+                continue
+            with self.lock:
+                self.pending.append(self.to_row(tweet_data))
+                due = len(self.pending) >= 500
+            total += 1
+            if due:
+                inserted += self.flush()
+        inserted += self.flush()
+        return total, inserted
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.conn.close()
+
+
+class LeaseCoordinator:
+    """多个监控进程（可在不同机器上）通过共享的 SQLite 数据库分配账号
+
+    每个节点定期心跳并续租自己的账号，租约过期（节点崩溃）后由其他节点接手；
+    每个节点认领的账号数不超过 ceil(账号数 / 存活节点数)，新节点加入时其他节点让出多余的账号。
+    每条新推文发布前在 notified 表中登记为 pending（保证只由一个节点发布），所有输出端写完后改为 delivered；
+    节点崩溃时留下的 pending 推文由接手账号的节点重新发布。登记超过 claim_retention 秒后删除。
+    每个账号的 last_tweet_id 也保存在租约中，接手的节点从这里继续检查。
+    """
+
+    def __init__(self, path, node_id, lease_ttl=60, claim_retention=7 * 86400):
+        self.path = path
+        self.node_id = node_id
+        self.lease_ttl = lease_ttl
+        self.claim_retention = claim_retention
+        # 本进程启动前以同一个 node_id 登记的 pending 推文（上次运行崩溃时留下的）也需要重新发布
+        self.started_at = time.time()
+        self.last_prune = 0
+        self.lock = threading.Lock()
+
+        # 共享卷（NFS 等）上不能使用 WAL，使用默认的回滚日志并在锁冲突时等待
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS nodes (
+                node_id TEXT PRIMARY KEY,
+                heartbeat REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS leases (
+                username TEXT PRIMARY KEY,
+                node_id TEXT,
+                expires_at REAL NOT NULL DEFAULT 0,
+                last_tweet_id TEXT
+            );
+            CREATE TABLE IF NOT EXISTS notified (
+                tweet_id TEXT PRIMARY KEY,
+                node_id TEXT NOT NULL,
+                notified_at REAL NOT NULL
+            );
+        """)
+        # 旧版本的 notified 表只有推文 ID，已有的记录都视为已发布
+        columns = {row[1] for row in self.conn.execute('PRAGMA table_info(notified)')}
+        for column, definition in (('username', 'TEXT'), ('status', "TEXT NOT NULL DEFAULT 'delivered'"),
+                                   ('data', 'TEXT')):
+            if column not in columns:
+                self.conn.execute(f'ALTER TABLE notified ADD COLUMN {column} {definition}')
+        self.conn.executescript("""
+            CREATE INDEX IF NOT EXISTS idx_notified_status ON notified (status, username);
+            CREATE INDEX IF NOT EXISTS idx_notified_at ON notified (notified_at);
+        """)
+
+    def _transaction(self, work):
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = work(self.conn)
+                self.conn.execute('COMMIT')
+                return result
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def refresh(self, usernames):
+        """心跳、续租并按公平份额认领或让出账号，返回本节点负责的账号集合"""
+        usernames = set(usernames)
+
+        def work(conn):
+            now = time.time()
+            conn.execute(
+                'INSERT INTO nodes (node_id, heartbeat) VALUES (?, ?) '
+                'ON CONFLICT(node_id) DO UPDATE SET heartbeat = excluded.heartbeat',
+                (self.node_id, now)
+            )
+            conn.execute('DELETE FROM nodes WHERE heartbeat < ?', (now - self.lease_ttl,))
+            live_nodes = conn.execute('SELECT COUNT(*) FROM nodes').fetchone()[0]
+            share = math.ceil(len(usernames) / max(live_nodes, 1))
+
+            owned = {
+                row[0] for row in conn.execute(
+                    'SELECT username FROM leases WHERE node_id = ? AND expires_at >= ?', (self.node_id, now)
+                )
+            }
+            # 账号已从配置中删除，或者份额变小（有新节点加入）时让出多余的账号
+            released = owned - usernames
+            released.update(sorted(owned & usernames)[share:])
+            for username in released:
+                conn.execute('UPDATE leases SET node_id = NULL, expires_at = 0 WHERE username = ?', (username,))
+            owned -= released
+
+            # 认领没有节点负责或租约已过期的账号
+            if len(owned) < share:
+                free = [
+                    row[0] for row in conn.execute(
+                        'SELECT username FROM leases WHERE node_id IS NULL OR expires_at < ?', (now,)
+                    )
+                ]
+                known = {row[0] for row in conn.execute('SELECT username FROM leases')}
+                candidates = sorted(set(free) & usernames) + sorted(usernames - known)
+                for username in candidates[:share - len(owned)]:
+                    conn.execute(
+                        'INSERT INTO leases (username, node_id, expires_at) VALUES (?, ?, 0) '
+                        'ON CONFLICT(username) DO UPDATE SET node_id = excluded.node_id',
+                        (username, self.node_id)
+                    )
+                    owned.add(username)
+
+            conn.executemany(
+                'UPDATE leases SET expires_at = ? WHERE username = ? AND node_id = ?',
+                [(now + self.lease_ttl, username, self.node_id) for username in owned]
+            )
+            
+            # 定期删除过期的登记，notified 表不会无限增长
+            if now - self.last_prune >= 3600:
+                conn.execute('DELETE FROM notified WHERE notified_at < ?', (now - self.claim_retention,))
+                self.last_prune = now
+            return owned
+
+        return self._transaction(work)
+
+    def release_all(self):
+        """正常退出时立即让出所有账号"""
+        def work(conn):
+            conn.execute('UPDATE leases SET node_id = NULL, expires_at = 0 WHERE node_id = ?', (self.node_id,))
+            conn.execute('DELETE FROM nodes WHERE node_id = ?', (self.node_id,))
+
+        self._transaction(work)
+
+    def watermarks(self, usernames):
+        """各账号保存在租约中的 last_tweet_id"""
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT username, last_tweet_id FROM leases WHERE username IN ({','.join('?' * len(usernames))}) "
+                "AND last_tweet_id IS NOT NULL",
+                list(usernames)
+            ).fetchall()
+        return dict(rows)
+
+    def save_watermark(self, username, last_tweet_id):
+        """保存账号的 last_tweet_id（只有持有租约的节点才能更新）"""
+        with self.lock:
+            self.conn.execute(
+                'UPDATE leases SET last_tweet_id = ? WHERE username = ? AND node_id = ?',
+                (str(last_tweet_id), username, self.node_id)
+            )
+
+    def claim_notification(self, username, tweet_data):
+        """把一条推文登记为 pending（保存推文内容以便崩溃后重新发布），返回 False 表示已经由其他节点（或本节点）发布过"""
+        with self.lock:
+            cursor = self.conn.execute(
+                'INSERT OR IGNORE INTO notified (tweet_id, node_id, notified_at, username, status, data) '
+                "VALUES (?, ?, ?, ?, 'pending', ?)",
+                (str(tweet_data['id']), self.node_id, time.time(), username, json.dumps(tweet_data, ensure_ascii=False))
+            )
+        return cursor.rowcount == 1
+
+    def mark_delivered(self, tweet_ids):
+        """所有输出端都已写出的推文改为 delivered"""
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE notified SET status = 'delivered', data = NULL WHERE tweet_id = ? AND status = 'pending'",
+                [(str(tweet_id),) for tweet_id in tweet_ids]
+            )
+
+    def take_stale_claims(self):
+        """接手本节点负责的账号中已下线节点（或本节点上次运行）留下的 pending 推文，返回需要重新发布的 tweet_data 列表"""
+        def work(conn):
+            now = time.time()
+            rows = conn.execute(
+                "SELECT tweet_id, data FROM notified WHERE status = 'pending' "
+                'AND username IN (SELECT username FROM leases WHERE node_id = ? AND expires_at >= ?) '
+                'AND (node_id NOT IN (SELECT node_id FROM nodes WHERE heartbeat >= ?) '
+                '     OR (node_id = ? AND notified_at < ?))',
+                (self.node_id, now, now - self.lease_ttl, self.node_id, self.started_at)
+            ).fetchall()
+            conn.executemany(
+                'UPDATE notified SET node_id = ?, notified_at = ? WHERE tweet_id = ?',
+                [(self.node_id, now, tweet_id) for tweet_id, _ in rows]
+            )
+            return [json.loads(data) for _, data in rows if data]
+
+        return self._transaction(work)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def file_hash(path):
+    """计算文件内容的哈希，文件不存在时返回 None"""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+# 互动数缩写单位
+COUNT_UNITS = {'K': 1000, 'M': 1000000, 'B': 1000000000, '万': 10000, '亿': 100000000}
+
+# 置顶推文的 socialContext 文案（中英文界面）
+PINNED_PATTERN = r'Pinned|置顶|已置顶'
+# 转推的 socialContext 文案（"xxx reposted"，中文界面为 "xxx 已转帖" 等）
+RETWEET_PATTERN = r'reposted|retweeted|转推|转帖'
+
+def parse_count(value):
+    """把 "1,234"、"1.2K"、"3.4M"、"1.2万" 之类的互动数转换为整数"""
+    if value is None:
+        return 0
+    text = str(value).strip().replace(',', '').replace(' ', '')
+    if not text:
+        return 0
+    multiplier = COUNT_UNITS.get(text[-1].upper(), 1)
+    if multiplier != 1:
+        text = text[:-1]
+    try:
+        return int(round(float(text) * multiplier))
+    except ValueError:
+        return 0
+
+
+def build_tweet_data(username, tweet_link, text, created_at, likes, retweets, pinned=False, retweet=False):
+    """把提取到的原始字段整理成 tweet_data（页面上的转推只有原推文的链接，id 为原推文的 ID）"""
+    tweet_id = tweet_link.split('/status/')[1].split('?')[0].split('/')[0]
+    
+    # 处理空字符串和数字格式化
+    likes = '0' if not likes else likes.replace(',', '')
+    retweets = '0' if not retweets else retweets.replace(',', '')
+    
+    return {
+        'id': tweet_id,
+        'username': username,
+        'text': text,
+        'created_at': created_at,
+        'likes': likes,
+        'retweets': retweets,
+        'pinned': pinned,
+        'retweet': retweet
+    }
+
+
+def has_timeline_id(tweet_data):
+    """推文 ID 能否代表它在时间线上的先后：页面上的转推只有原推文的 ID（可能是很久以前的推文），
+    推文接口中的转推有自己的 ID（原推文的 ID 在 retweeted_id 中）"""
+    return not tweet_data.get('retweet') or 'retweeted_id' in tweet_data
+
+
+class AlertRule:
+    """一条提醒规则：关键词、股票代码（$BTC）、正则表达式中任意一个命中，且互动数达到下限"""
+
+    def __init__(self, name, keywords=(), cashtags=(), regex=(), min_likes=0, min_retweets=0, account=None):
+        self.name = name
+        self.keywords = [k for k in keywords if k]
+        self.cashtags = ['$' + c.lstrip('$') for c in cashtags if c.lstrip('$')]
+        self.regexes = [regex] if isinstance(regex, str) else [r for r in regex if r]
+        # 每个正则单独编译，配置有误时在加载时就报错
+        self.patterns = []
+        for pattern in self.regexes:
+            try:
+                self.patterns.append(re.compile(pattern, re.I))
+            except re.error as e:
+                raise ValueError(f"提醒规则 {name} 的正则 {pattern!r} 无效: {e}") from None
+        self.min_likes = parse_count(min_likes)
+        self.min_retweets = parse_count(min_retweets)
+        self.account = account  # 为 None 时适用于所有账号
+
+    @classmethod
+    def from_config(cls, settings, default_name, account=None):
+        return cls(
+            settings.get('name', default_name),
+            keywords=settings.get('keywords', ()),
+            cashtags=settings.get('cashtags', ()),
+            regex=settings.get('regex', ()),
+            min_likes=settings.get('min_likes', 0),
+            min_retweets=settings.get('min_retweets', 0),
+            account=account
+        )
+
+    @property
+    def terms(self):
+        return self.keywords + self.cashtags
+
+    def engagement_ok(self, likes, retweets):
+        return likes >= self.min_likes and retweets >= self.min_retweets
+
+
+# 正则中的内联标志，如 (?i) 或 (?s:...)
+INLINE_FLAG_PATTERN = re.compile(r'\(\?[aiLmsux-]+[:)]')
+
+# 英文单词（关键词两端是这些字符时要求完整的词）
+WORD_PATTERN = re.compile(r'[A-Za-z0-9_]+')
+
+
+def keyword_pattern(term):
+    """关键词的正则：不区分大小写；以英文字母或数字开头/结尾时要求是完整的词，中文等按子串匹配"""
+    pattern = re.escape(term)
+    if WORD_PATTERN.match(term[0]):
+        pattern = r'(?<![A-Za-z0-9_])' + pattern
+    if WORD_PATTERN.match(term[-1]):
+        pattern += r'(?![A-Za-z0-9_])'
+    return pattern
+
+
+class AlertMatcher:
+    """把所有规则编译成一个多模式匹配器，每条推文只扫描一遍
+
+    两端都是英文单词字符的关键词（可带 $ 前缀，即股票代码）放进哈希表：把推文切成单词，
+    按相邻 1~N 个单词组成的原文片段查表，耗时与规则数无关。其余关键词（中文、以符号开头结尾的）
+    合并为一个正则，从每个匹配位置的下一个字符继续查找，并补上被更长关键词包含的关键词。
+    没有分组、反向引用和内联标志的自定义正则合并为一个正则作为预筛选，只有预筛选命中时才逐个检查；
+    其余的正则（合并后含义会改变或无法编译）逐个检查。
+    结果与逐条规则检查一致。
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.term_rules = {}  # {小写关键词: [规则序号]}
+        for index, rule in enumerate(rules):
+            for term in rule.terms:
+                self.term_rules.setdefault(term.lower(), []).append(index)
+
+        self.word_terms = set()
+        other_terms = []
+        self.max_words = 0
+        for term in self.term_rules:
+            core = term[1:] if term.startswith('$') else term
+            if core and WORD_PATTERN.match(core[0]) and WORD_PATTERN.match(core[-1]):
+                self.word_terms.add(term)
+                self.max_words = max(self.max_words, len(WORD_PATTERN.findall(core)))
+            else:
+                other_terms.append(term)
+
+        other_terms.sort(key=len, reverse=True)
+        self.term_pattern = (
+            re.compile('|'.join(keyword_pattern(t) for t in other_terms), re.I) if other_terms else None
+        )
+        # 被其他关键词包含的关键词: 长关键词命中时它们一定也出现在文本中
+        self.contained = {}
+        other_set = set(other_terms)
+        for term in other_terms:
+            substrings = {term[i:j] for i in range(len(term)) for j in range(i + 1, len(term) + 1)} - {term}
+            inner = [
+                other for other in substrings
+                if other in other_set and re.search(keyword_pattern(other), term, re.I)
+            ]
+            if inner:
+                self.contained[term] = inner
+
+        self.regex_rules = []  # [(编译后的正则, 规则序号)]，参与合并预筛选
+        self.single_regex_rules = []  # 含分组、反向引用或内联标志，逐个检查
+        for index, rule in enumerate(rules):
+            for regex in rule.patterns:
+                if regex.groups or INLINE_FLAG_PATTERN.search(regex.pattern):
+                    self.single_regex_rules.append((regex, index))
+                else:
+                    self.regex_rules.append((regex, index))
+        self.regex_prefilter = (
+            re.compile('|'.join(f"(?:{regex.pattern})" for regex, _ in self.regex_rules), re.I)
+            if self.regex_rules else None
+        )
+        # 只有互动数条件的规则对每条推文都要检查
+        self.always = [index for index, rule in enumerate(rules) if not rule.terms and not rule.regexes]
+
+    @classmethod
+    def from_config(cls, global_rules, accounts):
+        """由全局规则和各账号的 alert_rules 创建"""
+        rules = [AlertRule.from_config(settings, f"rule{i + 1}") for i, settings in enumerate(global_rules)]
+        for username, account_info in accounts.items():
+            for i, settings in enumerate(account_info.get('alert_rules', [])):
+                rules.append(AlertRule.from_config(settings, f"@{username}#{i + 1}", account=username))
+        return cls(rules)
+
+    def matched_terms(self, text):
+        """文本中出现的所有关键词（小写）"""
+        found = set()
+        if self.word_terms:
+            spans = [match.span() for match in WORD_PATTERN.finditer(text)]
+            word_terms = self.word_terms
+            for i, (start, _) in enumerate(spans):
+                cashtag = start > 0 and text[start - 1] == '$'
+                for end_index in range(i, min(i + self.max_words, len(spans))):
+                    phrase = text[start:spans[end_index][1]].lower()
+                    if phrase in word_terms:
+                        found.add(phrase)
+                    if cashtag and '$' + phrase in word_terms:
+                        found.add('$' + phrase)
+
+        if self.term_pattern is not None:
+            pos = 0
+            search = self.term_pattern.search
+            while True:
+                match = search(text, pos)
+                if match is None:
+                    break
+                term = match.group().lower()
+                found.add(term)
+                found.update(self.contained.get(term, ()))
+                pos = match.start() + 1
+        return found
+
+    def match(self, tweet_data):
+        """返回命中的规则名称列表"""
+        text = tweet_data.get('text') or ''
+        candidates = set(self.always)
+        for term in self.matched_terms(text):
+            candidates.update(self.term_rules.get(term, ()))
+        if self.regex_prefilter is not None and self.regex_prefilter.search(text):
+            candidates.update(index for regex, index in self.regex_rules if regex.search(text))
+        candidates.update(index for regex, index in self.single_regex_rules if regex.search(text))
+
+        username = tweet_data.get('username')
+        likes = parse_count(tweet_data.get('likes'))
+        retweets = parse_count(tweet_data.get('retweets'))
+        return [
+            self.rules[index].name
+            for index in sorted(candidates)
+            if self.rules[index].account in (None, username) and self.rules[index].engagement_ok(likes, retweets)
+        ]
+
+
+class TimelineHtmlParser:
+    """从主页 HTML（浏览器 page_source 或保存的页面）中解析推文，不依赖浏览器"""
+
+    def __init__(self, limit=5):
+        self.limit = limit
+        self.pinned_pattern = re.compile(PINNED_PATTERN, re.I)
+        self.retweet_pattern = re.compile(RETWEET_PATTERN, re.I)
+
+    def parse(self, page_html, username):
+        """返回与 get_tweets 相同字段的 tweet_data 列表"""
+        if lxml_html is None:
+            raise RuntimeError("解析 HTML 需要安装 lxml: pip install lxml")
+
+        root = lxml_html.fromstring(page_html)
+        tweets_data = []
+        for article in root.xpath('//article[@data-testid="tweet"]'):
+            if len(tweets_data) >= self.limit:
+                break
+            links = article.xpath('.//a[contains(@href, "/status/")]/@href')
+            times = article.xpath('.//time/@datetime')
+            if not links or not times:
+                continue
+
+            texts = article.xpath('.//div[@data-testid="tweetText"]')
+            contexts = article.xpath('.//*[@data-testid="socialContext"]')
+            context = contexts[0].text_content() if contexts else ''
+            pinned = self.pinned_pattern.search(context) is not None
+            retweet = not pinned and self.retweet_pattern.search(context) is not None
+
+            tweets_data.append(build_tweet_data(
+                username,
+                links[0],
+                texts[0].text_content() if texts else '',
+                times[0],
+                self._count(article, 'like'),
+                self._count(article, 'retweet'),
+                pinned=pinned,
+                retweet=retweet
+            ))
+        return tweets_data
+
+    def _count(self, article, testid):
+        spans = article.xpath(f'.//*[@data-testid="{testid}"]//span/span')
+        return spans[0].text_content() if spans else '0'
+
+
+# 主页推文接口（GraphQL UserTweets）的地址
+TIMELINE_RESPONSE_PATTERN = re.compile(r'/graphql/[^/?]+/UserTweets\?')
+
+
+class TimelineJsonParser:
+    """从主页推文接口返回的 JSON 中解析推文：完整文本、精确的发布时间和互动数"""
+
+    def __init__(self, limit=5):
+        self.limit = limit
+
+    def parse(self, payload, username):
+        """payload 为响应文本或已解析的 dict，返回与 get_tweets 相同字段的 tweet_data 列表"""
+        if isinstance(payload, (str, bytes)):
+            payload = json.loads(payload)
+
+        user = payload.get('data', {}).get('user', {}).get('result', {})
+        timeline = user.get('timeline_v2') or user.get('timeline') or {}
+        instructions = timeline.get('timeline', {}).get('instructions', [])
+
+        # 置顶推文在单独的 TimelinePinEntry 中，放在最前面，与页面顺序一致
+        entries = []
+        for instruction in instructions:
+            if instruction.get('type') == 'TimelinePinEntry':
+                entries.insert(0, (instruction.get('entry', {}), True))
+        for instruction in instructions:
+            if instruction.get('type') == 'TimelineAddEntries':
+                entries.extend((entry, False) for entry in instruction.get('entries', []))
+
+        tweets_data = []
+        for entry, pinned in entries:
+            for result in self._entry_results(entry):
+                if len(tweets_data) >= self.limit:
+                    return tweets_data
+                tweet_data = self._tweet_data(result, username, pinned)
+                if tweet_data:
+                    tweets_data.append(tweet_data)
+        return tweets_data
+
+    def _entry_results(self, entry):
+        """一个时间线条目中的推文（普通条目一条，自己的回复串可能有多条）"""
+        content = entry.get('content', {})
+        items = [content.get('itemContent')]
+        items.extend(item.get('item', {}).get('itemContent') for item in content.get('items', []))
+        for item in items:
+            if item and item.get('itemType') == 'TimelineTweet':
+                result = item.get('tweet_results', {}).get('result')
+                if result:
+                    yield result
+
+    def _tweet_data(self, result, username, pinned):
+        # 受限推文多包一层 tweet
+        if result.get('__typename') == 'TweetWithVisibilityResults':
+            result = result.get('tweet', {})
+        legacy = result.get('legacy')
+        if not legacy:
+            return None
+
+        # 转推按页面显示的方式取被转推的原推文的内容；id 仍用转推自己的（与时间线上的先后一致），原推文的 ID 放在 retweeted_id 中
+        retweet_id = None
+        retweeted = legacy.get('retweeted_status_result', {}).get('result')
+        if retweeted:
+            if retweeted.get('__typename') == 'TweetWithVisibilityResults':
+                retweeted = retweeted.get('tweet', {})
+            if retweeted.get('legacy'):
+                retweet_id = legacy.get('id_str') or result.get('rest_id')
+                result, legacy = retweeted, retweeted['legacy']
+
+        tweet_id = legacy.get('id_str') or result.get('rest_id')
+        tweet_data = {
+            'id': retweet_id or tweet_id,
+            'username': username,
+            'text': self._text(result, legacy),
+            'created_at': datetime.strptime(legacy['created_at'], '%a %b %d %H:%M:%S %z %Y').strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+            'likes': str(legacy.get('favorite_count', 0)),
+            'retweets': str(legacy.get('retweet_count', 0)),
+            'pinned': pinned,
+            'retweet': retweet_id is not None
+        }
+        if retweet_id:
+            tweet_data['retweeted_id'] = tweet_id
+        return tweet_data
+
+    def _text(self, result, legacy):
+        """长推文取 note_tweet 中的完整文本；展开链接，去掉图片链接"""
+        note = result.get('note_tweet', {}).get('note_tweet_results', {}).get('result', {})
+        text = note.get('text') or legacy.get('full_text', '')
+        entities = note.get('entity_set') if note.get('text') else legacy.get('entities')
+        entities = entities or {}
+        for url in entities.get('urls', []):
+            if url.get('url') and url.get('expanded_url'):
+                text = text.replace(url['url'], url['expanded_url'])
+        for media in legacy.get('entities', {}).get('media', []):
+            if media.get('url'):
+                text = text.replace(media['url'], '')
+        return html.unescape(text).strip()
+
+
+class TimelineResponseWatcher:
+    """作为 wait_ready 的等待条件：从浏览器性能日志中找到主页推文接口的响应，加载完成后立即解析"""
+
+    def __init__(self, parser, username):
+        self.parser = parser
+        self.username = username
+        self.request_ids = set()
+        self.tweets = None
+        self.body = None
+        self.parse_seconds = 0.0
+
+    @staticmethod
+    def drain(driver):
+        """丢弃之前页面的日志"""
+        driver.get_log('performance')
+
+    def __call__(self, driver):
+        for record in driver.get_log('performance'):
+            message = json.loads(record['message'])['message']
+            method = message.get('method')
+            params = message.get('params', {})
+            if method == 'Network.responseReceived':
+                if TIMELINE_RESPONSE_PATTERN.search(params.get('response', {}).get('url', '')):
+                    self.request_ids.add(params['requestId'])
+            elif method == 'Network.loadingFinished' and params.get('requestId') in self.request_ids:
+                body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': params['requestId']})
+                start = time.perf_counter()
+                self.body = body['body']
+                self.tweets = self.parser.parse(self.body, self.username)
+                self.parse_seconds = time.perf_counter() - start
+                return True
+        return False
+
+
+# 精简模式下关闭的 Chrome 功能
+LEAN_CHROME_ARGUMENTS = [
+    '--blink-settings=imagesEnabled=false',
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-background-timer-throttling',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--disable-translate',
+    '--disable-notifications',
+    '--disable-features=Translate,MediaRouter,OptimizationHints,AutofillServerCommunication',
+    '--mute-audio',
+    '--no-first-run',
+    '--renderer-process-limit=2',
+]
+
+# 精简模式下拦截的请求：图片、视频、字体和统计/广告
+LEAN_BLOCKED_URLS = [
+    '*.jpg', '*.jpeg', '*.png', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.mp4', '*.m3u8', '*.m4s', '*.ts', '*.webm',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*://pbs.twimg.com/*', '*://video.twimg.com/*', '*://abs-0.twimg.com/emoji/*',
+    '*google-analytics.com*', '*googletagmanager.com*', '*doubleclick.net*',
+    '*ads-twitter.com*', '*ads-api.twitter.com*', '*analytics.twitter.com*',
+    '*/i/jot/*', '*/1.1/jot/*', '*scribe.twitter.com*',
+]
+
+# 读取当前页面（含所有子资源）的传输字节数
+PAGE_STATS_SCRIPT = """
+const navigation = performance.getEntriesByType('navigation')[0];
+const resources = performance.getEntriesByType('resource');
+let bytes = navigation ? navigation.transferSize : 0;
+for (const entry of resources) {
+    bytes += entry.transferSize || 0;
+}
+return {
+    bytes: bytes,
+    resources: resources.length
+};
+"""
+
+# 一次性提取页面上最新推文的脚本，返回与 get_tweets 相同字段的 JSON 数组
+EXTRACT_TWEETS_SCRIPT = """
+const limit = arguments[0];
+const PINNED_PATTERN = new RegExp(arguments[1], 'i');
+const RETWEET_PATTERN = new RegExp(arguments[2], 'i');
+const articles = Array.from(document.querySelectorAll('article[data-testid="tweet"]')).slice(0, limit);
+const count = (article, testid) => {
+    const el = article.querySelector('[data-testid="' + testid + '"] span span');
+    return el ? el.innerText : '0';
+};
+const socialContext = (article) => {
+    const context = article.querySelector('[data-testid="socialContext"]');
+    return context ? context.innerText : '';
+};
+const result = [];
+for (const article of articles) {
+    const link = article.querySelector('a[href*="/status/"]');
+    const textElement = article.querySelector('div[data-testid="tweetText"]');
+    const timeElement = article.querySelector('time');
+    if (!link || !timeElement) {
+        continue;
+    }
+    const context = socialContext(article);
+    const pinned = PINNED_PATTERN.test(context);
+    result.push({
+        href: link.href,
+        text: textElement ? textElement.innerText : '',
+        created_at: timeElement.getAttribute('datetime'),
+        likes: count(article, 'like'),
+        retweets: count(article, 'retweet'),
+        pinned: pinned,
+        retweet: !pinned && RETWEET_PATTERN.test(context)
+    });
+}
+return JSON.stringify(result);
+"""
+
+# 关注按钮和“正在关注”按钮的选择器，一次查找同时判断两种状态（aria-label 用前缀匹配，避免把“Following”当成“Follow”）
+FOLLOW_BUTTON_SELECTOR = ', '.join([
+    '[data-testid$="-follow"]',
+    '[data-testid="followButton"]',
+    '[data-testid="follow"]',
+    '[aria-label^="Follow @"]',
+    '[aria-label^="关注 @"]',
+])
+FOLLOWING_BUTTON_SELECTOR = ', '.join([
+    '[data-testid$="-unfollow"]',
+    '[aria-label^="Following @"]',
+    '[aria-label^="正在关注 @"]',
+])
+
+
+def articles_loaded(count):
+    """wait_ready 的等待条件：页面上至少有 count 条推文时返回这些推文元素"""
+    def condition(driver):
+        articles = driver.find_elements(By.CSS_SELECTOR, 'article[data-testid="tweet"]')
+        return articles if len(articles) >= count else False
+    return condition
+
+
+def probe_follow_state(driver):
+    """作为 wait_ready 的等待条件：返回 ('following', 按钮) 或 ('follow', 按钮)，都没找到时返回 False"""
+    buttons = driver.find_elements(By.CSS_SELECTOR, f"{FOLLOWING_BUTTON_SELECTOR}, {FOLLOW_BUTTON_SELECTOR}")
+    if not buttons:
+        return False
+    for button in buttons:
+        testid = button.get_attribute('data-testid') or ''
+        label = button.get_attribute('aria-label') or ''
+        if testid.endswith('-unfollow') or label.startswith(('Following @', '正在关注 @')):
+            return 'following', button
+    return 'follow', buttons[0]
+
+
+class TweetMonitor:
+    def __init__(self, node_id=None):
         # 添加首次运行标志
         self.first_run = True
         
@@ -30,8 +2052,17 @@ class TweetMonitor:
             self.load_config()
         except Exception as e:
             self.logger.error(f"加载配置失败: {e}")
+            self.close_logging()
             raise
         
+        # 按配置重新设置日志（文件、格式、级别、采样）
+        self.setup_logging(self.logging_settings)
+        
+        # 运行指标（可通过 /metrics 导出）
+        self.metrics = self.create_metrics()
+        self.metrics_server = None
+        self.profile_counter = 0
+        
         # 设置Chrome选项
         self.setup_chrome_options()
         
@@ -41,44 +2072,145 @@ class TweetMonitor:
         
         # 添加配置文件最后修改时间
         self.last_config_modified = os.path.getmtime(self.config_file) if os.path.exists(self.config_file) else 0
+        self.last_config_hash = file_hash(self.config_file)
+        self.last_settings_hash = file_hash('config.json')
         
-        # 创建数据保存目录
+        # 提醒规则（全局规则和各账号的 alert_rules）
+        try:
+            self.compile_alert_rules()
+        except ValueError as e:
+            self.logger.error(f"提醒规则配置有误: {e}")
+            self.close_logging()
+            raise
+        
+        # 创建推文存储
         self.base_data_dir = "tweets_data"
-        for username in self.accounts.keys():
-            user_dir = os.path.join(self.base_data_dir, username)
-            if not os.path.exists(user_dir):
-                os.makedirs(user_dir)
+        self.tweet_store = self.create_tweet_store()
+        self.tweet_store.prepare_accounts(self.accounts.keys())
         
-        self.driver = None
-    
-    def setup_logging(self):
-        """设置日志"""
-        log_file = 'twitter_monitor.log'
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+        # 新推文的输出端（存储、邮件、JSONL、webhook、标准输出），各自在后台线程中写出
+        self.pipeline = self.create_pipeline()
+        self.pipeline.start()
+
+        # 浏览器工作位置，每个工作线程独占一个已登录的浏览器
+        self.slots = []
+        self.last_health_check = time.time()
+
+        # 多个工作线程共享的状态（last_tweet_id 等）需要串行更新
+        self.state_lock = threading.Lock()
+        self.stop_event = threading.Event()
+        
+        # 后台关注线程：按令牌桶限速，借用空闲的浏览器
+        self.follow_thread = None
+        self.follow_wakeup = threading.Event()
+        self.follow_bucket = TokenBucket(self.follow_rate_per_hour, self.follow_burst)
+
+        # 各提取方式的累计耗时 {mode: (总秒数, 次数)}
+        self.extraction_timings = {}
+
+        # 离线 HTML 解析器（extraction_mode 为 html 时使用）
+        self.html_parser = TimelineHtmlParser(limit=5)
+        # 推文接口响应解析器（extraction_mode 为 network 时使用）
+        self.json_parser = TimelineJsonParser(limit=5)
+        
+        # 页面传输字节数统计
+        self.page_bytes_total = 0
+        self.page_count = 0
+        
+        # 账号运行状态（last_tweet_id、见过的推文 ID 等）保存在单独的追加写入日志中
+        self.account_state = AccountStateStore('account_state.jsonl')
+        self.account_state.load()
         
+        # 多节点分片：通过共享的 SQLite 数据库租用账号，未启用时负责所有账号
+        self.coordinator = None
+        self.owned = None
+        if self.sharding_settings.get('enabled', False):
+            self.node_id = node_id or self.sharding_settings.get('node_id') or f"{socket.gethostname()}-{os.getpid()}"
+            self.coordinator = LeaseCoordinator(
+                self.sharding_settings.get('path', 'coordination.db'), self.node_id,
+                lease_ttl=self.sharding_settings.get('lease_ttl', 60),
+                claim_retention=self.sharding_settings.get('claim_retention', 7 * 86400)
+            )
+            # 输出端写完后才把认领的推文标记为已发布，节点中途崩溃时由接手的节点重新发布
+            self.pipeline.on_delivered = self.coordinator.mark_delivered
+            self.refresh_shard()
+
+    @property
+    def driver(self):
+        """第一个浏览器实例（单浏览器模式下即唯一实例）"""
+        return self.slots[0].driver if self.slots else None
+
+    def setup_logging(self, settings=None):
+        """设置日志：记录先放入队列，由后台线程格式化并写入文件和控制台，文件轮转也不阻塞检查"""
+        settings = settings or {}
         file_handler = RotatingFileHandler(
-            log_file, 
-            maxBytes=10*1024*1024,
-            backupCount=5
+            settings.get('file', 'twitter_monitor.log'),
+            maxBytes=settings.get('max_bytes', 10*1024*1024),
+            backupCount=settings.get('backup_count', 5),
+            encoding='utf-8'
         )
-        file_handler.setFormatter(formatter)
+        # 日志文件可以使用 JSON Lines 格式，控制台始终输出文本
+        if settings.get('format', 'text') == 'json':
+            file_handler.setFormatter(JsonLineFormatter())
+        else:
+            file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        handlers = [file_handler]
         
-        console_handler = logging.StreamHandler()
-        console_handler.setFormatter(formatter)
+        if settings.get('console', True):
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            handlers.append(console_handler)
         
         self.logger = logging.getLogger('TwitterMonitor')
-        self.logger.setLevel(logging.INFO)
-        self.logger.addHandler(file_handler)
-        self.logger.addHandler(console_handler)
+        self.logger.setLevel(settings.get('level', 'INFO'))
+        # 重复创建 TweetMonitor 或重新设置日志时先移除之前的处理器，避免每条日志输出多次
+        self.close_logging()
+        
+        self.log_handler = DeferredQueueHandler(queue.Queue())
+        self.log_handler.listener = TimedQueueListener(self.log_handler.queue, *handlers)
+        self.log_handler.listener.start()
+        self.logger.addHandler(self.log_handler)
+        
+        # 每次检查账号的日志只按比例输出，其余降为 DEBUG
+        self.check_log_rate = settings.get('check_sample_rate', 0.1)
+    
+    def close_logging(self):
+        """写完队列中的日志，停止后台线程并移除处理器"""
+        for handler in list(self.logger.handlers):
+            self.logger.removeHandler(handler)
+            listener = getattr(handler, 'listener', None)
+            if listener:
+                listener.stop()
+                for target in listener.handlers:
+                    target.close()
+            handler.close()
+    
+    def sampled_level(self):
+        """每个账号每次检查都会输出的日志按 check_sample_rate 抽样为 INFO，其余为 DEBUG"""
+        return logging.INFO if random.random() < self.check_log_rate else logging.DEBUG
+    
+    def log_cost(self):
+        """日志的累计条数、调用线程中的入队耗时和后台线程的写出耗时（秒）"""
+        return (
+            self.log_handler.records,
+            self.log_handler.enqueue_seconds,
+            self.log_handler.listener.write_seconds,
+        )
     
     def setup_chrome_options(self):
         """设置Chrome选项"""
         self.chrome_options = Options()
-        # self.chrome_options.add_argument('--headless')  # 调试时注释掉这行
+        # 未设置 browser.headless 时只有精简模式无界面运行，其他情况与原来一样打开浏览器窗口
+        headless = self.browser_settings.get('headless')
+        if headless is None:
+            headless = self.lean_browser
+        if headless:
+            self.chrome_options.add_argument('--headless=new')
         self.chrome_options.add_argument('--no-sandbox')
         self.chrome_options.add_argument('--disable-dev-shm-usage')
         self.chrome_options.add_argument('--disable-gpu')
-        self.chrome_options.add_argument('--start-maximized')
+        if not self.lean_browser:
+            self.chrome_options.add_argument('--start-maximized')
         
         # 添加更多选项来绕过检测
         self.chrome_options.add_argument('--disable-blink-features=AutomationControlled')
@@ -90,10 +2222,31 @@ class TweetMonitor:
         self.chrome_options.add_argument('--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
         
         # 添加窗口大小
-        self.chrome_options.add_argument('--window-size=1920,1080')
+        self.chrome_options.add_argument(f"--window-size={self.browser_settings.get('window_size', '1920,1080')}")
         
         # 禁用 JavaScript 错误
         self.chrome_options.add_experimental_option('excludeSwitches', ['enable-logging'])
+        
+        if self.lean_browser:
+            self.setup_lean_options()
+        
+        if self.extraction_mode == 'network':
+            self.setup_network_capture_options()
+    
+    def setup_lean_options(self):
+        """精简模式：不加载图片、关闭不需要的 Chrome 功能以减少内存和流量"""
+        for argument in LEAN_CHROME_ARGUMENTS:
+            self.chrome_options.add_argument(argument)
+        self.chrome_options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.default_content_setting_values.notifications': 2,
+        })
+    
+    def setup_network_capture_options(self):
+        """network 方式：通过性能日志读取推文接口的响应；DOMContentLoaded 后 get 即返回，不等图片等资源加载完"""
+        self.chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        self.chrome_options.add_experimental_option('perfLoggingPrefs', {'enableNetwork': True, 'enablePage': False})
+        self.chrome_options.page_load_strategy = 'eager'
     
     def load_accounts(self):
         """从配置文件加载账号"""
@@ -129,142 +2282,352 @@ class TweetMonitor:
     def check_config_updates(self):
         """检查配置文件是否有更新"""
         try:
-            if os.path.exists(self.config_file):
-                current_mtime = os.path.getmtime(self.config_file)
-                if current_mtime > self.last_config_modified:
+            current_mtime = os.path.getmtime(self.config_file) if os.path.exists(self.config_file) else None
+            if current_mtime is not None and current_mtime != self.last_config_modified:
+                self.last_config_modified = current_mtime
+                
+                # 只有内容真正变化时才重新加载
+                current_hash = file_hash(self.config_file)
+                if current_hash != self.last_config_hash:
                     self.logger.info("检测到配置文件更新，重新加载账号...")
                     self.load_accounts()
-                    self.last_config_modified = current_mtime
+                    self.last_config_hash = current_hash
                     
-                    # 为新账号创建数据目录
-                    for username in self.accounts.keys():
-                        user_dir = os.path.join(self.base_data_dir, username)
-                        if not os.path.exists(user_dir):
-                            os.makedirs(user_dir)
+                    # 为新账号准备存储
+                    self.tweet_store.prepare_accounts(self.accounts.keys())
+                    self.compile_alert_rules()
+                    # 通知后台关注线程关注新账号
+                    self.follow_wakeup.set()
+            
+            # 全局提醒规则在 config.json 中，修改后同样无需重启
+            settings_hash = file_hash('config.json')
+            if settings_hash != self.last_settings_hash:
+                self.last_settings_hash = settings_hash
+                with open('config.json', 'r', encoding='utf-8') as f:
+                    alert_settings = json.load(f).get('alerts', {})
+                if alert_settings != self.alert_settings:
+                    self.logger.info("检测到提醒规则更新，重新编译...")
+                    self.alert_settings = alert_settings
+                    self.compile_alert_rules()
         except Exception as e:
             self.logger.error(f"检查配置更新时出错: {e}")
+    
+    def compile_alert_rules(self):
+        """编译全局和各账号的提醒规则；没有任何规则时不过滤"""
+        if not self.alert_settings.get('enabled', True):
+            self.alert_matcher = None
+            return
+        matcher = AlertMatcher.from_config(self.alert_settings.get('rules', []), self.accounts)
+        self.alert_matcher = matcher if matcher.rules else None
+        if self.alert_matcher:
+            self.logger.info(f"已编译 {len(matcher.rules)} 条提醒规则 ({len(matcher.term_rules)} 个关键词)")
+    
+    def create_driver(self, index=0, generation=0):
+        """创建一个新的浏览器实例"""
+        # 修改 ChromeDriver 的安装方式
+        chrome_options = copy.deepcopy(self.chrome_options)
+        chrome_options.add_argument('--no-sandbox')
+        chrome_options.add_argument('--disable-dev-shm-usage')
+        
+        # 每个浏览器使用自己的持久化配置目录，重启后保留登录状态；
+        # 后台替换时新旧浏览器同时运行，交替使用两个目录
+        if self.profile_dir:
+            suffix = 'b' if generation % 2 else ''
+            user_data_dir = os.path.abspath(os.path.join(self.profile_dir, f"worker_{index + 1}{suffix}"))
+            os.makedirs(user_data_dir, exist_ok=True)
+            chrome_options.add_argument(f'--user-data-dir={user_data_dir}')
+
+        # 使用系统已安装的 ChromeDriver
+        try:
+            driver = webdriver.Chrome(options=chrome_options)
+        except:
+            # 如果系统未安装，则尝试自动下载安装
+            service = Service(ChromeDriverManager(cache_valid_range=1).install())
+            driver = webdriver.Chrome(service=service, options=chrome_options)
+        
+        if self.lean_browser:
+            self.block_resources(driver)
+        return driver
+    
+    def block_resources(self, driver):
+        """通过 CDP 拦截图片、视频、字体和统计脚本的请求"""
+        try:
+            blocked_urls = LEAN_BLOCKED_URLS + self.browser_settings.get('blocked_urls', [])
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': blocked_urls})
+        except Exception as e:
+            self.logger.warning(f"设置请求拦截失败: {e}")
+    
+    def record_page_stats(self, driver, username, load_seconds):
+        """记录页面加载耗时（打开主页到推文出现）和传输字节数"""
+        try:
+            stats = driver.execute_script(PAGE_STATS_SCRIPT)
+        except Exception as e:
+            self.logger.warning("获取 @%s 的页面加载数据失败: %s", username, e, extra={'account': username})
+            return
+        
+        self.metrics.observe('tweet_monitor_wait_seconds', load_seconds, step='page_load')
+        with self.state_lock:
+            self.page_bytes_total += stats['bytes']
+            self.page_count += 1
+            average_kb = self.page_bytes_total / self.page_count / 1024
+        self.logger.log(
+            self.sampled_level(),
+            "@%s 页面加载 %.0f 毫秒, 传输 %.1f KB (%d 个请求; 平均每页 %.1f KB)",
+            username, load_seconds * 1000, stats['bytes'] / 1024, stats['resources'], average_kb,
+            extra={'account': username, 'phase': 'page_load', 'duration': round(load_seconds, 3)}
+        )
+
+    def quit_driver(self, driver):
+        """关闭一个浏览器实例"""
+        try:
+            driver.quit()
+        except Exception as e:
+            self.logger.error(f"关闭浏览器时出错: {e}")
+
+    def quit_drivers(self):
+        """关闭所有浏览器实例，并等待进行中的替换结束（新浏览器会被关闭，不占用配置目录）"""
+        slots, self.slots = self.slots, []
+        for slot in slots:
+            self.quit_driver(slot.retire())
+        for slot in slots:
+            if slot.recycle_thread is not None:
+                slot.recycle_thread.join(timeout=120)
+
     def init_driver(self):
-        """初始化浏览器"""
+        """初始化浏览器（每个工作线程一个）"""
         try:
-            if self.driver is not None:
-                self.driver.quit()
-            
-            # 修改 ChromeDriver 的安装方式
-            chrome_options = self.chrome_options
-            chrome_options.add_argument('--no-sandbox')
-            chrome_options.add_argument('--disable-dev-shm-usage')
-            
-            # 使用系统已安装的 ChromeDriver
-            try:
-                self.driver = webdriver.Chrome(options=chrome_options)
-            except:
-                # 如果系统未安装，则尝试自动下载安装
-                service = Service(ChromeDriverManager(cache_valid_range=1).install())
-                self.driver = webdriver.Chrome(service=service, options=chrome_options)
-            
+            self.quit_drivers()
+
+            for index in range(self.worker_count):
+                self.slots.append(DriverSlot(index, self.create_driver(index)))
+
+            self.logger.info(f"已启动 {len(self.slots)} 个浏览器实例")
             return True
         except Exception as e:
             self.logger.error(f"初始化浏览器失败: {e}")
+            self.quit_drivers()
+            return False
+
+    def login_all(self):
+        """登录所有浏览器实例"""
+        for slot in self.slots:
+            if not self.ensure_logged_in(slot.driver):
+                self.logger.error(f"第 {slot.index + 1} 个浏览器登录失败")
+                return False
+        return True
+
+    def ensure_logged_in(self, driver):
+        """优先复用已保存的登录状态，只有检测到未登录时才执行完整的登录流程"""
+        start = time.time()
+        if self.is_logged_in(driver):
+            self.logger.info(f"已复用浏览器配置目录中的登录状态 ({time.time() - start:.1f} 秒)")
+            return True
+        
+        if self.restore_session_cookies(driver) and self.is_logged_in(driver):
+            self.logger.info(f"已通过保存的 Cookie 恢复登录状态 ({time.time() - start:.1f} 秒)")
+            # 恢复后服务器可能刷新了令牌，重新保存
+            self.save_session_cookies(driver)
+            return True
+        
+        if not self.login_twitter(driver):
+            return False
+        self.save_session_cookies(driver)
+        return True
+
+    def is_logged_in(self, driver):
+        """打开首页快速判断是否处于登录状态"""
+        try:
+            driver.get(f"{self.base_url}/home")
+            self.wait_ready(
+                driver, 'session_probe',
+                EC.any_of(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, '[data-testid="AppTabBar_Home_Link"]')),
+                    EC.url_contains('/login'),
+                    EC.url_contains('/i/flow/'),
+                    EC.presence_of_element_located((By.CSS_SELECTOR, '[data-testid="loginButton"]'))
+                )
+            )
+            return bool(driver.find_elements(By.CSS_SELECTOR, '[data-testid="AppTabBar_Home_Link"]'))
+        except TimeoutException:
+            return False
+        except Exception as e:
+            self.logger.warning(f"检测登录状态时出错: {e}")
+            return False
+
+    def save_session_cookies(self, driver):
+        """保存登录后的 Cookie，供重启或更换浏览器时恢复"""
+        if not self.cookie_file:
+            return
+        try:
+            tmp_path = self.cookie_file + '.tmp'
+            # Cookie 中有登录令牌：临时文件创建时就只有当前用户可读写（先删除上次残留的文件，O_CREAT 不会修改已有文件的权限）
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(driver.get_cookies(), f, ensure_ascii=False)
+            os.replace(tmp_path, self.cookie_file)
+            self.logger.info(f"已保存登录 Cookie 到 {self.cookie_file}")
+        except Exception as e:
+            self.logger.error(f"保存登录 Cookie 时出错: {e}")
+
+    def restore_session_cookies(self, driver):
+        """把保存的 Cookie 写入浏览器，返回是否有可用的 Cookie"""
+        if not self.cookie_file or not os.path.exists(self.cookie_file):
             return False
-    
-    def follow_accounts(self):
-        """自动关注配置文件中的账号"""
         try:
-            self.logger.info("开始关注配置的账号...")
-            for username, account_info in self.accounts.items():
-                if not account_info.get('enabled', True):
+            with open(self.cookie_file, 'r', encoding='utf-8') as f:
+                cookies = json.load(f)
+            
+            # 只能为当前域名写入 Cookie，先打开一个轻量页面
+            driver.get(f"{self.base_url}/robots.txt")
+            restored = 0
+            for cookie in cookies:
+                cookie.pop('sameSite', None)
+                try:
+                    driver.add_cookie(cookie)
+                    restored += 1
+                except Exception:
                     continue
-                    
+            return restored > 0
+        except Exception as e:
+            self.logger.warning(f"恢复登录 Cookie 时出错: {e}")
+            return False
+
+    def start_follow_worker(self):
+        """在后台关注账号，监控不必等待关注完成"""
+        if not self.follow_enabled or self.follow_thread is not None:
+            return
+        self.follow_thread = threading.Thread(target=self.follow_accounts, name='FollowWorker', daemon=True)
+        self.follow_thread.start()
+    
+    def pending_follows(self):
+        """尚未关注的启用账号；关注失败的账号在 retry_after 秒后再试"""
+        pending = []
+        now = time.time()
+        for username, account_info in self.owned_accounts().items():
+            if not account_info.get('enabled', True):
+                continue
+            state = self.account_state.get(username, 'follow_state')
+            if state in ('followed', 'following'):
+                continue
+            if state and now - self.account_state.get(username, 'follow_checked', 0) < self.follow_retry_after:
+                continue
+            pending.append(username)
+        return pending
+    
+    def borrow_slot(self):
+        """借用一个空闲的浏览器（在两次检查账号之间），没有浏览器或收到停止信号时返回 None"""
+        while not self.stop_event.is_set():
+            for slot in list(self.slots):
+                if not slot.recycling and slot.lock.acquire(blocking=False):
+                    return slot
+            self.stop_event.wait(0.5)
+        return None
+    
+    def follow_accounts(self):
+        """自动关注配置文件中的账号：跳过已关注的，按令牌桶限速，账号配置更新后继续关注新账号"""
+        self.logger.info("开始关注配置的账号...")
+        while not self.stop_event.is_set():
+            pending = self.pending_follows()
+            if not pending:
+                # 等待账号配置更新
+                self.follow_wakeup.wait(self.follow_retry_after)
+                self.follow_wakeup.clear()
+                continue
+            
+            for username in pending:
+                if not self.follow_bucket.wait(self.stop_event):
+                    return
+                slot = self.borrow_slot()
+                if slot is None:
+                    return
                 try:
-                    # 访问用户主页
-                    self.driver.get(f"https://twitter.com/{username}")
-                    time.sleep(8)  # 增加页面加载等待时间
-                    
-                    # 尝试滚动页面以确保内容加载
-                    self.driver.execute_script("window.scrollBy(0, 300)")
-                    time.sleep(2)
-                    
-                    # 更新关注按钮的选择器
-                    follow_button = None
-                    selectors = [
-                        '[data-testid="followButton"]',
-                        '[data-testid="follow"]',
-                        '[aria-label*="关注"]',
-                        '[aria-label*="Follow"]',
-                        'div[role="button"]:has-text("关注")',
-                        'div[role="button"]:has-text("Follow")',
-                        '//div[@role="button"][contains(., "关注")]',
-                        '//div[@role="button"][contains(., "Follow")]'
-                    ]
-                    
-                    for selector in selectors:
-                        try:
-                            if selector.startswith('//'):
-                                # 使用 XPath 选择器
-                                follow_button = WebDriverWait(self.driver, 10).until(
-                                    EC.presence_of_element_located((By.XPATH, selector))
-                                )
-                            else:
-                                # 使用 CSS 选择器
-                                follow_button = WebDriverWait(self.driver, 10).until(
-                                    EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-                                )
-                            if follow_button and follow_button.is_displayed():
-                                break
-                        except:
-                            continue
-                    
-                    if not follow_button:
-                        self.logger.warning(f"未找到 @{username} 的关注按钮")
-                        continue
-                    
-                    # 使用 JavaScript 点击按钮
-                    self.driver.execute_script("arguments[0].click();", follow_button)
-                    self.logger.info(f"已关注用户 @{username}")
-                    time.sleep(random.randint(4, 8))
-                    
+                    state = self.follow_account(slot.driver, username)
                 except Exception as e:
                     self.logger.error(f"关注用户 @{username} 时出错: {str(e)}")
-                    continue
-                
-        except Exception as e:
-            self.logger.error(f"执行自动关注功能时出错: {str(e)}")
+                    state = 'error'
+                finally:
+                    slot.lock.release()
+                self.account_state.update(username, follow_state=state, follow_checked=round(time.time()))
+                if self.stop_event.is_set():
+                    return
+    
+    def follow_account(self, driver, username):
+        """打开主页并关注账号，返回 followed、following（之前已关注）或 not_found"""
+        driver.get(f"{self.base_url}/{username}")
+        
+        # 一次等待同时查找关注按钮和“正在关注”按钮
+        try:
+            state, button = self.wait_ready(driver, 'follow_profile', probe_follow_state)
+        except TimeoutException:
+            self.logger.warning(f"未找到 @{username} 的关注按钮")
+            return 'not_found'
+        
+        if state == 'following':
+            self.logger.info(f"已经关注了 @{username}")
+            return 'following'
+        
+        # 使用 JavaScript 点击按钮
+        driver.execute_script("arguments[0].click();", button)
+        self.logger.info(f"已关注用户 @{username}")
+        return 'followed'
     
-    def login_twitter(self):
+    def login_twitter(self, driver=None):
         """登录Twitter"""
+        driver = driver or self.driver
         try:
             self.logger.info("正在登录Twitter...")
-            self.driver.get("https://twitter.com/login")
-            time.sleep(5)
+            driver.get(f"{self.base_url}/login")
             
             # 输入邮箱
-            email_input = WebDriverWait(self.driver, 20).until(
+            email_input = self.wait_ready(
+                driver, 'login_page',
                 EC.presence_of_element_located((By.CSS_SELECTOR, 'input[autocomplete="username"]'))
             )
             email_input.send_keys(self.twitter_email)
             email_input.send_keys(Keys.RETURN)
-            time.sleep(3)
             
-            # 如果要求输入用户名（注意：更新了选择器）
-            try:
-                username_input = WebDriverWait(self.driver, 5).until(
-                    EC.presence_of_element_located((By.XPATH, "//input[@data-testid='ocfEnterTextTextInput']"))
+            # 下一步可能要求输入用户名（注意：更新了选择器），也可能直接进入密码页
+            username_locator = (By.XPATH, "//input[@data-testid='ocfEnterTextTextInput']")
+            password_locator = (By.CSS_SELECTOR, 'input[name="password"]')
+            self.wait_ready(
+                driver, 'login_next',
+                EC.any_of(
+                    EC.presence_of_element_located(username_locator),
+                    EC.presence_of_element_located(password_locator)
                 )
+            )
+            
+            username_inputs = driver.find_elements(*username_locator)
+            if username_inputs:
                 # 移除 @ 符号，因为输入框不需要
                 clean_username = self.twitter_username.replace('@', '')
-                username_input.send_keys(clean_username)
-                username_input.send_keys(Keys.RETURN)
-                time.sleep(3)
-            except Exception as e:
-                self.logger.info(f"无需输入用户名，继续下一步: {e}")
+                username_inputs[0].send_keys(clean_username)
+                username_inputs[0].send_keys(Keys.RETURN)
+            else:
+                self.logger.info("无需输入用户名，继续下一步")
                 
             # 输入密码
-            password_input = WebDriverWait(self.driver, 20).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, 'input[name="password"]'))
+            password_input = self.wait_ready(
+                driver, 'login_password',
+                EC.presence_of_element_located(password_locator)
             )
             password_input.send_keys(self.twitter_password)
             password_input.send_keys(Keys.RETURN)
-            time.sleep(5)
+            
+            # 等待跳转到首页
+            try:
+                self.wait_ready(
+                    driver, 'login_done',
+                    EC.any_of(
+                        EC.url_contains('/home'),
+                        EC.presence_of_element_located((By.CSS_SELECTOR, '[data-testid="AppTabBar_Home_Link"]'))
+                    )
+                )
+            except TimeoutException:
+                self.logger.warning("登录后未检测到首页，继续运行")
             
             return True
             
@@ -272,158 +2635,775 @@ class TweetMonitor:
             self.logger.error(f"登录Twitter失败: {e}")
             return False
     
-    def save_tweet(self, tweet_data):
-        """保存推文"""
+    def wait_ready(self, driver, step, condition, timeout=None):
+        """等待页面就绪条件满足后立即返回，并记录该步骤的实际耗时"""
+        if timeout is None:
+            timeout = self.step_timeouts.get(step, DEFAULT_STEP_TIMEOUT)
+        
+        histogram = self.metrics.histogram('tweet_monitor_wait_seconds', step=step)
+        start = time.perf_counter()
         try:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            username = tweet_data['username']
-            filename = os.path.join(self.base_data_dir, username, f"tweet_{timestamp}.json")
+            return WebDriverWait(driver, timeout, poll_frequency=0.1).until(condition)
+        except TimeoutException:
+            histogram.observe_timeout()
+            self.metrics.inc('tweet_monitor_errors_total', type='timeout')
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - start)
+    
+    def log_step_latencies(self):
+        """输出各步骤的等待耗时分布"""
+        for labels, histogram in sorted(self.metrics.series('tweet_monitor_wait_seconds'), key=lambda s: s[0]['step']):
+            self.logger.info("步骤耗时 %s: %s", labels['step'], histogram.summary())
+    
+    def create_metrics(self):
+        """定义监控指标，并注册抓取时计算的队列长度和浏览器内存"""
+        metrics = MetricsRegistry()
+        metrics.define('tweet_monitor_wait_seconds', 'histogram', '页面就绪等待耗时（秒）')
+        metrics.define('tweet_monitor_phase_seconds', 'histogram', '检查各阶段耗时（秒）: navigate/wait/extract/publish')
+        metrics.define('tweet_monitor_sweep_seconds', 'histogram', '一轮检查的总耗时（秒）',
+                       buckets=(5, 10, 30, 60, 120, 300, 600, 1200))
+        metrics.define('tweet_monitor_detection_delay_seconds', 'histogram', '推文发布到被发现的延迟（秒）',
+                       buckets=(10, 30, 60, 120, 300, 600, 1800, 3600, 7200))
+        metrics.define('tweet_monitor_account_check_seconds', 'gauge', '各账号最近一次检查的耗时（秒）')
+        metrics.define('tweet_monitor_accounts_checked_total', 'counter', '已检查的账号次数')
+        metrics.define('tweet_monitor_new_tweets_total', 'counter', '发现的新推文数')
+        metrics.define('tweet_monitor_errors_total', 'counter', '按类型统计的错误数')
+        metrics.define('tweet_monitor_sink_delivery_seconds', 'histogram', '从检测到推文到各输出端写出完成的延迟（秒）',
+                       buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30))
+        metrics.define('tweet_monitor_sink_dropped_total', 'counter', '各输出端因队列已满丢弃的推文数')
+        metrics.define('tweet_monitor_sink_failures_total', 'counter', '各输出端重试后仍写出失败的批次数')
+        metrics.define('tweet_monitor_sink_retries_total', 'counter', '各输出端写出失败后重试的次数')
+        metrics.define('tweet_monitor_queue_depth', 'gauge', '各队列中等待处理的条数')
+        metrics.define('tweet_monitor_browser_rss_bytes', 'gauge', '各浏览器（含子进程）的常驻内存')
+        metrics.define('tweet_monitor_browser_generation', 'gauge', '各浏览器位置被替换的次数')
+        metrics.define('tweet_monitor_log_records_total', 'counter', '输出的日志条数')
+        metrics.define('tweet_monitor_log_seconds_total', 'counter', '日志耗时（秒）: enqueue 为检查线程中的入队，write 为后台线程的格式化和写出')
+        metrics.add_collector(self.collect_queue_depths)
+        metrics.add_collector(self.collect_browser_stats)
+        metrics.add_collector(self.collect_log_cost)
+        return metrics
+    
+    def collect_queue_depths(self):
+        return [
+            ('tweet_monitor_queue_depth', {'queue': 'tweet_store'}, len(getattr(self.tweet_store, 'pending', []))),
+            ('tweet_monitor_queue_depth', {'queue': 'account_state'}, len(self.account_state.pending)),
+            ('tweet_monitor_queue_depth', {'queue': 'log'}, self.log_handler.queue.qsize()),
+        ] + [
+            ('tweet_monitor_queue_depth', {'queue': f"sink_{name}"}, depth)
+            for name, depth in self.pipeline.queue_depths().items()
+        ]
+    
+    def collect_log_cost(self):
+        records, enqueue_seconds, write_seconds = self.log_cost()
+        return [
+            ('tweet_monitor_log_records_total', {}, records),
+            ('tweet_monitor_log_seconds_total', {'stage': 'enqueue'}, round(enqueue_seconds, 6)),
+            ('tweet_monitor_log_seconds_total', {'stage': 'write'}, round(write_seconds, 6)),
+        ]
+    
+    def collect_browser_stats(self):
+        samples = []
+        for slot in list(self.slots):
+            labels = {'worker': slot.index + 1}
+            samples.append(('tweet_monitor_browser_generation', labels, slot.generation))
+            rss = process_tree_rss(driver_pid(slot.driver))
+            if rss is not None:
+                samples.append(('tweet_monitor_browser_rss_bytes', labels, rss))
+        return samples
+    
+    def start_metrics_server(self):
+        """按配置在后台启动 /metrics 服务"""
+        if not self.metrics_settings.get('enabled', False) or self.metrics_server:
+            return
+        host = self.metrics_settings.get('host', '127.0.0.1')
+        port = self.metrics_settings.get('port', 9108)
+        try:
+            self.metrics_server = MetricsServer(self.metrics, host, port)
+            self.metrics_server.start()
+            self.logger.info(f"监控指标地址: http://{host}:{port}/metrics")
+        except OSError as e:
+            self.metrics_server = None
+            self.logger.error(f"启动监控指标服务失败: {e}")
+    
+    @contextlib.contextmanager
+    def timed(self, phase):
+        """统计一个检查阶段的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.metrics.observe('tweet_monitor_phase_seconds', time.perf_counter() - start, phase=phase)
+    
+    def record_detection_delay(self, tweet_data):
+        """记录推文发布时间到被发现的延迟（转推的发布时间是原推文的，不计入）"""
+        if tweet_data.get('retweet'):
+            return
+        try:
+            created = datetime.fromisoformat(tweet_data['created_at'].replace('Z', '+00:00'))
+        except (AttributeError, TypeError, ValueError):
+            return
+        if created.tzinfo is None:
+            return
+        delay = (datetime.now(timezone.utc) - created).total_seconds()
+        if delay >= 0:
+            self.metrics.observe('tweet_monitor_detection_delay_seconds', delay)
+    
+    def profiled_get_tweets(self, username, driver):
+        """每隔 sample_every 次用 cProfile 采样一次 get_tweets，结果保存为 .prof 文件"""
+        with self.state_lock:
+            self.profile_counter += 1
+            sample = (
+                self.profiling_settings.get('enabled', False)
+                and self.profile_counter % max(1, int(self.profiling_settings.get('sample_every', 100))) == 0
+            )
+        if not sample:
+            return self.get_tweets(username, driver)
+        
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(self.get_tweets, username, driver)
+        finally:
+            output_dir = self.profiling_settings.get('output_dir', 'profiles')
+            try:
+                os.makedirs(output_dir, exist_ok=True)
+                path = os.path.join(output_dir, f"get_tweets_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{username}.prof")
+                profiler.dump_stats(path)
+                self.logger.info(f"已保存性能采样到 {path}")
+            except OSError as e:
+                self.logger.warning(f"保存性能采样失败: {e}")
+    
+    def create_tweet_store(self):
+        """根据配置创建推文存储后端"""
+        backend = self.storage_settings.get('backend', 'sqlite')
+        if backend == 'json':
+            return JsonFileTweetStore(self.base_data_dir)
+        if backend == 'sqlite':
+            return SqliteTweetStore(
+                self.storage_settings.get('path', 'tweets.db'),
+                batch_size=self.storage_settings.get('batch_size', 20),
+                flush_interval=self.storage_settings.get('flush_interval', 5)
+            )
+        raise ValueError(f"不支持的存储后端: {backend}")
+    
+    def create_pipeline(self):
+        """根据配置创建新推文的输出端；未配置时保存到推文存储并发送邮件"""
+        options_keys = ('queue_size', 'policy', 'block_timeout', 'batch_size', 'batch_window', 'retries', 'retry_backoff',
+                        'only_matched')
+        sinks = []
+        for name, settings in self.sink_settings.items():
+            if not settings.get('enabled', name in ('store', 'email')):
+                continue
+            options = {key: settings[key] for key in options_keys if key in settings}
+            options['metrics'] = self.metrics
+            if name == 'store':
+                sinks.append(StoreSink(self.tweet_store, self.logger, **options))
+            elif name == 'email':
+                options.setdefault('queue_size', self.email_queue_size)
+                sinks.append(NotificationDispatcher(
+                    self.smtp_server, self.smtp_port, self.sender_email, self.sender_password,
+                    self.email_recipients, self.logger,
+                    digest_window=self.email_digest_window, use_tls=self.email_use_tls, base_url=self.base_url,
+                    **options
+                ))
+            elif name == 'jsonl':
+                sinks.append(JsonlSink(settings.get('path', 'tweets_stream.jsonl'), self.logger,
+                                       fsync=settings.get('fsync', False), **options))
+            elif name == 'webhook':
+                sinks.append(WebhookSink(settings['url'], self.logger, headers=settings.get('headers'),
+                                         timeout=settings.get('timeout', 5), **options))
+            elif name == 'stdout':
+                sinks.append(StdoutSink(self.logger, **options))
+            else:
+                raise ValueError(f"不支持的输出端: {name}")
+        self.logger.info(f"新推文输出端: {', '.join(sink.name for sink in sinks) or '无'}")
+        return TweetPipeline(sinks, self.metrics)
+    
+    def cleanup(self):
+        """清理资源：在后台逐个替换所有浏览器"""
+        self.logger.info("执行清理操作...")
+        for slot in self.slots:
+            self.start_recycle(slot, "手动清理")
+    
+    def check_driver_health(self):
+        """检查各浏览器的内存和检查耗时，超过阈值时在后台替换"""
+        for slot in self.slots:
+            if slot.recycling:
+                continue
             
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump(tweet_data, f, ensure_ascii=False, indent=4)
+            reason = None
+            rss = process_tree_rss(driver_pid(slot.driver))
+            if rss is not None and rss > self.health_max_rss_mb * 1024 * 1024:
+                reason = f"内存 {rss / 1024 / 1024:.0f} MB 超过 {self.health_max_rss_mb} MB"
+            elif len(slot.latencies) >= 5 and slot.average_latency() > self.health_max_latency:
+                reason = f"平均检查耗时 {slot.average_latency():.1f} 秒超过 {self.health_max_latency} 秒"
+            elif self.health_max_age and time.time() - slot.created_at > self.health_max_age:
+                reason = f"已运行 {(time.time() - slot.created_at) / 3600:.1f} 小时"
             
-            self.logger.info(f"已保存{username}的推文到 {filename}")
+            if rss is not None:
+                self.logger.info(f"第 {slot.index + 1} 个浏览器内存 {rss / 1024 / 1024:.0f} MB, 平均检查耗时 {slot.average_latency():.1f} 秒")
+            if reason:
+                self.start_recycle(slot, reason)
+    
+    def start_recycle(self, slot, reason):
+        """在后台启动并登录一个新浏览器，就绪后替换旧浏览器"""
+        if slot.recycling:
+            return
+        slot.recycling = True
+        self.logger.info(f"准备替换第 {slot.index + 1} 个浏览器: {reason}")
+        slot.recycle_thread = threading.Thread(
+            target=self._recycle_slot, args=(slot,), name=f"DriverRecycle-{slot.index + 1}", daemon=True
+        )
+        slot.recycle_thread.start()
+    
+    def _recycle_slot(self, slot):
+        try:
+            start = time.time()
+            new_driver = self.create_driver(slot.index, slot.generation + 1)
+            if slot.retired:
+                self.quit_driver(new_driver)
+                return
+            if not self.ensure_logged_in(new_driver):
+                self.logger.error(f"替换第 {slot.index + 1} 个浏览器失败: 新浏览器登录失败")
+                self.quit_driver(new_driver)
+                return
             
+            # 等当前账号检查完成后原子地换上新浏览器，再关闭旧浏览器；位置已被移除时关闭新浏览器
+            old_driver = slot.swap(new_driver)
+            self.quit_driver(old_driver)
+            if old_driver is new_driver:
+                self.logger.info(f"第 {slot.index + 1} 个浏览器已被关闭，放弃替换")
+                return
+            self.logger.info(f"已替换第 {slot.index + 1} 个浏览器，准备耗时 {time.time() - start:.1f} 秒")
         except Exception as e:
-            self.logger.error(f"保存推文时出错: {e}")
+            self.logger.error(f"替换第 {slot.index + 1} 个浏览器失败: {e}")
+        finally:
+            slot.recycling = False
     
-    def cleanup(self):
-        """清理资源"""
-        self.logger.info("执行清理操作...")
-        if self.driver is not None:
-            self.driver.quit()
-        self.init_driver()
-        self.login_twitter()
+    def process_account(self, username, account_info, driver):
+        """检查单个账号并处理新推文"""
+        self.logger.debug("正在检查 %s (@%s) 的推文...", account_info['name'], username, extra={'account': username})
+        
+        start = time.time()
+        tweets = self.profiled_get_tweets(username, driver)
+        elapsed = time.time() - start
+        # 每个账号的检查结果按 check_sample_rate 抽样输出，账号多时不刷屏
+        self.logger.log(
+            self.sampled_level(),
+            "已检查 %s (@%s): %d 条推文, 耗时 %.2f 秒", account_info['name'], username, len(tweets or []), elapsed,
+            extra={'account': username, 'phase': 'check', 'duration': round(elapsed, 3)}
+        )
+        self.account_state.update(
+            username,
+            last_checked=datetime.now().isoformat(timespec='seconds'),
+            last_check_seconds=round(elapsed, 3)
+        )
+        self.metrics.inc('tweet_monitor_accounts_checked_total')
+        self.metrics.set('tweet_monitor_account_check_seconds', round(elapsed, 3), account=username)
+        
+        if tweets:
+            # 用页面上的推文时间估算发帖频率，供调度器使用
+            rate = estimate_posting_rate([t for t in tweets if not t.get('pinned')])
+            if rate:
+                self.account_state.update(username, posting_rate=round(rate, 4))
+            
+            # 按时间顺序逐条处理自上次检查以来的所有新推文
+            new_tweets = self.find_new_tweets(username, account_info, tweets)
+            for new_tweet in new_tweets:
+                # 标记命中的提醒规则，未命中的推文只保存不通知
+                if self.alert_matcher:
+                    new_tweet['matched_rules'] = self.alert_matcher.match(new_tweet)
+                new_tweet['detected_at'] = datetime.now(timezone.utc).isoformat(timespec='milliseconds')
+                
+                # 多节点运行时每条推文只由一个节点发布；登记时保存完整的推文，崩溃后接手的节点据此重新发布
+                if self.coordinator and not self.coordinator.claim_notification(username, new_tweet):
+                    self.logger.info("推文 %s 已由其他节点处理", new_tweet['id'],
+                                     extra={'account': username, 'tweet_id': new_tweet['id']})
+                    continue
+                
+                self.logger.info(
+                    "检测到 %s 的新推文 %s (时间 %s, 点赞 %s, 转发 %s): %s",
+                    account_info['name'], new_tweet['id'], new_tweet['created_at'],
+                    new_tweet['likes'], new_tweet['retweets'], new_tweet['text'],
+                    extra={'account': username, 'phase': 'detect', 'tweet_id': new_tweet['id']}
+                )
+                self.metrics.inc('tweet_monitor_new_tweets_total')
+                self.record_detection_delay(new_tweet)
+                if new_tweet.get('matched_rules'):
+                    self.logger.info("命中提醒规则: %s", ', '.join(new_tweet['matched_rules']),
+                                     extra={'account': username, 'tweet_id': new_tweet['id']})
+                
+                # 交给各输出端（保存、邮件通知等）在后台处理，不阻塞检查
+                with self.timed('publish'):
+                    self.pipeline.publish(new_tweet)
+            
+            # 发布（登记为 pending）后再保存进度。节点在登记前退出时，接手的节点从旧的 last_tweet_id 重新检查到这些推文；
+            # 登记后、输出端写完前退出时，推文停留在 pending，由接手的节点在 refresh_shard 中重新发布
+            if self.coordinator and new_tweets:
+                self.coordinator.save_watermark(username, self.account_state.get(username, 'last_tweet_id'))
+    
+    def find_new_tweets(self, username, account_info, tweets):
+        """找出比 last_tweet_id 更新且未见过的推文（页面上的转推只要未见过），按时间正序返回"""
+        # 置顶推文不代表新动态；推文 ID 是 Snowflake，可按数值比较先后
+        candidates = [t for t in tweets if not t.get('pinned') and str(t['id']).isdigit()]
+        if not candidates:
+            return []
+        
+        # 比较和更新 last_tweet_id 需要与其他工作线程串行
+        with self.state_lock:
+            seen = self.account_state.seen_ids(username)
+            # 账号配置中的 last_tweet_id 只作为初始值，之后以状态日志为准
+            last_tweet_id = self.account_state.get(username, 'last_tweet_id', account_info.get('last_tweet_id'))
+            watermark = int(last_tweet_id) if last_tweet_id and str(last_tweet_id).isdigit() else None
+            previous_count = self.account_state.get(username, 'page_tweets', 0)
+            
+            unseen = [t for t in candidates if t['id'] not in seen]
+            if watermark is not None:
+                # 转推旧推文时页面上只有原推文的 ID，不能与 last_tweet_id 比较
+                new_tweets = [t for t in unseen if not has_timeline_id(t) or int(t['id']) > watermark]
+            else:
+                # 没有记录时只把最新的一条（页面上的第一条）当作新推文，避免首次运行时批量通知
+                new_tweets = unseen[:1]
+            # 主页按时间倒序排列（转推按转推的时间），反过来就是时间正序
+            new_tweets.reverse()
+            
+            self.account_state.add_seen(username, [t['id'] for t in candidates])
+            # last_tweet_id 只按能代表时间线先后的 ID 前进
+            timeline_ids = [int(t['id']) for t in candidates if has_timeline_id(t)]
+            # 推文比上次检查时少（页面可能只渲染出一部分）且没有连上 last_tweet_id 时，中间可能还有没见过的推文：
+            # last_tweet_id 不越过它们，已通知的推文记在见过的 ID 中，下次检查时补上其余的推文
+            partial = (
+                watermark is not None and len(tweets) < previous_count
+                and (not timeline_ids or min(timeline_ids) > watermark)
+            )
+            if partial:
+                self.logger.info("@%s 的页面只有 %d 条推文（上次 %d 条），暂不更新 last_tweet_id", username,
+                                 len(tweets), previous_count, extra={'account': username})
+            else:
+                if timeline_ids and (watermark is None or max(timeline_ids) > watermark):
+                    self.account_state.update(username, last_tweet_id=str(max(timeline_ids)))
+                if len(tweets) != previous_count:
+                    self.account_state.update(username, page_tweets=len(tweets))
+        
+        return new_tweets
+    
+    def _worker_loop(self, slot, work_queue, stats):
+        """工作线程：从共享队列中取账号并检查"""
+        while not self.stop_event.is_set():
+            try:
+                username, account_info = work_queue.get_nowait()
+            except queue.Empty:
+                return
+            
+            try:
+                # 持有锁期间浏览器不会被替换
+                with slot.lock:
+                    start = time.time()
+                    self.process_account(username, account_info, slot.driver)
+                    slot.latencies.append(time.time() - start)
+                with self.state_lock:
+                    stats['checked'] += 1
+            except Exception as e:
+                self.logger.error("检查 @%s 时出错: %s", username, e, extra={'account': username})
+                self.metrics.inc('tweet_monitor_errors_total', type='worker')
+                with self.state_lock:
+                    stats['errors'].append(e)
+                return
+            finally:
+                self.scheduler.reschedule(username)
+            
+            time.sleep(random.uniform(*self.check_delay))
+    
+    def owned_accounts(self):
+        """本节点负责的账号（未启用分片时为所有账号）"""
+        if self.owned is None:
+            return self.accounts
+        return {u: info for u, info in self.accounts.items() if u in self.owned}
+    
+    def refresh_shard(self):
+        """续租并重新分配账号；接手的账号从租约中保存的 last_tweet_id 继续检查"""
+        enabled = [u for u, info in self.accounts.items() if info.get('enabled', True)]
+        owned = self.coordinator.refresh(enabled)
+        previous = self.owned or set()
+        acquired = owned - previous
+        if acquired:
+            for username, watermark in self.coordinator.watermarks(acquired).items():
+                local = self.account_state.get(username, 'last_tweet_id')
+                if not local or int(watermark) > int(local):
+                    self.account_state.update(username, last_tweet_id=watermark)
+        if owned != previous:
+            self.logger.info(
+                f"节点 {self.node_id} 负责 {len(owned)}/{len(enabled)} 个账号 "
+                f"(新增 {len(acquired)}, 让出 {len(previous - owned)})"
+            )
+        self.owned = owned
+        
+        # 下线的节点登记后没来得及写出的推文，由现在负责该账号的节点重新发布
+        for tweet_data in self.coordinator.take_stale_claims():
+            self.logger.warning("重新发布其他节点未写完的推文 %s", tweet_data['id'],
+                                extra={'account': tweet_data['username'], 'tweet_id': tweet_data['id']})
+            self.pipeline.publish(tweet_data)
+    
+    def start_shard_heartbeat(self):
+        """后台定期续租，检查耗时较长时租约也不会过期"""
+        if not self.coordinator:
+            return
+        
+        def heartbeat():
+            period = self.coordinator.lease_ttl / 3
+            while not self.stop_event.wait(period):
+                try:
+                    self.refresh_shard()
+                except Exception as e:
+                    self.logger.error(f"续租账号时出错: {e}")
+        
+        threading.Thread(target=heartbeat, name='ShardHeartbeat', daemon=True).start()
+    
+    def run_sweep(self, usernames=None):
+        """把账号（默认为所有启用的账号）分给各个浏览器检查一轮"""
+        work_queue = queue.Queue()
+        queued = set()
+        for username, account_info in self.owned_accounts().items():
+            if usernames is not None and username not in usernames:
+                continue
+            # 检查账号是否启用
+            if account_info.get('enabled', True):
+                work_queue.put((username, account_info))
+                queued.add(username)
+        
+        # 到期后已停用、删除或改由其他节点负责（分片心跳在取出之后更新了负责的账号）的账号不检查，
+        # 从调度器中移除，重新负责时由 sync 立即排入
+        for username in set(usernames or ()) - queued:
+            self.scheduler.discard(username)
+        
+        total = work_queue.qsize()
+        stats = {'checked': 0, 'errors': []}
+        start = time.time()
+        log_start = self.log_cost()
+        
+        if len(self.slots) == 1:
+            # 单浏览器模式直接在主线程中顺序检查
+            self._worker_loop(self.slots[0], work_queue, stats)
+        else:
+            workers = [
+                threading.Thread(
+                    target=self._worker_loop,
+                    args=(slot, work_queue, stats),
+                    name=f"TweetWorker-{slot.index + 1}",
+                    daemon=True
+                )
+                for slot in self.slots
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+        
+        elapsed = time.time() - start
+        self.metrics.observe('tweet_monitor_sweep_seconds', elapsed)
+        throughput = stats['checked'] / elapsed * 60 if elapsed > 0 else 0
+        records, enqueue_seconds, write_seconds = (now - before for now, before in zip(self.log_cost(), log_start))
+        self.logger.info(
+            "本轮检查完成: %d/%d 个账号, 耗时 %.1f 秒, 吞吐 %.1f 账号/分钟 (%d 个浏览器); "
+            "日志 %d 条, 入队 %.1f 毫秒, 写出 %.1f 毫秒",
+            stats['checked'], total, elapsed, throughput, len(self.slots),
+            records, enqueue_seconds * 1000, write_seconds * 1000,
+            extra={'phase': 'sweep', 'duration': round(elapsed, 3)}
+        )
+        self.log_step_latencies()
+        
+        # 每轮结束时把缓冲中的推文写入存储
+        self.tweet_store.flush()
+        
+        # 每轮结束时批量写入账号状态
+        self.account_state.flush()
+        
+        # 出错中断时未检查的账号重新排到队首
+        while not work_queue.empty():
+            self.scheduler.reschedule(work_queue.get_nowait()[0], interval=0)
+        
+        # 与单浏览器模式保持一致：出错时交给 monitor 重建浏览器
+        if stats['errors']:
+            raise stats['errors'][0]
+    
+    def update_schedule(self):
+        """根据发帖频率和浏览器检查能力重新计算各账号的轮询间隔"""
+        rates = {}
+        accounts = self.owned_accounts()
+        for username, account_info in accounts.items():
+            if not self.adaptive_polling or not account_info.get('enabled', True):
+                continue
+            stored = self.tweet_store.latest_tweets(username, 20)
+            # 已保存的推文不足时使用最近一次检查时页面上的推文估算的频率
+            rate = estimate_posting_rate(stored) if len(stored) >= 5 else None
+            rate = rate or self.account_state.get(username, 'posting_rate')
+            if rate:
+                rates[username] = rate
+        
+        check_seconds = self.average_check_seconds()
+        # 每次检查后还有 check_delay 范围内的随机间隔
+        polls_per_hour = max(len(self.slots), 1) * 3600 / max(check_seconds + sum(self.check_delay) / 2, 0.1)
+        self.scheduler.update_intervals(accounts, rates, polls_per_hour)
+        
+        for item in self.scheduler.report(check_seconds):
+            self.logger.info(
+                f"@{item['username']}: 发帖频率 {item['rate_per_hour']:.2f} 条/小时, "
+                f"轮询间隔 {item['interval']:.0f} 秒, 预计发现延迟 {item['expected_latency']:.0f} 秒"
+            )
+    
+    def average_check_seconds(self):
+        """所有账号最近一次检查的平均耗时"""
+        durations = [
+            self.account_state.get(username, 'last_check_seconds')
+            for username in self.owned_accounts()
+        ]
+        durations = [d for d in durations if d]
+        return sum(durations) / len(durations) if durations else 10
     
     def monitor(self, interval=60):
         """监控多个账号的推文"""
-        cleanup_counter = 0
+        self.scheduler.default_interval = interval
+        last_schedule_update = 0
+        self.start_metrics_server()
+        self.start_shard_heartbeat()
         
         while True:
             try:
                 # 检查配置文件是否有更新
                 self.check_config_updates()
                 
-                if not hasattr(self, 'driver') or self.driver is None:
-                    if not self.init_driver() or not self.login_twitter():
+                if not self.slots:
+                    if not self.init_driver() or not self.login_all():
+                        self.quit_drivers()
                         time.sleep(60)
                         continue
                 
-                # 只在首次运行时执行关注操作
+                # 只在首次运行时启动后台关注线程，之后账号配置更新时由它继续关注新账号
                 if self.first_run:
-                    self.follow_accounts()
+                    self.start_follow_worker()
                     self.first_run = False
                 
-                cleanup_counter += 1
-                if cleanup_counter >= 100:
-                    self.cleanup()
-                    cleanup_counter = 0
+                # 按发帖频率（未启用自适应时按账号配置的 poll_interval）调整轮询间隔
+                self.scheduler.sync(self.owned_accounts())
+                if time.time() - last_schedule_update >= self.schedule_update_every:
+                    self.update_schedule()
+                    last_schedule_update = time.time()
                 
-                # 遍历所有启用的账号
-                for username, account_info in self.accounts.items():
-                    # 检查账号是否启用
-                    if not account_info.get('enabled', True):
-                        continue
-                        
-                    self.logger.info(f"\n正在检查 {account_info['name']} (@{username}) 的推文...")
-                    
-                    tweets = self.get_tweets(username)
-                    
-                    if tweets:
-                        newest_tweet = tweets[0]
-                        
-                        if account_info['last_tweet_id'] != newest_tweet['id']:
-                            self.logger.info(f"\n检测到 {account_info['name']} 的新推文!")
-                            self.logger.info(f"时间: {newest_tweet['created_at']}")
-                            self.logger.info(f"内容: {newest_tweet['text']}")
-                            self.logger.info(f"点赞: {newest_tweet['likes']}")
-                            self.logger.info(f"转发: {newest_tweet['retweets']}")
-                            
-                            self.save_tweet(newest_tweet)
-                            # 发送邮件通知
-                            self.send_email_notification(newest_tweet)
-                            account_info['last_tweet_id'] = newest_tweet['id']
-                            # 保存最新的 tweet_id 到配置文件
-                            self.save_accounts()
-                    
-                    time.sleep(random.randint(3, 8))
+                due = self.scheduler.pop_due()
+                if not due:
+                    next_due = self.scheduler.next_due_time()
+                    time.sleep(min(max(next_due - time.time(), 1), 10) if next_due else 10)
+                    continue
+                
+                # 浏览器内存或检查耗时超过阈值时在后台替换，不中断监控
+                if time.time() - self.last_health_check >= self.health_check_every:
+                    self.check_driver_health()
+                    self.last_health_check = time.time()
                 
-                random_delay = interval + random.randint(-10, 10)
-                self.logger.info(f"下次检查将在 {random_delay} 秒后")
-                time.sleep(random_delay)
+                # 检查所有到期的账号
+                self.run_sweep(due)
+                
+                next_due = self.scheduler.next_due_time()
+                if next_due:
+                    self.logger.info("下次检查将在 %.0f 秒后", max(next_due - time.time(), 0))
                 
             except KeyboardInterrupt:
                 self.logger.info("收到停止信号，正在停止监控...")
+                self.shutdown()
                 break
             except Exception as e:
                 self.logger.error(f"监控过程中出错: {e}")
-                if hasattr(self, 'driver'):
-                    self.driver.quit()
-                self.driver = None
+                self.metrics.inc('tweet_monitor_errors_total', type='monitor')
+                self.quit_drivers()
                 time.sleep(60)
     
-    def get_tweets(self, username):
+    def shutdown(self):
+        """停止后台线程和浏览器，写完输出端队列后关闭存储"""
+        self.stop_event.set()
+        self.quit_drivers()
+        # 先写完输出端队列中的推文（并标记为已发布）再让出账号、关闭存储
+        self.pipeline.stop()
+        # 立即让出本节点负责的账号
+        if self.coordinator:
+            self.coordinator.release_all()
+        self.tweet_store.close()
+        self.account_state.flush()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        # 最后写完队列中的日志
+        self.close_logging()
+    
+    def get_tweets(self, username, driver=None):
         """获取指定用户的推文"""
+        driver = driver or self.driver
         try:
             # 访问用户主页
-            self.driver.get(f"https://twitter.com/{username}")
-            time.sleep(5)
+            load_start = time.perf_counter()
+            watcher = None
+            with self.timed('navigate'):
+                if self.extraction_mode == 'network':
+                    watcher = TimelineResponseWatcher(self.json_parser, username)
+                    watcher.drain(driver)
+                driver.get(f"{self.base_url}/{username}")
             
-            # 等待推文加载
-            tweets = WebDriverWait(self.driver, 20).until(
-                EC.presence_of_all_elements_located((By.CSS_SELECTOR, 'article[data-testid="tweet"]'))
-            )
+            # network 方式：推文接口的响应到达后直接解析，不等待页面渲染
+            if watcher:
+                tweets_data = self.get_tweets_network(driver, username, watcher)
+                if tweets_data is not None:
+                    return tweets_data
             
-            tweets_data = []
-            for tweet in tweets[:5]:  # 只获取最新的5条推文
-                try:
-                    # 获取推文ID
-                    tweet_link = tweet.find_element(By.CSS_SELECTOR, 'a[href*="/status/"]').get_attribute('href')
-                    tweet_id = tweet_link.split('/status/')[1].split('?')[0]
-                    
-                    # 获取推文文本
-                    text_element = tweet.find_element(By.CSS_SELECTOR, 'div[data-testid="tweetText"]')
-                    text = text_element.text
-                    
-                    # 获取时间
-                    time_element = tweet.find_element(By.CSS_SELECTOR, 'time')
-                    created_at = time_element.get_attribute('datetime')
-                    
-                    # 更新获取互动数据的选择器
-                    try:
-                        likes = tweet.find_element(By.CSS_SELECTOR, '[data-testid="like"] span span').text
-                    except:
-                        likes = '0'
-                        
+            # 等待第一条推文出现，再等到与上次检查一样多的推文（最多 5 条）渲染出来，只渲染出一部分时提取会漏掉推文
+            with self.timed('wait'):
+                tweets = self.wait_ready(
+                    driver, 'profile_tweets',
+                    EC.presence_of_all_elements_located((By.CSS_SELECTOR, 'article[data-testid="tweet"]'))
+                )
+                expected = min(self.account_state.get(username, 'page_tweets', 1), 5)
+                if len(tweets) < expected:
                     try:
-                        retweets = tweet.find_element(By.CSS_SELECTOR, '[data-testid="retweet"] span span').text
-                    except:
-                        retweets = '0'
-                    
-                    # 处理空字符串和数字格式化
-                    likes = '0' if not likes else likes.replace(',', '')
-                    retweets = '0' if not retweets else retweets.replace(',', '')
-                    
-                    tweet_data = {
-                        'id': tweet_id,
-                        'username': username,
-                        'text': text,
-                        'created_at': created_at,
-                        'likes': likes,
-                        'retweets': retweets
-                    }
-                    
-                    tweets_data.append(tweet_data)
-                    
+                        tweets = self.wait_ready(driver, 'profile_complete', articles_loaded(expected))
+                    except TimeoutException:
+                        # 推文被删除等原因数量变少时提取已出现的推文，find_new_tweets 不会让 last_tweet_id 越过没见过的推文
+                        tweets = driver.find_elements(By.CSS_SELECTOR, 'article[data-testid="tweet"]')
+            
+            if self.report_page_stats:
+                self.record_page_stats(driver, username, time.perf_counter() - load_start)
+            
+            start = time.perf_counter()
+            mode = 'dom'
+            tweets_data = None
+            extractors = {
+                'js': self.extract_tweets_js,
+                'html': self.extract_tweets_html,
+            }
+            # network 方式没有捕获到响应时改用脚本提取
+            extraction_mode = 'js' if self.extraction_mode == 'network' else self.extraction_mode
+            extractor = extractors.get(extraction_mode)
+            if extractor:
+                try:
+                    tweets_data = extractor(driver, username)
+                    mode = extraction_mode
                 except Exception as e:
-                    self.logger.error(f"解析推文时出错: {e}")
-                    continue
+                    self.logger.warning("%s 方式提取 @%s 的推文失败，改用逐元素提取: %s", extraction_mode, username, e,
+                                        extra={'account': username, 'phase': 'extract'})
+            
+            if tweets_data is None:
+                tweets_data = self.extract_tweets_dom(tweets, username)
             
+            elapsed = time.perf_counter() - start
+            self.metrics.observe('tweet_monitor_phase_seconds', elapsed, phase='extract')
+            self.record_extraction_time(username, mode, elapsed)
+            
+            if self.capture_dir:
+                self.capture_page(driver, username)
             return tweets_data
             
         except Exception as e:
-            self.logger.error(f"获取推文失败: {e}")
+            self.logger.error("获取 @%s 的推文失败: %s", username, e, extra={'account': username})
+            self.metrics.inc('tweet_monitor_errors_total', type='get_tweets')
+            return None
+    
+    def get_tweets_network(self, driver, username, watcher):
+        """等待主页推文接口的响应并解析，未捕获到或解析失败时返回 None"""
+        try:
+            with self.timed('wait'):
+                self.wait_ready(driver, 'timeline_response', watcher)
+        except TimeoutException:
+            self.logger.warning("等待 @%s 的推文接口响应超时，改用页面提取", username, extra={'account': username, 'phase': 'wait'})
+            return None
+        except Exception as e:
+            self.logger.warning("未捕获到 @%s 的推文接口响应，改用页面提取: %s", username, e, extra={'account': username})
             return None
+        
+        self.metrics.observe('tweet_monitor_phase_seconds', watcher.parse_seconds, phase='extract')
+        self.record_extraction_time(username, 'network', watcher.parse_seconds)
+        if self.capture_dir:
+            self.capture_page(driver, username, body=watcher.body)
+        return watcher.tweets
+    
+    def extract_tweets_js(self, driver, username):
+        """通过一次 execute_script 调用提取页面上的推文"""
+        raw_tweets = json.loads(driver.execute_script(EXTRACT_TWEETS_SCRIPT, 5, PINNED_PATTERN, RETWEET_PATTERN))
+        
+        tweets_data = []
+        for raw in raw_tweets:
+            try:
+                tweets_data.append(build_tweet_data(
+                    username, raw['href'], raw['text'], raw['created_at'], raw['likes'], raw['retweets'],
+                    pinned=raw.get('pinned', False), retweet=raw.get('retweet', False)
+                ))
+            except Exception as e:
+                self.logger.error(f"解析推文时出错: {e}")
+        return tweets_data
+    
+    def capture_page(self, driver, username, body=None):
+        """保存主页 HTML（或 network 方式下推文接口的 JSON 响应），用于积累离线解析和基准测试的样本"""
+        try:
+            os.makedirs(self.capture_dir, exist_ok=True)
+            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+            extension = 'html' if body is None else 'json'
+            filename = os.path.join(self.capture_dir, f"{username}_{timestamp}.{extension}")
+            with open(filename, 'w', encoding='utf-8') as f:
+                f.write(driver.page_source if body is None else body)
+        except Exception as e:
+            self.logger.error(f"保存 @{username} 的主页 HTML 时出错: {e}")
+    
+    def extract_tweets_html(self, driver, username):
+        """取一次页面源码，在本地解析推文"""
+        return self.html_parser.parse(driver.page_source, username)
+    
+    def extract_tweets_dom(self, tweets, username):
+        """逐个元素调用 WebDriver 提取推文"""
+        tweets_data = []
+        for tweet in tweets[:5]:  # 只获取最新的5条推文
+            try:
+                # 获取推文ID
+                tweet_link = tweet.find_element(By.CSS_SELECTOR, 'a[href*="/status/"]').get_attribute('href')
+                
+                # 获取推文文本（纯图片/视频推文没有文本）
+                text_elements = tweet.find_elements(By.CSS_SELECTOR, 'div[data-testid="tweetText"]')
+                text = text_elements[0].text if text_elements else ''
+                
+                # 获取时间
+                time_element = tweet.find_element(By.CSS_SELECTOR, 'time')
+                created_at = time_element.get_attribute('datetime')
+                
+                # 互动数据可能不存在，用 find_elements 避免抛出异常
+                like_elements = tweet.find_elements(By.CSS_SELECTOR, '[data-testid="like"] span span')
+                likes = like_elements[0].text if like_elements else '0'
+                
+                retweet_elements = tweet.find_elements(By.CSS_SELECTOR, '[data-testid="retweet"] span span')
+                retweets = retweet_elements[0].text if retweet_elements else '0'
+                
+                # 置顶推文带有 "已置顶" 的 socialContext，转推带有 "xxx reposted"
+                context_elements = tweet.find_elements(By.CSS_SELECTOR, '[data-testid="socialContext"]')
+                context = context_elements[0].text if context_elements else ''
+                pinned = re.search(PINNED_PATTERN, context, re.I) is not None
+                retweet = not pinned and re.search(RETWEET_PATTERN, context, re.I) is not None
+                
+                tweets_data.append(build_tweet_data(
+                    username, tweet_link, text, created_at, likes, retweets, pinned=pinned, retweet=retweet
+                ))
+                
+            except Exception as e:
+                self.logger.error(f"解析推文时出错: {e}")
+                continue
+        
+        return tweets_data
+    
+    def record_extraction_time(self, username, mode, elapsed):
+        """记录并输出推文提取耗时，便于比较两种提取方式"""
+        with self.state_lock:
+            total, count = self.extraction_timings.get(mode, (0.0, 0))
+            self.extraction_timings[mode] = (total + elapsed, count + 1)
+            if not self.logger.isEnabledFor(logging.DEBUG):
+                return
+            averages = ', '.join(
+                f"{name} 平均 {t / c * 1000:.0f} 毫秒"
+                for name, (t, c) in sorted(self.extraction_timings.items())
+            )
+        self.logger.debug("提取 @%s 的推文耗时 %.0f 毫秒 (%s; %s)", username, elapsed * 1000, mode, averages,
+                          extra={'account': username, 'phase': 'extract', 'duration': round(elapsed, 4)})
     
     def load_config(self):
         """加载配置文件"""
@@ -449,11 +3429,84 @@ class TweetMonitor:
             self.sender_email = email_settings.get('sender_email')
             self.sender_password = email_settings.get('sender_password')
             self.email_recipients = email_settings.get('recipients', [])
+            # 通知队列长度，以及摘要模式的合并窗口（秒，0 表示逐条发送）
+            self.email_queue_size = email_settings.get('queue_size', 100)
+            self.email_digest_window = email_settings.get('digest_window', 0)
+            self.email_use_tls = email_settings.get('use_tls', True)
+
+            # 日志设置（文件、格式、级别、检查日志的采样比例）
+            self.logging_settings = config.get('logging', {})
+            
+            # 站点地址（镜像站或本地模拟服务）
+            self.base_url = config.get('base_url', DEFAULT_BASE_URL).rstrip('/')
+            
+            # 获取监控设置
+            monitor_settings = config.get('monitor_settings', {})
+            self.worker_count = max(1, int(monitor_settings.get('workers', 1)))
+            # 每个浏览器两次检查之间随机等待的秒数范围
+            self.check_delay = tuple(monitor_settings.get('check_delay', (3, 8)))
+            # 推文提取方式: js 为单次脚本提取，html 为取页面源码本地解析，network 为解析推文接口的响应（均在失败时回退），dom 为逐元素提取
+            self.extraction_mode = monitor_settings.get('extraction_mode', 'js')
+            # 保存主页 HTML 的目录（为空时不保存）
+            self.capture_dir = monitor_settings.get('capture_dir')
+            # 各页面就绪等待步骤的超时时间
+            self.step_timeouts = dict(DEFAULT_STEP_TIMEOUTS)
+            self.step_timeouts.update(monitor_settings.get('step_timeouts', {}))
+            
+            # 自适应轮询调度设置
+            scheduler_settings = monitor_settings.get('scheduler', {})
+            self.adaptive_polling = scheduler_settings.get('adaptive', True)
+            self.schedule_update_every = scheduler_settings.get('update_every', 600)
+            self.scheduler = PollScheduler(
+                min_interval=scheduler_settings.get('min_interval', 30),
+                max_interval=scheduler_settings.get('max_interval', 900),
+                utilization=scheduler_settings.get('utilization', 0.8),
+                adaptive=self.adaptive_polling
+            )
+            
+            # 自动关注设置：每小时最多关注的账号数、连续关注的次数，以及关注失败后重试的间隔（秒）
+            follow_settings = monitor_settings.get('follow', {})
+            self.follow_enabled = follow_settings.get('enabled', True)
+            self.follow_rate_per_hour = follow_settings.get('rate_per_hour', 30)
+            self.follow_burst = follow_settings.get('burst', 3)
+            self.follow_retry_after = follow_settings.get('retry_after', 6 * 3600)
+            
+            # 浏览器健康检查：超过阈值时在后台替换浏览器
+            health_settings = monitor_settings.get('health', {})
+            self.health_check_every = health_settings.get('check_every', 60)
+            self.health_max_rss_mb = health_settings.get('max_rss_mb', 1500)
+            self.health_max_latency = health_settings.get('max_latency', 30)
+            self.health_max_age = health_settings.get('max_age', 6 * 3600)
+            
+            # 浏览器设置
+            self.browser_settings = config.get('browser', {})
+            self.lean_browser = self.browser_settings.get('lean', False)
+            self.report_page_stats = self.browser_settings.get('report_page_stats', self.lean_browser)
+            # 登录状态持久化：浏览器配置目录（为空时不使用）和 Cookie 文件
+            self.profile_dir = self.browser_settings.get('profile_dir')
+            self.cookie_file = self.browser_settings.get('cookie_file', 'session_cookies.json')
             
+            # 获取推文存储设置
+            self.storage_settings = config.get('storage', {})
+            
+            # 新推文输出端设置，未配置时保存到推文存储并发送邮件
+            self.sink_settings = config.get('sinks') or {'store': {}, 'email': {}}
+            
+            # 多节点分片设置
+            self.sharding_settings = config.get('sharding', {})
+            
+            # 提醒规则：只有命中规则的推文才发送通知
+            self.alert_settings = config.get('alerts', {})
+            
+            # 监控指标服务和性能采样设置
+            self.metrics_settings = config.get('metrics', {})
+            self.profiling_settings = config.get('profiling', {})
+
             # 验证必要的配置是否存在
             if not all([self.twitter_email, self.twitter_username, self.twitter_password]):
                 raise ValueError("Twitter 登录凭证不完整")
-            if not all([self.smtp_server, self.smtp_port, self.sender_email, 
+            email_enabled = self.sink_settings.get('email', {}).get('enabled', 'email' in self.sink_settings)
+            if email_enabled and not all([self.smtp_server, self.smtp_port, self.sender_email, 
                        self.sender_password, self.email_recipients]):
                 raise ValueError("邮件配置不完整")
                 
@@ -461,48 +3514,28 @@ class TweetMonitor:
             self.logger.error(f"加载配置文件失败: {e}")
             raise
 
-    def send_email_notification(self, tweet_data):
-        """发送邮件通知"""
-        try:
-            # 创建邮件内容
-            subject = f"新推文通知 - 来自 {tweet_data['username']}"
-            body = f"""
-检测到新推文！
-
-用户: {tweet_data['username']}
-时间: {tweet_data['created_at']}
-内容: {tweet_data['text']}
-点赞: {tweet_data['likes']}
-转发: {tweet_data['retweets']}
-
-推文链接: https://twitter.com/{tweet_data['username']}/status/{tweet_data['id']}
-            """
-            
-            # 创建邮件对象
-            msg = MIMEMultipart()
-            msg['From'] = self.sender_email
-            msg['Subject'] = subject
-            msg.attach(MIMEText(body, 'plain', 'utf-8'))
-            
-            # 连接到SMTP服务器
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()
-            server.login(self.sender_email, self.sender_password)
-            
-            # 发送给所有接收者
-            for recipient in self.email_recipients:
-                msg['To'] = recipient
-                server.send_message(msg)
-                self.logger.info(f"已发送邮件通知到 {recipient}")
-            
-            server.quit()
-            
-        except Exception as e:
-            self.logger.error(f"发送邮件通知失败: {e}")
-
 def main():
-    monitor = TweetMonitor()
-    monitor.monitor(interval=60)  # 可以调整检查间隔
+    parser = argparse.ArgumentParser(description='Twitter 推文监控')
+    parser.add_argument('--import-json', metavar='DIR', nargs='?', const='tweets_data',
+                        help='把旧的 JSON 推文目录导入 SQLite 存储后退出')
+    parser.add_argument('--node-id', help='分片模式下本节点的名称，默认为主机名-进程号')
+    args = parser.parse_args()
+    
+    monitor = TweetMonitor(node_id=args.node_id)
+    try:
+        if args.import_json:
+            if not isinstance(monitor.tweet_store, SqliteTweetStore):
+                monitor.logger.error("导入需要使用 sqlite 存储后端")
+                return
+            total, inserted = monitor.tweet_store.import_json_tree(args.import_json)
+            monitor.tweet_store.close()
+            monitor.logger.info(f"已从 {args.import_json} 读取 {total} 条推文，新增 {inserted} 条")
+            return
+        
+        monitor.monitor(interval=60)  # 可以调整检查间隔
+    finally:
+        # 退出前写完队列中的日志
+        monitor.close_logging()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,260 @@
+"""TweetMonitor 的容量测试：用本地模拟服务（fakeTwitter.py）代替真实网站，测量不同账号数下的检查能力
+
+对每个账号数：启动模拟服务，用真实的浏览器登录并连续检查所有账号，输出每轮检查耗时、推文发现延迟分位数、
+遗漏的推文数、CPU 和内存。测量结束时模拟服务停止发帖，再检查一轮，暂停前发布但仍未发现的推文计为遗漏
+（两次检查之间发布的推文超过主页可见的条数，或检查出错）。
+
+用法:
+    python loadTest.py                                     # 10、100、1000 个账号，每个至少测量 300 秒
+    python loadTest.py --accounts 100 --workers 4 --mode network --rate 60 --latency 0.5 --error-rate 0.02
+    python loadTest.py --json results.json --max-missed 0.01   # 遗漏比例超过门槛时返回非零退出码
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+try:
+    import psutil
+except ImportError:  # 未安装时不统计 CPU 和内存
+    psutil = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class ResourceSampler:
+    """每秒采样一次本进程及其子进程（浏览器）的 CPU 时间和常驻内存"""
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.peak_rss = 0
+        self.cpu_seconds = 0.0
+        self.stop_event = threading.Event()
+        self.children = {}
+        self.thread = None
+
+    def sample(self):
+        process = psutil.Process()
+        rss = process.memory_info().rss
+        own = process.cpu_times()
+        for child in process.children(recursive=True):
+            try:
+                times = child.cpu_times()
+                rss += child.memory_info().rss
+                # 浏览器退出后无法再读取，保留最后一次采样的值
+                self.children[child.pid] = times.user + times.system
+            except psutil.Error:
+                continue
+        self.peak_rss = max(self.peak_rss, rss)
+        return own.user + own.system + sum(self.children.values())
+
+    def start(self):
+        if psutil is None:
+            return
+        self.baseline = self.sample()
+
+        def run():
+            while not self.stop_event.wait(self.interval):
+                self.cpu_seconds = self.sample() - self.baseline
+
+        self.thread = threading.Thread(target=run, name='ResourceSampler', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.cpu_seconds = self.sample() - self.baseline
+
+
+def start_fake_twitter(args):
+    """在子进程中启动模拟服务，CPU 统计不包含它；返回 (进程, 地址)"""
+    command = [
+        sys.executable, os.path.join(HERE, 'fakeTwitter.py'), '--port', '0',
+        '--rate', str(args.rate), '--latency', str(args.latency), '--error-rate', str(args.error_rate),
+        '--seed', str(args.seed),
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True, encoding='utf-8')
+    line = process.stdout.readline()
+    return process, line.rsplit(' ', 1)[-1].strip()
+
+
+def fetch_json(url, data=None):
+    with urllib.request.urlopen(url, data=data, timeout=30) as response:
+        return json.loads(response.read())
+
+
+def write_config(workdir, base_url, args, account_count):
+    with open(os.path.join(HERE, 'config.json'), 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config['base_url'] = base_url
+    config['twitter_credentials'] = {'email': 'load@test.local', 'username': 'loadtest', 'password': 'x'}
+    monitor_settings = config.setdefault('monitor_settings', {})
+    monitor_settings.update(workers=args.workers, extraction_mode=args.mode, check_delay=[0, args.check_delay])
+    monitor_settings.setdefault('follow', {})['enabled'] = False
+    config.setdefault('browser', {}).update(
+        headless=True, lean=args.lean, profile_dir=None, cookie_file='session_cookies.json'
+    )
+    # 发现的推文带有 detected_at，写到 jsonl 文件中用来计算发现延迟
+    config['sinks'] = {'store': {}, 'jsonl': {'enabled': True, 'path': 'detected.jsonl'}}
+    config['alerts'] = {'enabled': False}
+    config['metrics'] = {'enabled': False}
+    config['sharding'] = {'enabled': False}
+    # 监控日志只写入工作目录中的 twitter_monitor.log，控制台只显示测量进度
+    config['logging'] = dict(config.get('logging', {}), console=False)
+    with open(os.path.join(workdir, 'config.json'), 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=4)
+
+    accounts = {
+        f"sim{i}": {'name': f"Sim {i}", 'username': f"sim{i}", 'last_tweet_id': None, 'enabled': True}
+        for i in range(account_count)
+    }
+    with open(os.path.join(workdir, 'twitter_accounts.json'), 'w', encoding='utf-8') as f:
+        json.dump(accounts, f, indent=4)
+
+
+def run_load(account_count, args):
+    """测量一个账号数，返回结果 dict"""
+    from listenMaskTwitter import TweetMonitor
+
+    server, base_url = start_fake_twitter(args)
+    workdir = tempfile.mkdtemp(prefix=f"load_{account_count}_")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    monitor = None
+    try:
+        write_config(workdir, base_url, args, account_count)
+        monitor = TweetMonitor()
+        if not monitor.init_driver() or not monitor.login_all():
+            raise RuntimeError('浏览器启动或登录模拟服务失败')
+
+        # 第一轮只记录各账号当前的最新推文，不计入结果
+        monitor.run_sweep()
+        sampler = ResourceSampler()
+        sampler.start()
+        started = time.time()
+        sweeps = []
+        errors = 0
+        while time.time() - started < args.duration or len(sweeps) < args.min_sweeps:
+            sweep_start = time.time()
+            try:
+                monitor.run_sweep()
+            except Exception as e:
+                errors += 1
+                print(f"  检查出错: {e}", file=sys.stderr)
+            sweeps.append(time.time() - sweep_start)
+            print(f"  {account_count} 个账号: 第 {len(sweeps)} 轮 {sweeps[-1]:.1f} 秒", file=sys.stderr)
+
+        # 停止发帖后再检查一轮，暂停前发布的推文都应该被发现
+        paused_at = fetch_json(f"{base_url}/_sim/pause", data=b'')['paused_at']
+        monitor.run_sweep()
+        elapsed = time.time() - started
+        sampler.stop()
+        stats = fetch_json(f"{base_url}/_sim/stats")
+        posted = [p for p in fetch_json(f"{base_url}/_sim/posted?since={started}") if p['posted_at'] <= paused_at]
+    finally:
+        if monitor:
+            monitor.shutdown()
+        os.chdir(cwd)
+        server.terminate()
+        server.wait()
+
+    detected = {}
+    with open(os.path.join(workdir, 'detected.jsonl'), 'r', encoding='utf-8') as f:
+        for line in f:
+            tweet = json.loads(line)
+            detected.setdefault(tweet['id'], datetime.fromisoformat(tweet['detected_at']).timestamp())
+    delays = [detected[p['id']] - p['posted_at'] for p in posted if p['id'] in detected]
+    missed = [p for p in posted if p['id'] not in detected]
+    checks = account_count * (len(sweeps) + 1)
+
+    return {
+        'accounts': account_count,
+        'workers': args.workers,
+        'mode': args.mode,
+        'sweeps': len(sweeps),
+        'sweep_p50': percentile(sweeps, 0.5),
+        'sweep_max': max(sweeps),
+        'checks_per_minute': checks / elapsed * 60,
+        'posted': len(posted),
+        'detected': len(delays),
+        'missed': len(missed),
+        'delay_p50': percentile(delays, 0.5),
+        'delay_p90': percentile(delays, 0.9),
+        'delay_p99': percentile(delays, 0.99),
+        'delay_max': max(delays) if delays else None,
+        'cpu_percent': sampler.cpu_seconds / elapsed * 100 if psutil else None,
+        'peak_rss_mb': sampler.peak_rss / 1024 / 1024 if psutil else None,
+        'sweep_errors': errors,
+        'server_errors': stats['errors'],
+        'workdir': workdir,
+    }
+
+
+def format_value(value, pattern):
+    return '-' if value is None else pattern.format(value)
+
+
+def print_report(results):
+    print(f"{'账号数':>6} {'轮数':>4} {'每轮(中位/最大) 秒':>20} {'检查/分钟':>10} {'发布':>6} {'遗漏':>5} "
+          f"{'发现延迟 p50/p90/p99/max 秒':>30} {'CPU%':>6} {'内存MB':>7} {'出错':>5}")
+    for r in results:
+        sweep = f"{r['sweep_p50']:.1f}/{r['sweep_max']:.1f}"
+        delays = '/'.join(format_value(r[key], '{:.1f}') for key in ('delay_p50', 'delay_p90', 'delay_p99', 'delay_max'))
+        print(f"{r['accounts']:>6} {r['sweeps']:>4} {sweep:>20} {r['checks_per_minute']:>10.1f} {r['posted']:>6} "
+              f"{r['missed']:>5} {delays:>30} {format_value(r['cpu_percent'], '{:.0f}'):>6} "
+              f"{format_value(r['peak_rss_mb'], '{:.0f}'):>7} {r['sweep_errors'] + r['server_errors']:>5}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='TweetMonitor 容量测试')
+    arg_parser.add_argument('--accounts', type=int, nargs='+', default=[10, 100, 1000], help='要测量的账号数')
+    arg_parser.add_argument('--duration', type=float, default=300, help='每个账号数至少测量的秒数')
+    arg_parser.add_argument('--min-sweeps', type=int, default=2, help='每个账号数至少检查的轮数')
+    arg_parser.add_argument('--workers', type=int, default=1, help='浏览器数量')
+    arg_parser.add_argument('--mode', default='js', choices=['js', 'html', 'network', 'dom'], help='推文提取方式')
+    arg_parser.add_argument('--lean', action='store_true', help='使用精简浏览器设置')
+    arg_parser.add_argument('--check-delay', type=float, default=0, help='两次检查之间的最长随机等待（秒）')
+    arg_parser.add_argument('--rate', type=float, default=30, help='每个账号每小时平均发布的推文数')
+    arg_parser.add_argument('--latency', type=float, default=0.2, help='模拟服务的平均响应延迟（秒）')
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help='模拟服务出错的比例')
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--json', help='把结果保存为 JSON 文件，便于对比')
+    arg_parser.add_argument('--max-missed', type=float, help='遗漏推文比例的门槛，超过时返回非零退出码')
+    args = arg_parser.parse_args()
+
+    sys.path.insert(0, HERE)
+    results = []
+    for account_count in args.accounts:
+        results.append(run_load(account_count, args))
+        print_report(results[-1:])
+
+    print()
+    print_report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=4)
+
+    if args.max_missed is not None:
+        failed = [r for r in results if r['posted'] and r['missed'] / r['posted'] > args.max_missed]
+        if failed:
+            print(f"遗漏比例超过 {args.max_missed:.2%}: {', '.join(str(r['accounts']) for r in failed)} 个账号")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+"""AccountStateStore：按批追加写入、启动时重放（包括中断时不完整的最后一行），以及日志重写为快照"""
+import os
+
+from listenMaskTwitter import AccountStateStore
+
+
+def reload(store):
+    replayed = AccountStateStore(store.path, seen_capacity=store.seen_capacity)
+    replayed.load()
+    return replayed
+
+
+def lines(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().splitlines()
+
+
+def test_replay_restores_fields_and_seen_ids(tmp_path):
+    store = AccountStateStore(str(tmp_path / 'account_state.jsonl'), batch_size=1)
+    store.update('a', last_tweet_id='1001', last_checked='2025-01-05T12:00:00')
+    store.add_seen('a', ['1001', '1000'])
+    store.update('a', last_tweet_id='1002')
+    store.add_seen('b', ['2000'])
+
+    replayed = reload(store)
+    # 后写入的字段覆盖先写入的，其他字段保留
+    assert replayed.get('a', 'last_tweet_id') == '1002'
+    assert replayed.get('a', 'last_checked') == '2025-01-05T12:00:00'
+    assert replayed.seen_ids('a').to_list() == ['1001', '1000']
+    assert '2000' in replayed.seen_ids('b')
+    assert replayed.get('b', 'last_tweet_id') is None
+
+
+def test_records_are_buffered_until_batch_is_full(tmp_path):
+    store = AccountStateStore(str(tmp_path / 'account_state.jsonl'), batch_size=3)
+    store.update('a', last_tweet_id='1')
+    store.update('a', last_tweet_id='2')
+    assert not os.path.exists(store.path)
+    store.update('a', last_tweet_id='3')
+    assert len(lines(store.path)) == 3
+
+    # 没有新 ID 时不写记录
+    store.add_seen('a', ['1'])
+    assert store.add_seen('a', ['1']) == []
+    store.flush()
+    assert len(lines(store.path)) == 4
+
+
+def test_truncated_last_line_is_skipped(tmp_path):
+    store = AccountStateStore(str(tmp_path / 'account_state.jsonl'), batch_size=1)
+    store.update('a', last_tweet_id='1001')
+    # 进程在写最后一行时中断
+    with open(store.path, 'a', encoding='utf-8') as f:
+        f.write('{"username": "a", "last_tweet_id": "10')
+
+    assert reload(store).get('a', 'last_tweet_id') == '1001'
+
+
+def test_compaction_rewrites_log_as_snapshot(tmp_path):
+    store = AccountStateStore(str(tmp_path / 'account_state.jsonl'), seen_capacity=3, batch_size=1,
+                              compact_every=12)
+    for number in range(1, 6):
+        store.update('a', last_tweet_id=str(number))
+        store.add_seen('a', [str(number)])
+    store.update('b', last_tweet_id='7')
+    store.update('b', last_tweet_id='8')
+
+    # 第 12 条记录写入时重写为每个账号一行的快照
+    assert len(lines(store.path)) == 2
+    assert not os.path.exists(store.path + '.tmp')
+    replayed = reload(store)
+    assert replayed.get('a', 'last_tweet_id') == '5'
+    assert replayed.get('b', 'last_tweet_id') == '8'
+    # 见过的 ID 超过容量时只保留最近的，重写后顺序不变
+    assert replayed.seen_ids('a').to_list() == ['3', '4', '5']
+
+    # 快照之后继续追加，重放时叠加在快照上
+    store.update('b', last_tweet_id='9')
+    assert len(lines(store.path)) == 3
+    assert reload(store).get('b', 'last_tweet_id') == '9'
+
+
+def test_compaction_counts_replayed_records(tmp_path):
+    path = str(tmp_path / 'account_state.jsonl')
+    store = AccountStateStore(path, batch_size=1)
+    for number in range(4):
+        store.update('a', last_tweet_id=str(number))
+
+    # 重放的记录也计入，重启后不会让日志一直增长
+    restarted = AccountStateStore(path, batch_size=1, compact_every=5)
+    restarted.load()
+    restarted.update('a', last_tweet_id='4')
+    assert lines(path) == ['{"last_tweet_id": "4", "username": "a"}']
@@ -0,0 +1,55 @@
+"""推文提取的回归测试：包装 benchExtraction 的结果校验和吞吐门槛，供 pytest 运行
+
+用法:
+    python -m pytest test_extraction.py                                              # 内置样本
+    EXTRACTION_PAGES=captured/ EXTRACTION_MIN_RATE=2000 python -m pytest test_extraction.py
+    python -m pytest test_extraction.py --benchmark-only                              # 需要 pip install pytest-benchmark
+"""
+import os
+
+import pytest
+
+from benchExtraction import MODES, check_pages, load_pages, run_mode
+
+# 保存的主页 HTML 和推文接口响应目录（同 benchExtraction.py --pages），为空时使用内置样本
+PAGES_DIR = os.environ.get('EXTRACTION_PAGES')
+# 最低吞吐（条/秒），为 0 时不检查
+MIN_RATE = float(os.environ.get('EXTRACTION_MIN_RATE', 0))
+
+
+def load_corpus(mode):
+    parser_class, sample, extension = MODES[mode]
+    pages = load_pages(PAGES_DIR, extension) if PAGES_DIR else sample()
+    if not pages:
+        pytest.skip(f"{PAGES_DIR} 中没有 {extension} 页面")
+    return parser_class(limit=5), pages
+
+
+@pytest.mark.parametrize('mode', list(MODES))
+def test_parse_matches_expected(mode):
+    parser, pages = load_corpus(mode)
+    assert check_pages(parser, pages) == []
+
+
+@pytest.mark.parametrize('mode', list(MODES))
+def test_parse_rate(mode):
+    if not MIN_RATE:
+        pytest.skip('未设置 EXTRACTION_MIN_RATE')
+    _, pages = load_corpus(mode)
+    failures, total_tweets, total_time = run_mode(mode, pages, iterations=50)
+    assert failures == []
+    rate = total_tweets / total_time if total_time else 0
+    assert rate >= MIN_RATE, f"[{mode}] 吞吐 {rate:.0f} 条/秒 低于门槛 {MIN_RATE:.0f} 条/秒"
+
+
+@pytest.mark.parametrize('mode', list(MODES))
+def test_benchmark_parse(mode, request):
+    pytest.importorskip('pytest_benchmark')
+    benchmark = request.getfixturevalue('benchmark')
+    parser, pages = load_corpus(mode)
+    samples = [(page, expected[0]['username'] if expected else 'unknown') for page, expected in pages.values()]
+
+    def parse_all():
+        return sum(len(parser.parse(page, username)) for page, username in samples)
+
+    assert benchmark(parse_all) > 0
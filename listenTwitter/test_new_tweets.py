@@ -0,0 +1,152 @@
+"""find_new_tweets：连发、置顶、转推、首次运行和页面只渲染出一部分时哪些推文算新推文"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from fakeTimeline import make_tweet, render_timeline, sample_corpus, sample_json_corpus
+from listenMaskTwitter import TimelineHtmlParser, TimelineJsonParser
+
+
+def tweet(tweet_id, pinned=False, retweet=False, retweeted_id=None):
+    tweet_data = {'id': str(tweet_id), 'username': 'elonmusk', 'text': f"tweet {tweet_id}",
+                  'created_at': '2025-01-05T12:00:00.000Z', 'likes': '0', 'retweets': '0',
+                  'pinned': pinned, 'retweet': retweet}
+    if retweeted_id:
+        tweet_data['retweeted_id'] = str(retweeted_id)
+    return tweet_data
+
+
+def ids(tweets):
+    return [t['id'] for t in tweets]
+
+
+@pytest.fixture
+def monitor(make_monitor):
+    return make_monitor()
+
+
+def check(monitor, page, last_tweet_id=None):
+    return ids(monitor.find_new_tweets('elonmusk', {'last_tweet_id': last_tweet_id}, page))
+
+
+def watermark(monitor):
+    return monitor.account_state.get('elonmusk', 'last_tweet_id')
+
+
+def test_first_run_reports_only_latest(monitor):
+    page = [tweet(1003), tweet(1002), tweet(1001)]
+    assert check(monitor, page) == ['1003']
+    assert watermark(monitor) == '1003'
+    assert check(monitor, page) == []
+
+
+def test_initial_watermark_from_account_config(monitor):
+    assert check(monitor, [tweet(1003), tweet(1002), tweet(1001)], last_tweet_id='1001') == ['1002', '1003']
+
+
+def test_burst_reported_in_order(monitor):
+    check(monitor, [tweet(1000)])
+    assert check(monitor, [tweet(1004), tweet(1003), tweet(1002), tweet(1001), tweet(1000)]) == [
+        '1001', '1002', '1003', '1004']
+    assert watermark(monitor) == '1004'
+
+
+def test_pinned_tweet_ignored(monitor):
+    check(monitor, [tweet(500, pinned=True), tweet(1000)])
+    # 置顶的旧推文不是新动态，置顶的新推文也不会推动 last_tweet_id
+    assert check(monitor, [tweet(500, pinned=True), tweet(1000), tweet(999)]) == []
+    assert check(monitor, [tweet(2000, pinned=True), tweet(1001), tweet(1000)]) == ['1001']
+    assert watermark(monitor) == '1001'
+
+
+def test_page_retweet_of_older_tweet(monitor):
+    check(monitor, [tweet(1000), tweet(999)])
+    assert check(monitor, [tweet(500, retweet=True), tweet(1000), tweet(999)]) == ['500']
+    # 转推的是原推文的 ID，不能让 last_tweet_id 后退
+    assert watermark(monitor) == '1000'
+    assert check(monitor, [tweet(500, retweet=True), tweet(1000), tweet(999)]) == []
+    assert check(monitor, [tweet(1001), tweet(500, retweet=True), tweet(1000)]) == ['1001']
+
+
+def test_page_retweets_mixed_with_burst(monitor):
+    check(monitor, [tweet(1000)])
+    page = [tweet(1002), tweet(700, retweet=True), tweet(1001), tweet(600, retweet=True), tweet(1000)]
+    # 按页面上的先后（转推的时间）正序返回
+    assert check(monitor, page) == ['600', '1001', '700', '1002']
+    assert watermark(monitor) == '1002'
+
+
+def test_network_retweet_uses_own_id(monitor):
+    check(monitor, [tweet(1000)])
+    assert check(monitor, [tweet(1005, retweet=True, retweeted_id=500), tweet(1000)]) == ['1005']
+    assert watermark(monitor) == '1005'
+
+
+def test_first_run_with_retweet_on_top(monitor):
+    assert check(monitor, [tweet(500, retweet=True), tweet(1000)]) == ['500']
+    assert watermark(monitor) == '1000'
+    assert check(monitor, [tweet(1001), tweet(500, retweet=True), tweet(1000)]) == ['1001']
+
+
+@pytest.mark.parametrize('parser_class, corpus', [(TimelineHtmlParser, sample_corpus),
+                                                  (TimelineJsonParser, sample_json_corpus)])
+def test_sample_retweets_after_last_own_tweet(monitor, parser_class, corpus):
+    page, expected = corpus()['retweets']
+    tweets = parser_class(limit=5).parse(page, 'elonmusk')
+    own = [t['id'] for t in expected if not t['retweet']]
+    # 上次检查时只有最后一条自己的推文，之后连发了两条推文和两条转推
+    assert check(monitor, tweets, last_tweet_id=own[-1]) == [t['id'] for t in reversed(expected[:-1])]
+
+
+def test_partial_page_keeps_watermark(monitor):
+    check(monitor, [tweet(1007), tweet(1006), tweet(1005), tweet(1004)], last_tweet_id='1006')
+    # 只渲染出最新的一条：照常通知，但 last_tweet_id 不能越过还没出现的 1008、1009
+    assert check(monitor, [tweet(1010)]) == ['1010']
+    assert watermark(monitor) == '1007'
+    assert check(monitor, [tweet(1010), tweet(1009), tweet(1008), tweet(1007)]) == ['1008', '1009']
+    assert watermark(monitor) == '1010'
+
+
+def test_fewer_tweets_after_deletion(monitor):
+    check(monitor, [tweet(1007), tweet(1006), tweet(1005), tweet(1004)], last_tweet_id='1006')
+    # 删除了旧推文，页面仍然连上 last_tweet_id
+    assert check(monitor, [tweet(1008), tweet(1007)]) == ['1008']
+    assert watermark(monitor) == '1008'
+    assert monitor.account_state.get('elonmusk', 'page_tweets') == 2
+
+
+def test_burst_longer_than_page(monitor):
+    check(monitor, [tweet(1000 - i) for i in range(5)])
+    # 连发的推文比页面上能取到的还多：页面是满的，照常更新 last_tweet_id
+    assert check(monitor, [tweet(1010 - i) for i in range(5)]) == ['1006', '1007', '1008', '1009', '1010']
+    assert watermark(monitor) == '1010'
+
+
+class RenderingDriver:
+    """逐步渲染主页的模拟浏览器：每次查找推文多渲染出一条"""
+
+    def __init__(self, username, tweets):
+        self.username = username
+        self.entries = [(t, {}) for t in tweets]
+        self.rendered = 0
+
+    def get(self, url):
+        self.rendered = 0
+
+    def find_elements(self, by, selector):
+        self.rendered = min(self.rendered + 1, len(self.entries))
+        return [object()] * self.rendered
+
+    @property
+    def page_source(self):
+        return render_timeline(self.username, self.entries[:self.rendered])
+
+
+def test_get_tweets_waits_for_previous_count(make_monitor):
+    monitor = make_monitor(monitor_settings={'extraction_mode': 'html', 'step_timeouts': {'profile_complete': 0.5}})
+    now = datetime.now(timezone.utc)
+    tweets = [make_tweet(1010 - i, now - timedelta(minutes=i), text=f"tweet {i}") for i in range(5)]
+    monitor.account_state.update('elonmusk', page_tweets=4)
+    assert ids(monitor.get_tweets('elonmusk', RenderingDriver('elonmusk', tweets))) == ['1010', '1009', '1008', '1007']
+    # 推文被删除后只剩两条：等待超时后提取已出现的推文
+    assert ids(monitor.get_tweets('elonmusk', RenderingDriver('elonmusk', tweets[:2]))) == ['1010', '1009']
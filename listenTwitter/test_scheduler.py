@@ -0,0 +1,100 @@
+"""PollScheduler：到期顺序、轮询间隔分配，以及监控循环中取出后没有检查的账号"""
+import pytest
+
+from listenMaskTwitter import PollScheduler
+
+
+def accounts(*usernames, **options):
+    return {username: dict(options.get(username, {}), username=username, enabled=True) for username in usernames}
+
+
+def test_pop_due_in_order_and_reschedule():
+    scheduler = PollScheduler(default_interval=60)
+    scheduler.sync(accounts('a', 'b'))
+    assert sorted(scheduler.pop_due()) == ['a', 'b']
+    assert scheduler.pop_due() == []
+
+    scheduler.reschedule('a', interval=10, now=1000)
+    scheduler.reschedule('b', interval=100, now=1000)
+    assert scheduler.pop_due(now=1005) == []
+    assert scheduler.pop_due(now=1020) == ['a']
+    assert scheduler.pop_due(now=1200) == ['b']
+
+
+def test_sync_removes_disabled_accounts():
+    scheduler = PollScheduler()
+    configured = accounts('a', 'b')
+    scheduler.sync(configured)
+    scheduler.pop_due()
+    scheduler.reschedule('a', now=0)
+    configured['a']['enabled'] = False
+    scheduler.sync(configured)
+    assert scheduler.next_due_time() is None
+
+
+def test_discarded_account_is_due_again_after_sync():
+    scheduler = PollScheduler()
+    scheduler.sync(accounts('a'))
+    assert scheduler.pop_due() == ['a']
+    # 取出后没有检查：不移除的话账号会留在 due_at 中，但堆里已经没有它，sync 也不会再排入
+    scheduler.discard('a')
+    scheduler.sync(accounts('a'))
+    assert scheduler.pop_due() == ['a']
+
+
+def test_sqrt_allocation_within_budget():
+    scheduler = PollScheduler(min_interval=1, max_interval=100000, utilization=1)
+    scheduler.update_intervals(accounts('fast', 'slow'), {'fast': 16, 'slow': 1}, polls_per_hour=50)
+    polls = {username: 3600 / interval for username, interval in scheduler.intervals.items()}
+    assert polls['fast'] == pytest.approx(40)
+    assert polls['slow'] == pytest.approx(10)
+
+
+def test_unknown_rate_uses_prior_instead_of_reserving_budget():
+    scheduler = PollScheduler(default_interval=60, min_interval=1, max_interval=900, utilization=1)
+    usernames = ['known1', 'known2', 'known3'] + [f"new{i}" for i in range(20)]
+    rates = {'known1': 1, 'known2': 4, 'known3': 9}
+    scheduler.update_intervals(accounts(*usernames), rates, polls_per_hour=200)
+
+    polls = {username: 3600 / interval for username, interval in scheduler.intervals.items()}
+    # 新账号按中位数 4 条/小时参与分配，已知频率的账号不会都被压到 max_interval
+    assert polls['new0'] == pytest.approx(polls['known2'])
+    assert scheduler.intervals['known3'] < scheduler.max_interval
+    assert sum(polls.values()) == pytest.approx(200)
+
+
+def test_fixed_poll_interval_and_non_adaptive():
+    configured = accounts('fixed', 'other', fixed={'poll_interval': 300})
+    scheduler = PollScheduler(default_interval=60, adaptive=False)
+    scheduler.update_intervals(configured, {'other': 50}, polls_per_hour=1000)
+    assert scheduler.intervals == {'fixed': 300, 'other': 60}
+
+    scheduler = PollScheduler(default_interval=60, min_interval=1, utilization=1)
+    scheduler.update_intervals(configured, {'other': 50}, polls_per_hour=1000)
+    assert scheduler.intervals['fixed'] == 300
+    assert 3600 / scheduler.intervals['other'] == pytest.approx(1000 - 12)
+
+
+def test_update_schedule_honours_poll_interval_when_not_adaptive(make_monitor):
+    monitor = make_monitor(
+        accounts=accounts('fixed', 'other', fixed={'poll_interval': 300}),
+        monitor_settings={'scheduler': {'adaptive': False}},
+    )
+    monitor.update_schedule()
+    assert monitor.scheduler.intervals == {'fixed': 300, 'other': monitor.scheduler.default_interval}
+
+
+def test_run_sweep_discards_accounts_no_longer_owned(make_monitor):
+    monitor = make_monitor(accounts=accounts('kept', 'moved'))
+    monitor.scheduler.sync(monitor.owned_accounts())
+    due = monitor.scheduler.pop_due()
+    # 分片心跳在取出之后把 moved 交给了其他节点
+    monitor.owned = {'kept'}
+    monitor.run_sweep(due)
+    # 没有浏览器时 kept 留在队列中，重新排到队首；moved 从调度器中移除
+    assert monitor.scheduler.pop_due() == ['kept']
+
+    # 又重新负责 moved 时立即检查
+    monitor.owned = {'kept', 'moved'}
+    monitor.scheduler.sync(monitor.owned_accounts())
+    assert monitor.scheduler.pop_due() == ['moved']
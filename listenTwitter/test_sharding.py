@@ -0,0 +1,172 @@
+"""多节点分片：节点共用一个协调数据库，崩溃的节点由其他节点接手，每条推文恰好发布一次
+
+节点是不启动浏览器的 TweetMonitor，get_tweets 返回预先设定的页面；所有节点的 jsonl 输出端写入同一个文件，
+用来统计每条推文发布了几次。租约过期通过直接修改协调数据库模拟，测试不需要等待 lease_ttl。
+"""
+import json
+import sqlite3
+from collections import Counter
+
+import pytest
+
+from listenMaskTwitter import LeaseCoordinator
+
+ACCOUNT = {'elonmusk': {'name': 'Elon Musk', 'username': 'elonmusk', 'last_tweet_id': None, 'enabled': True}}
+
+
+def tweet(tweet_id):
+    return {'id': str(tweet_id), 'username': 'elonmusk', 'text': f"tweet {tweet_id}",
+            'created_at': f"2025-01-05T12:{tweet_id % 60:02d}:00.000Z", 'likes': '0', 'retweets': '0',
+            'pinned': False, 'retweet': False}
+
+
+def page(*tweet_ids):
+    return [tweet(tweet_id) for tweet_id in sorted(tweet_ids, reverse=True)]
+
+
+@pytest.fixture
+def cluster(make_monitor, tmp_path, monkeypatch):
+    """返回创建节点的函数和节点共用的文件路径"""
+    database = str(tmp_path / 'coordination.db')
+    stream = str(tmp_path / 'delivered.jsonl')
+
+    def node(node_id):
+        monitor = make_monitor(node_id, accounts=ACCOUNT, node_id=node_id,
+                               sharding={'enabled': True, 'path': database, 'lease_ttl': 60},
+                               sinks={'store': {}, 'jsonl': {'enabled': True, 'path': stream, 'batch_window': 0}})
+        return monitor
+
+    def check(monitor, tweet_ids):
+        """让节点检查一次账号，页面上是 tweet_ids 这些推文"""
+        # 每个节点的账号状态等文件使用相对路径，检查时切换到它自己的目录
+        monkeypatch.chdir(monitor.directory)
+        monitor.get_tweets = lambda username, driver: page(*tweet_ids)
+        monitor.process_account('elonmusk', ACCOUNT['elonmusk'], None)
+
+    node.check = check
+    node.database = database
+    node.stream = stream
+    return node
+
+
+def crash(monitor, database):
+    """模拟节点崩溃：不让出租约就停止，然后让它的租约和心跳过期"""
+    monitor.stop_event.set()
+    monitor.pipeline.stop()
+    monitor.tweet_store.close()
+    with sqlite3.connect(database) as conn:
+        conn.execute('UPDATE leases SET expires_at = 0 WHERE node_id = ?', (monitor.node_id,))
+        conn.execute('DELETE FROM nodes WHERE node_id = ?', (monitor.node_id,))
+
+
+def delivered(stream):
+    with open(stream, 'r', encoding='utf-8') as f:
+        return Counter(json.loads(line)['id'] for line in f)
+
+
+def claims(database):
+    with sqlite3.connect(database) as conn:
+        return dict(conn.execute('SELECT tweet_id, status FROM notified'))
+
+
+def test_taker_republishes_claims_left_pending_by_crashed_node(cluster):
+    node1 = cluster('node1')
+    assert node1.owned == {'elonmusk'}
+    cluster.check(node1, [1001])
+
+    # 登记之后、输出端写出之前崩溃：推文停留在 pending
+    node1.pipeline.publish = lambda tweet_data: None
+    cluster.check(node1, [1001, 1002, 1003])
+    crash(node1, cluster.database)
+    assert claims(cluster.database) == {'1001': 'delivered', '1002': 'pending', '1003': 'pending'}
+
+    node2 = cluster('node2')
+    assert node2.owned == {'elonmusk'}
+    assert node2.account_state.get('elonmusk', 'last_tweet_id') == '1003'
+    cluster.check(node2, [1001, 1002, 1003, 1004])
+    node2.shutdown()
+
+    assert delivered(cluster.stream) == {'1001': 1, '1002': 1, '1003': 1, '1004': 1}
+    assert set(claims(cluster.database).values()) == {'delivered'}
+
+
+def test_taker_rechecking_before_watermark_does_not_duplicate(cluster):
+    node1 = cluster('node1')
+    cluster.check(node1, [1001])
+    # 写出之后、保存 last_tweet_id 之前崩溃：接手的节点会重新检查到这些推文
+    node1.coordinator.save_watermark = lambda username, last_tweet_id: None
+    cluster.check(node1, [1001, 1002, 1003])
+    crash(node1, cluster.database)
+
+    node2 = cluster('node2')
+    assert node2.account_state.get('elonmusk', 'last_tweet_id') == '1001'
+    cluster.check(node2, [1001, 1002, 1003, 1004])
+    node2.shutdown()
+
+    assert delivered(cluster.stream) == {'1001': 1, '1002': 1, '1003': 1, '1004': 1}
+
+
+def test_restart_with_same_node_id_republishes_own_pending_claims(cluster):
+    node1 = cluster('node1')
+    cluster.check(node1, [1001])
+    node1.pipeline.publish = lambda tweet_data: None
+    cluster.check(node1, [1001, 1002])
+    # 以固定的 node_id 立即重启：租约还没有过期，仍由同名节点持有
+    node1.stop_event.set()
+    node1.pipeline.stop()
+    node1.tweet_store.close()
+
+    restarted = cluster('node1')
+    assert restarted.owned == {'elonmusk'}
+    restarted.shutdown()
+
+    assert delivered(cluster.stream) == {'1001': 1, '1002': 1}
+    assert claims(cluster.database) == {'1001': 'delivered', '1002': 'delivered'}
+
+
+def test_live_node_claims_are_not_taken(tmp_path):
+    database = str(tmp_path / 'coordination.db')
+    node1 = LeaseCoordinator(database, 'node1')
+    node2 = LeaseCoordinator(database, 'node2')
+    assert node1.refresh(['a', 'b']) == {'a', 'b'}
+    assert node1.claim_notification('a', {'id': '1', 'username': 'a'})
+    assert not node2.claim_notification('a', {'id': '1', 'username': 'a'})
+
+    # node2 加入后 node1 让出一半的账号，node1 还在线，它的 pending 推文仍由它自己写出
+    node2.refresh(['a', 'b'])
+    node1.refresh(['a', 'b'])
+    owned = node2.refresh(['a', 'b'])
+    assert len(owned) == 1
+    assert node2.take_stale_claims() == []
+    node1.mark_delivered(['1'])
+    assert node2.take_stale_claims() == []
+    node1.close()
+    node2.close()
+
+
+def test_old_claims_are_pruned(tmp_path):
+    coordinator = LeaseCoordinator(str(tmp_path / 'coordination.db'), 'node1', claim_retention=3600)
+    coordinator.refresh(['a'])
+    coordinator.claim_notification('a', {'id': '1', 'username': 'a'})
+    coordinator.claim_notification('a', {'id': '2', 'username': 'a'})
+    coordinator.conn.execute("UPDATE notified SET notified_at = notified_at - 7200 WHERE tweet_id = '1'")
+
+    # 每小时最多清理一次
+    coordinator.refresh(['a'])
+    assert claims(coordinator.path) == {'1': 'pending', '2': 'pending'}
+    coordinator.last_prune = 0
+    coordinator.refresh(['a'])
+    assert claims(coordinator.path) == {'2': 'pending'}
+    coordinator.close()
+
+
+def test_old_notified_table_is_migrated(tmp_path):
+    database = str(tmp_path / 'coordination.db')
+    with sqlite3.connect(database) as conn:
+        conn.execute('CREATE TABLE notified (tweet_id TEXT PRIMARY KEY, node_id TEXT NOT NULL, notified_at REAL NOT NULL)')
+        conn.execute("INSERT INTO notified VALUES ('1', 'old', 0)")
+
+    coordinator = LeaseCoordinator(database, 'node1')
+    assert claims(database) == {'1': 'delivered'}
+    assert not coordinator.claim_notification('a', {'id': '1', 'username': 'a'})
+    coordinator.close()
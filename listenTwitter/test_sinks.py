@@ -0,0 +1,295 @@
+"""新推文输出端：用本机的 HTTP 服务代替 webhook 接口、本机的 SMTP 服务代替邮件服务器，无需网络
+
+覆盖失败重试、重试后仍失败的计数、drop / block 队列策略的丢弃计数、推文存储输出端、写出卡住时 stop 的超时丢弃，
+以及邮件输出端复用 SMTP 连接、一封邮件发给所有收件人（只有一个 To 头）和摘要合并。
+"""
+import email
+import json
+import logging
+import socketserver
+import threading
+import time
+from email.header import decode_header, make_header
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from listenMaskTwitter import (
+    MetricsRegistry, NotificationDispatcher, Sink, SqliteTweetStore, StoreSink, WebhookSink,
+)
+
+
+def make_tweet(index):
+    return {'id': str(1000 + index), 'username': 'checker', 'text': f"tweet {index}",
+            'created_at': '2025-01-05T12:00:00.000Z', 'likes': '0', 'retweets': '0'}
+
+
+def make_metrics():
+    metrics = MetricsRegistry()
+    for name in ('tweet_monitor_sink_dropped_total', 'tweet_monitor_sink_failures_total',
+                 'tweet_monitor_sink_retries_total'):
+        metrics.define(name, 'counter', '')
+    metrics.define('tweet_monitor_sink_delivery_seconds', 'histogram', '')
+    return metrics
+
+
+def counter(metrics, name, sink):
+    return sum(value for labels, value in metrics.series(name) if labels.get('sink') == sink)
+
+
+class WebhookServer:
+    """本机的 webhook 接口：前 fail_first 个请求返回 500，记录成功收到的推文"""
+
+    def __init__(self, fail_first=0):
+        self.fail_first = fail_first
+        self.requests = 0
+        self.received = []
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                with server.lock:
+                    server.requests += 1
+                    failed = server.requests <= server.fail_first
+                    if not failed:
+                        server.received.extend(t['id'] for t in json.loads(body)['tweets'])
+                self.send_response(500 if failed else 200)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/tweets"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class SmtpServer:
+    """本机的最简 SMTP 服务：接受任意登录，记录连接数和每封邮件的收件人与内容"""
+
+    def __init__(self):
+        self.connections = 0
+        self.messages = []  # [(收件人列表, email.message.Message)]
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                self.wfile.write(line.encode('ascii') + b'\r\n')
+
+            def handle(self):
+                with server.lock:
+                    server.connections += 1
+                recipients = []
+                self.reply('220 localhost ESMTP')
+                for raw in self.rfile:
+                    command = raw.decode('utf-8', 'replace').strip()
+                    verb = command.split(' ', 1)[0].upper()
+                    if verb == 'EHLO':
+                        self.reply('250-localhost')
+                        self.reply('250 AUTH PLAIN')
+                    elif verb == 'AUTH':
+                        self.reply('235 Authentication successful')
+                    elif verb == 'RCPT':
+                        recipients.append(command.split(':', 1)[1].strip(' <>'))
+                        self.reply('250 OK')
+                    elif verb == 'DATA':
+                        self.reply('354 End data with <CR><LF>.<CR><LF>')
+                        lines = []
+                        for data in self.rfile:
+                            if data.rstrip(b'\r\n') == b'.':
+                                break
+                            lines.append(data[1:] if data.startswith(b'..') else data)
+                        with server.lock:
+                            server.messages.append((recipients, email.message_from_bytes(b''.join(lines))))
+                        recipients = []
+                        self.reply('250 OK')
+                    elif verb == 'QUIT':
+                        self.reply('221 Bye')
+                        return
+                    else:
+                        self.reply('250 OK')
+
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class BlockedSink(Sink):
+    """写出时等待 release，用来把队列填满"""
+
+    name = 'blocked'
+
+    def __init__(self, logger, **options):
+        super().__init__(logger, **options)
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.written = []
+
+    def write(self, batch):
+        self.started.set()
+        self.release.wait()
+        self.written.extend(t['id'] for t in batch)
+
+
+@pytest.fixture
+def logger():
+    return logging.getLogger('test_sinks')
+
+
+@pytest.fixture
+def webhook_server():
+    servers = []
+
+    def start(fail_first=0):
+        servers.append(WebhookServer(fail_first))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+@pytest.fixture
+def smtp_server():
+    server = SmtpServer()
+    yield server
+    server.stop()
+
+
+def make_dispatcher(smtp, logger, digest_window):
+    dispatcher = NotificationDispatcher(
+        '127.0.0.1', smtp.port, 'sender@example.com', 'secret', ['a@example.com', 'b@example.com'], logger,
+        digest_window=digest_window, use_tls=False, only_matched=False, metrics=make_metrics()
+    )
+    dispatcher.start()
+    return dispatcher
+
+
+def test_webhook_retry_delivers_each_tweet_once(logger, webhook_server):
+    """第一次请求失败，重试后全部送达，且每条推文只送达一次"""
+    server = webhook_server(fail_first=1)
+    metrics = make_metrics()
+    sink = WebhookSink(server.url, logger, batch_size=5, batch_window=0.05, retry_backoff=0.01, metrics=metrics)
+    sink.start()
+    for index in range(12):
+        sink.submit(make_tweet(index))
+    sink.stop()
+
+    assert server.received == [str(1000 + index) for index in range(12)]
+    assert counter(metrics, 'tweet_monitor_sink_retries_total', 'webhook') == 1
+    assert counter(metrics, 'tweet_monitor_sink_failures_total', 'webhook') == 0
+
+
+def test_webhook_failure_counts_each_batch(logger, webhook_server):
+    """接口一直出错时，每批重试 retries 次后计入一次失败"""
+    server = webhook_server(fail_first=1000)
+    metrics = make_metrics()
+    sink = WebhookSink(server.url, logger, batch_size=5, batch_window=0.05, retries=2, retry_backoff=0.01,
+                       metrics=metrics)
+    sink.start()
+    for index in range(10):
+        sink.submit(make_tweet(index))
+    sink.stop()
+
+    batches = server.requests // 3
+    assert server.requests % 3 == 0
+    assert counter(metrics, 'tweet_monitor_sink_failures_total', 'webhook') == batches
+    assert counter(metrics, 'tweet_monitor_sink_retries_total', 'webhook') == batches * 2
+
+
+@pytest.mark.parametrize('policy', ['drop', 'block'])
+def test_queue_policy_when_full(logger, policy):
+    """写出卡住时队列满了：drop 立即丢弃，block 等待 block_timeout 后丢弃；放行后写出已入队的推文"""
+    metrics = make_metrics()
+    sink = BlockedSink(logger, queue_size=3, policy=policy, block_timeout=0.05, metrics=metrics)
+    sink.start()
+    sink.submit(make_tweet(0))
+    assert sink.started.wait(5)
+    accepted = [index for index in range(1, 10) if sink.submit(make_tweet(index))]
+    dropped = counter(metrics, 'tweet_monitor_sink_dropped_total', 'blocked')
+    sink.release.set()
+    sink.stop()
+
+    assert accepted == [1, 2, 3]
+    assert dropped == 6
+    assert sink.written == [str(1000 + index) for index in range(4)]
+
+
+def test_stop_drops_queue_when_writer_is_stuck(logger):
+    """写出卡住且队列已满时 stop 在 timeout 内返回，丢弃并计数队列中剩余的推文"""
+    metrics = make_metrics()
+    sink = BlockedSink(logger, queue_size=2, metrics=metrics)
+    sink.start()
+    sink.submit(make_tweet(0))
+    assert sink.started.wait(5)
+    assert sink.submit(make_tweet(1)) and sink.submit(make_tweet(2))
+
+    start = time.time()
+    thread = sink.thread
+    sink.stop(timeout=0.2)
+    assert time.time() - start < 1
+    assert counter(metrics, 'tweet_monitor_sink_dropped_total', 'blocked') == 2
+
+    # 写出线程恢复后写完手上的一批就退出，不再写出已丢弃的推文
+    sink.release.set()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert sink.written == ['1000']
+
+
+def test_store_sink_saves_all_tweets(logger, tmp_path):
+    """推文存储输出端写入 SQLite，停止后全部落盘"""
+    path = str(tmp_path / 'tweets.db')
+    store = SqliteTweetStore(path, batch_size=20, flush_interval=5)
+    sink = StoreSink(store, logger, metrics=make_metrics())
+    sink.start()
+    for index in range(7):
+        sink.submit(make_tweet(index))
+    sink.stop()
+    store.close()
+
+    check = SqliteTweetStore(path)
+    saved = check.latest_tweets('checker', 20)
+    check.close()
+    assert len(saved) == 7
+
+
+def test_email_reuses_connection_with_single_to_header(logger, smtp_server):
+    """逐条发送时复用一个 SMTP 连接，每封邮件只有一个 To 头并同时发给所有收件人"""
+    dispatcher = make_dispatcher(smtp_server, logger, digest_window=0)
+    for index in range(3):
+        dispatcher.submit(make_tweet(index))
+    dispatcher.stop()
+
+    assert smtp_server.connections == 1
+    assert len(smtp_server.messages) == 3
+    for recipients, message in smtp_server.messages:
+        assert recipients == ['a@example.com', 'b@example.com']
+        assert message.get_all('To') == ['a@example.com, b@example.com']
+
+
+def test_email_digest_merges_window(logger, smtp_server):
+    """摘要模式下合并窗口内的多条推文合并成一封邮件"""
+    dispatcher = make_dispatcher(smtp_server, logger, digest_window=0.3)
+    for index in range(4):
+        dispatcher.submit(make_tweet(index))
+    dispatcher.stop()
+
+    subjects = [str(make_header(decode_header(message['Subject']))) for _, message in smtp_server.messages]
+    assert len(subjects) == 1
+    assert '4 条' in subjects[0]